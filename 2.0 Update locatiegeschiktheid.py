@@ -10,10 +10,10 @@ import os
 from fpdf import FPDF
 from math import pi
 import requests
-from geopy.geocoders import Nominatim
 import folium
 from streamlit_folium import folium_static
-from geopy.extra.rate_limiter import RateLimiter
+from zoeken import NotitieIndex
+from geocodering import GeocodeerService, Gazetteer, GAZETTEER_PAD
 
 # ======================
 # CONSTANTEN - AANGEPASTE VERSIE MET DUIDELIJKERE BEOORDELINGEN
@@ -107,12 +107,21 @@ SCORE_COLORS = {
     5: "#1b9e75"   # Donkergroen
 }
 
-@st.cache_data(show_spinner=False, ttl=3600)
+@st.cache_resource(show_spinner=False)
+def get_gazetteer():
+    """Offline adresboek (GAZETTEER_CSV) één keer per proces inladen; None als er geen is"""
+    if GAZETTEER_PAD and os.path.exists(GAZETTEER_PAD):
+        return Gazetteer.laad_csv(GAZETTEER_PAD)
+    return None
+
+@st.cache_resource(show_spinner=False)
+def get_geocoder():
+    """Eén geocodeerservice per proces: offline adresboek, persistente cache, gedeelde HTTP-sessie en rate limiter"""
+    return GeocodeerService(gazetteer=get_gazetteer())
+
 def cached_geocode(address):
     """Gecachede versie van geolocatie-opzoekingen"""
-    geolocator = Nominatim(user_agent="cached_locator")
-    geocode = RateLimiter(geolocator.geocode, min_delay_seconds=1)
-    return geocode(address)
+    return get_geocoder().geocode(address)
 
 # ======================
 # PDF HULPFUNCTIES
@@ -259,10 +268,20 @@ def create_radar_chart(df, locaties):
     plt.legend(loc='upper right', bbox_to_anchor=(1.3, 1.1))
     return fig
 
+def get_notitie_index():
+    """BM25-index over de opmerkingen van deze sessie; één keer opgebouwd en daarna bijgewerkt"""
+    if 'notitie_index' not in st.session_state:
+        index = NotitieIndex()
+        notities = st.session_state.df.loc[st.session_state.df["Opmerkingen"].notna(), ["Locatie", "Opmerkingen"]]
+        index.indexeer_batch(notities.itertuples(index=False, name=None))
+        st.session_state.notitie_index = index
+    return st.session_state.notitie_index
+
 def verwijder_locatie(locatie):
     """Verwijder een locatie uit de dataset"""
     if locatie in st.session_state.df["Locatie"].values:
         st.session_state.df = st.session_state.df[st.session_state.df["Locatie"] != locatie]
+        get_notitie_index().verwijder(locatie)
         st.success(f"Locatie '{locatie}' is verwijderd")
         st.rerun()
     else:
@@ -270,10 +289,8 @@ def verwijder_locatie(locatie):
 
 def get_coordinates(address):
     """Haal coördinaten op voor een adres met geopy"""
-    geolocator = Nominatim(user_agent="locatie_beoordeling_app")
-    geocode = RateLimiter(geolocator.geocode, min_delay_seconds=1)
     try:
-        location = geocode(address)
+        location = cached_geocode(address)
         if location:
             return (location.latitude, location.longitude)
         return None
@@ -301,8 +318,7 @@ def validate_location(address):
         return False, "Voer een adres in"
 
     try:
-        geolocator = Nominatim(user_agent="locatie_app")
-        location = geolocator.geocode(address)
+        location = cached_geocode(address)
         if not location:
             return False, "Adres niet gevonden - voer coördinaten handmatig in"
         return True, f"Locatie bevestigd: {location.address}"
@@ -411,6 +427,7 @@ def toon_locatie_formulier():
 
                 # Voeg toe aan dataframe
                 st.session_state.df = pd.concat([st.session_state.df, pd.DataFrame([nieuwe_locatie])], ignore_index=True)
+                get_notitie_index().indexeer(naam, opmerkingen)
                 st.success(f"Locatie '{naam}' succesvol toegevoegd!")
                 st.session_state.form_submitted = True
                 st.rerun()
@@ -777,6 +794,7 @@ with tab1:
             )
             if st.button("Opslaan", key=f"save_opmerkingen_{selected_location}"):
                 st.session_state.df.at[loc_index, "Opmerkingen"] = nieuwe_opmerking
+                get_notitie_index().indexeer(selected_location, nieuwe_opmerking)
                 st.success("Opmerkingen opgeslagen!")
                 
 
@@ -885,6 +903,8 @@ with tab4:
             # Basis zoekopdracht
             search_query = st.text_input("Adres, plaatsnaam of postcode",
                                        help="Laat leeg om alle locaties te doorzoeken")
+            notitie_query = st.text_input("Zoek in opmerkingen",
+                                          help="Bijv. 'geluidsoverlast' of 'sanering'; 'geluid*' zoekt op het begin van een woord")
 
             # Locatiefilters
             with st.expander("📍 Locatiefilters", expanded=True):
@@ -906,8 +926,7 @@ with tab4:
 
                 if search_query and radius_km > 0:
                     try:
-                        geolocator = Nominatim(user_agent="radius_search_app")
-                        location = geolocator.geocode(search_query)
+                        location = cached_geocode(search_query)
                         if location:
                             st.success(f"Centrumpunt: {location.address[:50]}...")
                             center_coords = (location.latitude, location.longitude)
@@ -997,6 +1016,12 @@ with col_results:
                 if min_score > 0:
                     search_df = search_df[search_df[criterium] >= min_score]
 
+            if notitie_query:
+                notitie_treffers = dict(get_notitie_index().zoek(notitie_query, limiet=None))
+                search_df = search_df[search_df['Locatie'].isin(list(notitie_treffers))]
+                search_df = search_df.assign(**{'Relevantie opmerkingen': search_df['Locatie'].map(notitie_treffers).round(2)})
+                search_df = search_df.sort_values('Relevantie opmerkingen', ascending=False)
+
             # Kaartweergave
             if not search_df.empty:
                 map_center = center_coords if (radius_km > 0 and center_coords) else [52.1326, 5.2913]
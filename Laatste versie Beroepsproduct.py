@@ -10,11 +10,13 @@ import os
 from fpdf import FPDF
 from math import pi
 import requests
-from geopy.geocoders import Nominatim
 import folium
 from streamlit_folium import folium_static
-from geopy.extra.rate_limiter import RateLimiter
 import plotly.express as px
+from ruimtelijk import RuimtelijkeIndex
+from geocodering import GeocodeerService, Gazetteer, GAZETTEER_PAD
+from scoremodel import Ranglijst
+from beslispaneel import get_weging, toon_weging_invoer, toon_ranglijst, toon_gevoeligheid, toon_pareto
 
 # ======================
 # CONSTANTEN - AANGEPASTE VERSIE MET DUIDELIJKERE BEOORDELINGEN
@@ -108,12 +110,29 @@ SCORE_COLORS = {
     5: "#1b9e75"   # Donkergroen
 }
 
-@st.cache_data(show_spinner=False, ttl=3600)
+# Standaardweging van de eindscore in procenten; aan te passen in de zijbalk
+GEWICHTEN = {
+    "Bestemmingsplan": 30,
+    "Bereikbaarheid": 30,
+    "Locatiekenmerken": 20,
+    "Milieu": 20
+}
+
+@st.cache_resource(show_spinner=False)
+def get_gazetteer():
+    """Offline adresboek (GAZETTEER_CSV) één keer per proces inladen; None als er geen is"""
+    if GAZETTEER_PAD and os.path.exists(GAZETTEER_PAD):
+        return Gazetteer.laad_csv(GAZETTEER_PAD)
+    return None
+
+@st.cache_resource(show_spinner=False)
+def get_geocoder():
+    """Eén geocodeerservice per proces: offline adresboek, persistente cache, gedeelde HTTP-sessie en rate limiter"""
+    return GeocodeerService(gazetteer=get_gazetteer())
+
 def cached_geocode(address):
     """Gecachede versie van geolocatie-opzoekingen"""
-    geolocator = Nominatim(user_agent="cached_locator")
-    geocode = RateLimiter(geolocator.geocode, min_delay_seconds=1)
-    return geocode(address)
+    return get_geocoder().geocode(address)
 
 # ======================
 # PDF HULPFUNCTIES
@@ -218,10 +237,30 @@ def create_radar_chart(df, locaties):
     plt.legend(loc='upper right', bbox_to_anchor=(1.3, 1.1))
     return fig
 
+def get_ruimtelijke_index():
+    """Rasterindex over de coördinaten; één keer per sessie opgebouwd en daarna bijgewerkt"""
+    if 'ruimtelijke_index' not in st.session_state:
+        st.session_state.ruimtelijke_index = RuimtelijkeIndex.van_dataframe(st.session_state.df)
+    return st.session_state.ruimtelijke_index
+
+def nieuwe_dataversie():
+    """Na elke wijziging van de locaties of hun criteria; afgeleide caches bouwen zich dan opnieuw op"""
+    st.session_state.df_versie = st.session_state.get('df_versie', 0) + 1
+
+def get_ranglijst():
+    """Criteriummatrix van de sessie; alleen opnieuw opgebouwd bij een nieuwe dataversie"""
+    versie = st.session_state.get('df_versie', 0)
+    if st.session_state.get('ranglijst') is None or st.session_state.get('ranglijst_versie') != versie:
+        st.session_state.ranglijst = Ranglijst(st.session_state.df.reindex(columns=["Locatie"] + list(GEWICHTEN)), GEWICHTEN)
+        st.session_state.ranglijst_versie = versie
+    return st.session_state.ranglijst
+
 def verwijder_locatie(locatie):
     """Verwijder een locatie uit de dataset"""
     if locatie in st.session_state.df["Locatie"].values:
         st.session_state.df = st.session_state.df[st.session_state.df["Locatie"] != locatie]
+        get_ruimtelijke_index().verwijder(locatie)
+        nieuwe_dataversie()
         st.success(f"Locatie '{locatie}' is verwijderd")
         st.rerun()
     else:
@@ -229,10 +268,8 @@ def verwijder_locatie(locatie):
 
 def get_coordinates(address):
     """Haal coördinaten op voor een adres met geopy"""
-    geolocator = Nominatim(user_agent="locatie_beoordeling_app")
-    geocode = RateLimiter(geolocator.geocode, min_delay_seconds=1)
     try:
-        location = geocode(address)
+        location = cached_geocode(address)
         if location:
             return (location.latitude, location.longitude)
         return None
@@ -260,8 +297,7 @@ def validate_location(address):
         return False, "Voer een adres in"
 
     try:
-        geolocator = Nominatim(user_agent="locatie_app")
-        location = geolocator.geocode(address)
+        location = cached_geocode(address)
         if not location:
             return False, "Adres niet gevonden - voer coördinaten handmatig in"
         return True, f"Locatie bevestigd: {location.address}"
@@ -375,6 +411,8 @@ def toon_locatie_formulier():
 
                 # Voeg toe aan dataframe
                 st.session_state.df = pd.concat([st.session_state.df, pd.DataFrame([nieuwe_locatie])], ignore_index=True)
+                get_ruimtelijke_index().voeg_toe(naam, latitude, longitude)
+                nieuwe_dataversie()
                 st.success(f"Locatie '{naam}' succesvol toegevoegd!")
                 st.session_state.form_submitted = True
                 st.rerun()
@@ -801,13 +839,8 @@ with tab1:
 
         # Alleen berekenen als alle velden zijn ingevuld
         if all([bestemmingsplan, len(bereik_scores) == 3, stroom, natura]):
-            # Gewichten en scores
-            gewichten = {
-                "Bestemmingsplan": 0.30,
-                "Bereikbaarheid": 0.30,
-                "Locatiekenmerken": 0.20,
-                "Milieu": 0.20
-            }
+            # Gewichten uit de zijbalk en scores
+            weging = get_weging(GEWICHTEN)
 
             scores = {
                 "Bestemmingsplan": bestemmingsplan_score,
@@ -816,7 +849,7 @@ with tab1:
                 "Milieu": milieu_score
             }
 
-            totaalscore = sum(scores[k] * gewichten[k] * 20 for k in scores)
+            totaalscore = weging.totaal(scores)
             totaalscore = min(max(totaalscore, 0), 100)
 
             # Staafdiagram
@@ -850,12 +883,9 @@ with tab1:
 
             with col2:
                 st.markdown("**Toelichting weging:**")
-                st.caption("""
-                - Bestemmingsplan: 30%
-                - Bereikbaarheid: 30%
-                - Locatiekenmerken: 20%
-                - Milieu & Klimaat: 20%
-                """)
+                st.caption("\n".join(
+                    f"- {categorie}: {percentage:.0f}%" for categorie, percentage in weging.percentages().items()
+                ))
                 
             if (
                 'bestemmingsplan_score' in locals()
@@ -866,6 +896,10 @@ with tab1:
                 and 'nuts_score' in locals()
                 and stroom  # stroom moet ingevuld zijn
             ):
+                # Dit blok draait bij elke rerun; alleen een echt gewijzigd criterium is een nieuwe dataversie
+                rij = st.session_state.df["Locatie"] == selected_location
+                criteria_voor = st.session_state.df.loc[rij].reindex(columns=list(GEWICHTEN)).to_numpy().tolist()
+
                 st.session_state.df.loc[
                     st.session_state.df["Locatie"] == selected_location,
                     "Bestemmingsplan"
@@ -900,6 +934,9 @@ with tab1:
                     st.session_state.df["Locatie"] == selected_location,
                     "Stroomaansluiting tekst"
                 ] = stroom
+
+                if st.session_state.df.loc[rij].reindex(columns=list(GEWICHTEN)).to_numpy().tolist() != criteria_voor:
+                    nieuwe_dataversie()
             else:
                 st.warning("Niet alle velden zijn ingevuld, dus de scores worden nog niet opgeslagen.")
 
@@ -1004,7 +1041,7 @@ with tab2:
 
             # Totaalscore ranking
             st.markdown("🏆 Totaalscore ranking")
-            total_scores = st.session_state.df[st.session_state.df["Locatie"].isin(selected_locs)].set_index("Locatie")[list(SCORE_LEGEND.keys())].sum(axis=1)
+            total_scores = get_ranglijst().rangschik(get_weging(GEWICHTEN)).set_index("Locatie")["Totaalscore"].loc[selected_locs]
 
             # Tabel + staafdiagram in kolommen
             col1, col2 = st.columns([1, 2])
@@ -1018,27 +1055,38 @@ with tab2:
             with col2:
                 fig2, ax2 = plt.subplots(figsize=(10, 4))
                 sorted_scores = total_scores.sort_values(ascending=True)
-                color_list = [SCORE_COLORS[min(5, max(1, round(score/(len(SCORE_LEGEND)*5*0.2))))] for score in sorted_scores]
+                color_list = [SCORE_COLORS[min(5, max(1, round(score/20)))] for score in sorted_scores]
                 sorted_scores.plot(
                     kind='barh',
                     color=color_list,
                     ax=ax2
                 )
                 ax2.set_title("Totaalscore vergelijking")
-                ax2.set_xlabel("Score")
-                ax2.set_xlim(0, len(SCORE_LEGEND)*5)
+                ax2.set_xlabel("Gewogen score (0-100)")
+                ax2.set_xlim(0, 100)
 
                 # Voeg scorelabels toe
                 for p in ax2.patches:
                     width = p.get_width()
                     ax2.text(width + 0.5, p.get_y() + p.get_height()/2,
-                             f"{int(width)}",
+                             f"{width:.0f}",
                              ha='left', va='center')
 
                 st.pyplot(fig2)
         else:
             st.warning("Selecteer minimaal 1 locatie")
 
+        # Gewogen ranglijst van alle locaties; een ander wegingsprofiel is één matrix-vectorproduct
+        st.markdown("⚖️ Gewogen ranking van alle locaties")
+        weging = get_weging(GEWICHTEN)
+        ranking = toon_ranglijst(get_ranglijst(), weging, selected_locs)
+
+        # Hoe stabiel is de ranglijst als de weging een beetje anders was geweest?
+        toon_gevoeligheid(get_ranglijst(), weging, selected_locs)
+
+        # Locaties die bij geen enkele weging door een andere locatie overtroffen worden
+        toon_pareto(get_ranglijst(), ranking, selected_locs)
+
 with tab4:
     # ======================
     # TAB 4: LOCATIE ZOEKEN
@@ -1076,8 +1124,7 @@ with tab4:
 
                 if search_query and radius_km > 0:
                     try:
-                        geolocator = Nominatim(user_agent="radius_search_app")
-                        location = geolocator.geocode(search_query)
+                        location = cached_geocode(search_query)
                         if location:
                             st.success(f"Centrumpunt: {location.address[:50]}...")
                             center_coords = (location.latitude, location.longitude)
@@ -1124,18 +1171,13 @@ with col_results:
 
             # Straalfilter toepassen (eerste filter)
             if radius_km > 0 and center_coords:
-                from geopy.distance import geodesic
                 try:
-                    search_df = search_df[
-                        search_df.apply(
-                            lambda row: (
-                                pd.notna(row['Latitude']) and
-                                pd.notna(row['Longitude']) and
-                                geodesic(center_coords, (row['Latitude'], row['Longitude'])).km <= radius_km
-                            ),
-                            axis=1
-                        )
-                    ]
+                    # Ruimtelijke index: alleen de rastercellen rond het centrum worden bekeken
+                    straal_treffers = get_ruimtelijke_index().straal(center_coords, radius_km, volgorde_km=50.0)
+                    search_df = search_df[search_df['Locatie'].isin(straal_treffers.keys())]
+                    search_df = search_df.assign(
+                        **{'Afstand (km)': search_df['Locatie'].map(straal_treffers).round(2)}
+                    ).sort_values('Afstand (km)')
                     st.success(f"{len(search_df)} locaties gevonden binnen {radius_km} km van {search_query}")
                 except Exception as e:
                     st.error(f"Fout bij straalfilter: {e}")
@@ -1247,6 +1289,12 @@ with st.sidebar:
                                 )
                 st.caption("Genereer een uitgebreid PDF rapport voor de geselecteerde locatie")
 
+    with st.expander("⚖️ Weging eindscore", expanded=False):
+        toon_weging_invoer(GEWICHTEN)
+        st.caption("Gewichten worden naar verhouding toegepast: " + ", ".join(
+            f"{categorie} {percentage:.0f}%" for categorie, percentage in get_weging(GEWICHTEN).percentages().items()
+        ))
+
     # Toon geselecteerde locatie in opvallend wit vakje
     if 'loc_select' in st.session_state:
         selected_location = st.session_state.loc_select
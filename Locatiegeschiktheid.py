@@ -5,14 +5,22 @@ import seaborn as sns
 from datetime import datetime
 from io import BytesIO
 import tempfile
+import json
+import hashlib
 import os
+import time
 from fpdf import FPDF
 from math import pi
 import requests
-from geopy.geocoders import Nominatim
 import folium
-from streamlit_folium import folium_static
-from geopy.extra.rate_limiter import RateLimiter
+from streamlit_folium import folium_static, st_folium
+from locatie_opslag import LocatieOpslag, LocatieSchema, GedeeldePortefeuille, SessieOverlay, geheugen_rapport
+from locatie_import import importeer, ONDERSTEUNDE_BESTANDEN
+from geocodering import GeocodeerService, BatchGeocoder, Gazetteer, GAZETTEER_PAD
+from ruimtelijk import afstanden_tot, polygonen_uit_geojson, PolygoonIndex
+from zoeken import FilterBitmaps, ZoekCache, normaliseer_tekst
+from scoremodel import ScoreModel, Ranglijst
+from beslispaneel import get_weging, toon_weging_invoer, toon_ranglijst, toon_gevoeligheid, toon_pareto
 
 # ======================
 # CONSTANTEN - AANGEPASTE VERSIE
@@ -98,6 +106,19 @@ SCORE_LEGEND = {
     }
 }
 
+# Antwoorden per subcriterium worden als eigen kolom bewaard
+SUBCRITERIA = [sub for criteria in SCORE_LEGEND.values() for sub in criteria]
+
+MAX_ZOEKSTRAAL_KM = 50.0
+
+# Standaardweging van de categorieën in procenten (gelijk gewogen = de gewone totaalscore)
+GEWICHTEN = {
+    "Ruimtelijke Inpassing": 25,
+    "Milieunormen": 25,
+    "Veiligheid": 25,
+    "Bereikbaarheid": 25
+}
+
 SCORE_COLORS = {
     1: "#ff6b6b",  # Rood
     2: "#ffa502",  # Oranje
@@ -106,11 +127,21 @@ SCORE_COLORS = {
     5: "#1b9e75"   # Donkergroen
 }
 
-@st.cache_data(show_spinner=False, ttl=3600)
+@st.cache_resource(show_spinner=False)
+def get_gazetteer():
+    """Offline adresboek (GAZETTEER_CSV) één keer per proces inladen; None als er geen is"""
+    if GAZETTEER_PAD and os.path.exists(GAZETTEER_PAD):
+        return Gazetteer.laad_csv(GAZETTEER_PAD)
+    return None
+
+@st.cache_resource(show_spinner=False)
+def get_geocoder():
+    """Eén geocodeerservice per proces: offline adresboek, persistente cache, gedeelde HTTP-sessie en rate limiter"""
+    return GeocodeerService(gazetteer=get_gazetteer())
+
 def cached_geocode(address):
     """Gecachede versie van geolocatie-opzoekingen"""
-    geolocator = Nominatim(user_agent="cached_locator")
-    return geolocator.geocode(address)
+    return get_geocoder().geocode(address)
 
 # ======================
 # PDF HULPFUNCTIES
@@ -142,7 +173,7 @@ def generate_pdf(locatie):
         pdf.ln(20)
         
         # Locatiegegevens
-        loc_data = st.session_state.df[st.session_state.df["Locatie"] == locatie].iloc[0]
+        loc_data = get_locatie_rij(locatie)
         
         # 1. Scoretabel + Totaalscore
         pdf.set_font("Arial", size=14, style='B')
@@ -226,7 +257,8 @@ def hex_to_rgb(hex_color):
 def create_bar_chart(locatie):
     """Maak staafdiagram voor PDF"""
     fig, ax = plt.subplots(figsize=(10, 5))
-    data = st.session_state.df[st.session_state.df["Locatie"] == locatie][list(SCORE_LEGEND.keys())].T
+    label = st.session_state.locatie_index.get(locatie)
+    data = st.session_state.df.loc[[label], list(SCORE_LEGEND.keys())].T
     data.plot(kind='bar', ax=ax, color=[SCORE_COLORS[x] for x in data.values[0]])
     plt.title(f"Scores voor {locatie}")
     plt.xticks(rotation=45)
@@ -241,8 +273,9 @@ def create_radar_chart(df, locaties):
     fig = plt.figure(figsize=(8, 8))
     ax = fig.add_subplot(111, polar=True)
     
+    waarden = df.set_index("Locatie")[categories]
     for loc in locaties:
-        values = df[df["Locatie"] == loc][categories].values.flatten().tolist()
+        values = waarden.loc[[loc]].values.flatten().tolist()
         values += values[:1]
         angles = [n / float(N) * 2 * pi for n in range(N)]
         angles += angles[:1]
@@ -259,8 +292,10 @@ def create_radar_chart(df, locaties):
 
 def verwijder_locatie(locatie):
     """Verwijder een locatie uit de dataset"""
-    if locatie in st.session_state.df["Locatie"].values:
-        st.session_state.df = st.session_state.df[st.session_state.df["Locatie"] != locatie]
+    if locatie in st.session_state.locatie_index:
+        get_portefeuille().verwijder(locatie)
+        st.session_state.overlay.leeg(locatie)
+        zet_dataset()
         st.success(f"Locatie '{locatie}' is verwijderd")
         st.rerun()
     else:
@@ -268,9 +303,8 @@ def verwijder_locatie(locatie):
 
 def get_coordinates(address):
     """Haal coördinaten op voor een adres met geopy"""
-    geolocator = Nominatim(user_agent="locatie_beoordeling_app")
     try:
-        location = geolocator.geocode(address)
+        location = cached_geocode(address)
         if location:
             return (location.latitude, location.longitude)
         return None
@@ -278,6 +312,14 @@ def get_coordinates(address):
         st.error(f"Fout bij ophalen coördinaten: {str(e)}")
         return None
 
+def geocodeer_adressen(adressen, voortgang=None):
+    """Geocodeer een lijst adressen parallel (binnen de rate limit van de service)"""
+    resultaten = BatchGeocoder(get_geocoder()).geocodeer(adressen, voortgang)
+    return {
+        adres: (location.latitude, location.longitude)
+        for adres, location in resultaten.items() if location
+    }
+
 def show_map(latitude, longitude, zoom=15):
     """Toon een interactieve kaart met folium"""
     if latitude and longitude:
@@ -298,8 +340,7 @@ def validate_location(address):
         return False, "Voer een adres in"
     
     try:
-        geolocator = Nominatim(user_agent="locatie_app")
-        location = geolocator.geocode(address)
+        location = cached_geocode(address)
         if not location:
             return False, "Adres niet gevonden - voer coördinaten handmatig in"
         return True, f"Locatie bevestigd: {location.address}"
@@ -308,21 +349,109 @@ def validate_location(address):
 
 def suggest_similar_locations(address):
     """Suggesties voor vergelijkbare locaties om duplicaten te voorkomen"""
-    existing_locations = st.session_state.df['Locatie'].unique()
-    matches = [loc for loc in existing_locations if address.lower() in loc.lower()]
-    return matches if matches else None
+    treffers = get_portefeuille().tekst_index().zoek(address, limiet=10, velden=("Locatie",))
+    return [locatie for locatie, _ in treffers] or None
 
 # ======================
 # DATA INITIALISATIE
 # ======================
+BASIS_KOLOMMEN = [
+    "Locatie", "Datum", "Plaats", "Adres", "Latitude", "Longitude",
+    "Oppervlakte",  # Nieuwe kolom toevoegen
+    "Opmerkingen"
+] + list(SCORE_LEGEND.keys()) + SUBCRITERIA
+
+@st.cache_resource(show_spinner=False)
+def get_opslag():
+    """Eén SQLite-verbinding per proces; locaties blijven bewaard na een herstart"""
+    return LocatieOpslag(
+        kolommen=BASIS_KOLOMMEN,
+        schema=LocatieSchema(SCORE_LEGEND.keys(), antwoord_kolommen=SUBCRITERIA)
+    )
+
+@st.cache_resource(show_spinner=False)
+def get_scoremodel():
+    """Scoreregels uit SCORE_LEGEND, één keer per proces omgezet naar matrices"""
+    return ScoreModel(SCORE_LEGEND)
+
+@st.cache_resource(show_spinner=False)
+def get_portefeuille():
+    """Procesbrede momentopname die alle sessies delen in plaats van elk een eigen kopie"""
+    return GedeeldePortefeuille(get_opslag(), BASIS_KOLOMMEN)
+
+@st.cache_resource(show_spinner=False)
+def get_zoekcache():
+    """Zoekresultaten gedeeld door alle sessies, per versie van de portefeuille"""
+    return ZoekCache()
+
+def zet_dataset():
+    """Koppel de sessie aan de gedeelde momentopname plus de eigen niet-opgeslagen wijzigingen"""
+    # Versie vóór de momentopname lezen: een resultaat hoort hooguit bij een oudere versie, nooit andersom
+    st.session_state.dataset_versie = get_portefeuille().versie
+    df, index = get_portefeuille().weergave(st.session_state.overlay)
+    if st.session_state.get('df') is not df:
+        st.session_state.filter_bitmaps = None
+        st.session_state.ranglijst = None
+    st.session_state.df = df
+    st.session_state.locatie_index = index
+
+def get_filter_bitmaps():
+    """Bitmapindex over de scores van de sessieweergave; opnieuw opgebouwd na elke wijziging"""
+    if st.session_state.get('filter_bitmaps') is None:
+        st.session_state.filter_bitmaps = FilterBitmaps(st.session_state.df, SCORE_LEGEND.keys())
+    return st.session_state.filter_bitmaps
+
+def get_ranglijst():
+    """Criteriummatrix van de sessieweergave; opnieuw opgebouwd na elke wijziging, ranglijsten per weging gecachet"""
+    if st.session_state.get('ranglijst') is None:
+        st.session_state.ranglijst = Ranglijst(st.session_state.df, GEWICHTEN)
+    return st.session_state.ranglijst
+
+def facet_tekst(aantallen):
+    """Compacte regel met het aantal treffers per keuze, voor onder een filter"""
+    return "Aantal locaties: " + " · ".join(f"≥{keuze}: {aantal}" for keuze, aantal in aantallen.items())
+
+def facet_basis(bitmaps, min_totaal, min_scores, extra=None):
+    """Bitmap waarbinnen een facet telt: de overige scorefilters plus eventueel een extra filter"""
+    delen = [bitmap for bitmap in (bitmaps.scorefilter(min_totaal, min_scores), extra) if bitmap is not None]
+    return bitmaps.en(*delen) if delen else None
+
+def locaties_bitmap(bitmaps, namen):
+    """Bitmap van de rijen van de gegeven locatienamen (via de hash-index)"""
+    labels = [st.session_state.locatie_index.get(naam) for naam in namen]
+    return bitmaps.van_posities(st.session_state.df.index.get_indexer([label for label in labels if label is not None]))
+
+def get_locatie_rij(locatie):
+    """Zoek een locatie op via de index in plaats van een scan over alle rijen"""
+    label = st.session_state.locatie_index.get(locatie)
+    if label is None:
+        return None
+    return st.session_state.df.loc[label]
 
+def markeer_beoordeeld(locatie):
+    """Onthoud dat de gebruiker deze locatie zelf beoordeeld heeft (niet alleen bekeken)"""
+    st.session_state.setdefault('beoordeeld', set()).add(locatie)
 
-if 'df' not in st.session_state:
-    st.session_state.df = pd.DataFrame(columns=[
-        "Locatie", "Datum", "Adres", "Latitude", "Longitude", 
-        "Oppervlakte",  # Nieuwe kolom toevoegen
-        "Opmerkingen"
-    ] + list(SCORE_LEGEND.keys()))
+def antwoord_widget(widget, label, categorie, subcriterium, locatie, opgeslagen, key,
+                    opties=(5, 3, 1), met_score=False, **kwargs):
+    """Keuze voor één subcriterium uit SCORE_LEGEND; begint bij het opgeslagen antwoord"""
+    opties = list(opties)
+    index = opties.index(int(opgeslagen)) if pd.notna(opgeslagen) and int(opgeslagen) in opties else 0
+    teksten = SCORE_LEGEND[categorie][subcriterium]
+    return widget(
+        label,
+        options=opties,
+        index=index,
+        format_func=(lambda x: f"{x} - {teksten[x]}") if met_score else teksten.get,
+        key=key,
+        on_change=markeer_beoordeeld,
+        args=(locatie,),
+        **kwargs
+    )
+
+if 'overlay' not in st.session_state:
+    st.session_state.overlay = SessieOverlay()
+zet_dataset()
 
 def toon_locatie_formulier():
     if 'form_submitted' not in st.session_state:
@@ -360,6 +489,9 @@ def toon_locatie_formulier():
             if not naam or not datum:
                 st.error("Locatienaam en datum zijn verplichte velden")
                 st.session_state.form_submitted = False
+            elif get_opslag().bestaat(naam):
+                st.error(f"Er bestaat al een locatie met de naam '{naam}'")
+                st.session_state.form_submitted = False
             else:
                 # Alleen adres verifiëren als coördinaten niet handmatig zijn ingevuld
                 if latitude == 0 and longitude == 0:
@@ -394,8 +526,9 @@ def toon_locatie_formulier():
                 for criterium in SCORE_LEGEND.keys():
                     nieuwe_locatie[criterium] = 3
                 
-                # Voeg toe aan dataframe
-                st.session_state.df = pd.concat([st.session_state.df, pd.DataFrame([nieuwe_locatie])], ignore_index=True)
+                # Sla op als losse rij en lees de dataset opnieuw uit de opslag
+                get_portefeuille().voeg_toe(nieuwe_locatie)
+                zet_dataset()
                 st.success(f"Locatie '{naam}' succesvol toegevoegd!")
                 st.session_state.form_submitted = True
                 st.rerun()
@@ -403,6 +536,59 @@ def toon_locatie_formulier():
     if st.session_state.form_submitted:
         st.session_state.form_submitted = False
 
+def toon_bulkimport():
+    """Importeer veel locaties tegelijk uit CSV, GeoJSON of XLSX"""
+    with st.expander("📥 Bulkimport (CSV, GeoJSON, XLSX)", expanded=False):
+        st.caption("Kolommen met dezelfde namen als de CSV-export worden overgenomen; "
+                   "ontbrekende scores krijgen standaard 3 sterren.")
+        bestand = st.file_uploader("Bestand", type=ONDERSTEUNDE_BESTANDEN, key="bulk_bestand")
+        geocoderen = st.checkbox("Coördinaten opzoeken voor rijen zonder Latitude/Longitude", value=False,
+                                 help="Langzaam bij veel adressen: maximaal één adres per seconde")
+        if bestand is not None and st.button("Importeren", key="bulk_importeren"):
+            voortgang = st.progress(0.0, text="Importeren...")
+            try:
+                resultaat = importeer(
+                    get_opslag(), bestand, bestand.name,
+                    geocodeer=geocodeer_adressen if geocoderen else None,
+                    voortgang=lambda n: voortgang.progress(min(bestand.tell() / max(bestand.size, 1), 1.0),
+                                                           text=f"{n} rijen verwerkt")
+                )
+            except Exception as e:
+                st.error(f"Import afgebroken: {str(e)} (eerder verwerkte blokken zijn wel opgeslagen)")
+                return
+            finally:
+                voortgang.empty()
+                get_portefeuille().ververs()
+                zet_dataset()
+
+            st.success(f"{resultaat['toegevoegd']} van {resultaat['verwerkt']} locaties geïmporteerd")
+            if not resultaat["fouten"].empty:
+                st.warning(f"{len(resultaat['fouten'])} rijen overgeslagen")
+                st.dataframe(resultaat["fouten"], use_container_width=True)
+
+        # Locaties zonder coördinaten (bijv. uit een import) alsnog geocoderen
+        df = st.session_state.df
+        zonder_coords = df[(df["Latitude"].isna() | df["Longitude"].isna()) & df["Adres"].notna()]
+        if not zonder_coords.empty:
+            st.markdown(f"**{len(zonder_coords)} locaties zonder coördinaten**")
+            if st.button("🔁 Coördinaten aanvullen", key="coords_aanvullen",
+                         help="Kan worden onderbroken; al gevonden adressen worden bij een nieuwe poging uit de cache gehaald"):
+                voortgang = st.progress(0.0, text="Geocoderen...")
+                gevonden = geocodeer_adressen(
+                    zonder_coords["Adres"].tolist(),
+                    voortgang=lambda klaar, totaal: voortgang.progress(klaar / totaal, text=f"{klaar}/{totaal} adressen")
+                )
+                opslag = get_opslag()
+                with opslag.transactie():
+                    for naam, adres in zip(zonder_coords["Locatie"], zonder_coords["Adres"]):
+                        if adres in gevonden:
+                            lat, lon = gevonden[adres]
+                            opslag.werk_bij(naam, {"Latitude": lat, "Longitude": lon})
+                get_portefeuille().ververs()
+                zet_dataset()
+                voortgang.empty()
+                st.success(f"Coördinaten gevonden voor {sum(a in gevonden for a in zonder_coords['Adres'])} locaties")
+
 
 # ======================
 # PAGINA LAYOUT - TABBEN
@@ -444,6 +630,7 @@ with tab3:
     # ======================
     st.title("➕ Nieuwe Locatie Toevoegen")
     toon_locatie_formulier()
+    toon_bulkimport()
     
     # Toon bestaande locaties met verwijderoptie
     if not st.session_state.df.empty:
@@ -453,7 +640,7 @@ with tab3:
         for idx, row in st.session_state.df[["Locatie", "Datum", "Adres"]].iterrows():
             cols = st.columns([4, 1])
             with cols[0]:
-                st.write(f"**{row['Locatie']}** - {row['Datum']}")
+                st.write(f"**{row['Locatie']}** - {row['Datum']:%Y-%m-%d}")
                 if pd.notna(row['Adres']):
                     st.caption(f"Adres: {row['Adres']}")
             with cols[1]:
@@ -473,12 +660,12 @@ with tab1:
         )
         
         # --- Locatiedetails & Kaart ---
-        locatie_details = st.session_state.df[st.session_state.df["Locatie"] == selected_location].iloc[0]
+        locatie_details = get_locatie_rij(selected_location)
         col_details, col_map = st.columns([2, 1])
         
         with col_details:
             with st.expander("📌 Locatiedetails", expanded=True):
-                st.write(f"**Invoerdatum:** {locatie_details['Datum']}")
+                st.write(f"**Invoerdatum:** {locatie_details['Datum']:%Y-%m-%d}")
                 if pd.notna(locatie_details['Adres']):
                     st.write(f"**Adres:** {locatie_details['Adres']}")
                 if pd.notna(locatie_details['Latitude']) and pd.notna(locatie_details['Longitude']):
@@ -498,169 +685,84 @@ with tab1:
         # --- Objectieve beoordeling ---
         st.subheader("🏗️ Bouwlocatie Beoordeling")
         
+        def vraag(widget, label, categorie, subcriterium, key, **kwargs):
+            return antwoord_widget(widget, label, categorie, subcriterium, selected_location,
+                                   locatie_details.get(subcriterium), key, **kwargs)
+
         # RUIMTELIJKE INPASSING
+        antwoorden = {}
         with st.expander("🏙️ Ruimtelijke Inpassing", expanded=True):
-            bestemmingsplan = st.radio(
+            antwoorden["Bestemmingsplan"] = vraag(
+                st.radio,
                 "Past het project binnen het omgevingsplan?",
-                options=["Ja (volledig passend)", "Nee (niet passend)", "Gedeeltelijk (aanpassingen nodig)"],
-                key=f"bestemmingsplan_{selected_location}"
+                "Ruimtelijke Inpassing", "Bestemmingsplan",
+                key=f"bestemmingsplan_{selected_location}",
+                opties=(5, 1, 3)
             )
             
-            if bestemmingsplan == "Nee (niet passend)":
+            if antwoorden["Bestemmingsplan"] == 1:
                 st.error("⚠️ Locatie ongeschikt - bestemmingsplan conflict")
-                ruimtelijke_score = 1
             else:
-                kadastraal = st.selectbox(
-                    "Kadastrale beperkingen",
-                    options=["Geen beperkingen", "Beperkte erfdienstbaarheden", "Zware beperkingen"],
+                antwoorden["Kadastrale beperkingen"] = vraag(
+                    st.selectbox, "Kadastrale beperkingen", "Ruimtelijke Inpassing", "Kadastrale beperkingen",
                     key=f"kadastraal_{selected_location}"
                 )
-                infrastructuur = st.selectbox(
-                    "Infrastructuurbelemmeringen",
-                    options=["Geen belemmeringen", "Beperkte belemmeringen", "Onoverkomelijke belemmeringen"],
+                antwoorden["Infrastructuur"] = vraag(
+                    st.selectbox, "Infrastructuurbelemmeringen", "Ruimtelijke Inpassing", "Infrastructuur",
                     key=f"infrastructuur_{selected_location}"
                 )
-                
-                # Scores berekenen
-                bestemmingsplan_score = 5 if bestemmingsplan.startswith("Ja") else 3
-                kadastraal_score = {
-                    "Geen beperkingen": 5,
-                    "Beperkte erfdienstbaarheden": 3,
-                    "Zware beperkingen": 1
-                }[kadastraal]
-                infra_score = {
-                    "Geen belemmeringen": 5,
-                    "Beperkte belemmeringen": 3,
-                    "Onoverkomelijke belemmeringen": 1
-                }[infrastructuur]
-                
-                ruimtelijke_score = round((bestemmingsplan_score + kadastraal_score + infra_score) / 3)
             
-            st.info(f"**Eindscore ruimtelijk**: {ruimtelijke_score}/5")
+            # Categoriescores komen uit hetzelfde scoremodel als het herberekenen van de hele portefeuille
+            categorie_scores = get_scoremodel().bereken_rij(antwoorden)
+            st.info(f"**Eindscore ruimtelijk**: {categorie_scores['Ruimtelijke Inpassing']}/5")
 
         # MILIEUNORMEN
         with st.expander("🌱 Milieunormen", expanded=True):
-            geluid_score = st.radio(
-                "Geluidsmetingen",
-                options=[1, 3, 5],
-                format_func=lambda x: f"{x} - {SCORE_LEGEND['Milieunormen']['Geluid'][x]}",
-                horizontal=True,
-                key=f"geluid_{selected_location}"
-            )
-            
-            lucht_score = st.radio(
-                "Luchtkwaliteit",
-                options=[1, 3, 5],
-                format_func=lambda x: f"{x} - {SCORE_LEGEND['Milieunormen']['Luchtkwaliteit'][x]}",
-                horizontal=True,
-                key=f"lucht_{selected_location}"
-            )
-            
-            bodem_score = st.radio(
-                "Bodemkwaliteit",
-                options=[1, 3, 5],
-                format_func=lambda x: f"{x} - {SCORE_LEGEND['Milieunormen']['Bodemkwaliteit'][x]}",
-                horizontal=True,
-                key=f"bodem_{selected_location}"
-            )
-            
-            water_score = st.radio(
-                "Waterhuishouding",
-                options=[1, 3, 5],
-                format_func=lambda x: f"{x} - {SCORE_LEGEND['Milieunormen']['Waterhuishouding'][x]}",
-                horizontal=True,
-                key=f"water_{selected_location}"
-            )
+            for subcriterium, label, key in (
+                ("Geluid", "Geluidsmetingen", "geluid"),
+                ("Luchtkwaliteit", "Luchtkwaliteit", "lucht"),
+                ("Bodemkwaliteit", "Bodemkwaliteit", "bodem"),
+                ("Waterhuishouding", "Waterhuishouding", "water"),
+            ):
+                antwoorden[subcriterium] = vraag(
+                    st.radio, label, "Milieunormen", subcriterium,
+                    key=f"{key}_{selected_location}",
+                    opties=(1, 3, 5), met_score=True, horizontal=True
+                )
             
-            milieu_score = round((geluid_score + lucht_score + bodem_score + water_score) / 4)
-            st.info(f"**Eindscore milieu**: {milieu_score}/5")
+            categorie_scores = get_scoremodel().bereken_rij(antwoorden)
+            st.info(f"**Eindscore milieu**: {categorie_scores['Milieunormen']}/5")
 
         # VEILIGHEID & TECHNIEK
         with st.expander("⚠️ Veiligheid & Techniek", expanded=True):
-            externe_veiligheid = st.selectbox(
-                "Externe veiligheidsrisico's",
-                options=["Geen risico's", "Beperkte risico's", "Onacceptabele risico's"],
-                key=f"veiligheid_{selected_location}"
-            )
-            veiligheid_score = {
-                "Geen risico's": 5,
-                "Beperkte risico's": 3,
-                "Onacceptabele risico's": 1
-            }[externe_veiligheid]
-            
-            bodem_geschikt = st.selectbox(
-                "Bodemgeschiktheid",
-                options=["Ideale bodemgesteldheid", "Bodemverbetering nodig", "Ongeschikte bodem"],
-                key=f"bodem_geschikt_{selected_location}"
-            )
-            bodem_score = {
-                "Ideale bodemgesteldheid": 5,
-                "Bodemverbetering nodig": 3,
-                "Ongeschikte bodem": 1
-            }[bodem_geschikt]
-            
-            bouwtechniek = st.selectbox(
-                "Bouwtechnische eisen",
-                options=["Geen bijzondere maatregelen", "Aanpassingen vereist", "Fundamentele problemen"],
-                key=f"bouwtechniek_{selected_location}"
-            )
-            techniek_score = {
-                "Geen bijzondere maatregelen": 5,
-                "Aanpassingen vereist": 3,
-                "Fundamentele problemen": 1
-            }[bouwtechniek]
+            for subcriterium, label, key in (
+                ("Externe veiligheid", "Externe veiligheidsrisico's", "veiligheid"),
+                ("Bodemgeschiktheid", "Bodemgeschiktheid", "bodem_geschikt"),
+                ("Bouwtechniek", "Bouwtechnische eisen", "bouwtechniek"),
+            ):
+                antwoorden[subcriterium] = vraag(
+                    st.selectbox, label, "Veiligheid", subcriterium,
+                    key=f"{key}_{selected_location}"
+                )
             
-            veiligheid_techniek_score = round((veiligheid_score + bodem_score + techniek_score) / 3)
-            st.info(f"**Eindscore Veiligheid & Techniek**: {veiligheid_techniek_score}/5")
+            categorie_scores = get_scoremodel().bereken_rij(antwoorden)
+            st.info(f"**Eindscore Veiligheid & Techniek**: {categorie_scores['Veiligheid']}/5")
 
         # BEREIKBAARHEID
         with st.expander("🚗 Bereikbaarheid", expanded=True):
-            wegen = st.selectbox(
-                "Wegontsluiting",
-                options=["Uitstekende ontsluiting", "Voldoende toegangswegen", "Slechte ontsluiting"],
-                key=f"wegen_{selected_location}"
-            )
-            wegen_score = {
-                "Uitstekende ontsluiting": 5,
-                "Voldoende toegangswegen": 3,
-                "Slechte ontsluiting": 1
-            }[wegen]
-            
-            ov = st.selectbox(
-                "Openbaar vervoer",
-                options=["Uitstekend OV-netwerk", "Basis OV-voorzieningen", "Geen OV in buurt"],
-                key=f"ov_{selected_location}"
-            )
-            ov_score = {
-                "Uitstekend OV-netwerk": 5,
-                "Basis OV-voorzieningen": 3,
-                "Geen OV in buurt": 1
-            }[ov]
-            
-            fiets = st.selectbox(
-                "Fietsbereikbaarheid",
-                options=["Uitstekend fietsnetwerk", "Redelijke verbindingen", "Slechte fietsroutes"],
-                key=f"fiets_{selected_location}"
-            )
-            fiets_score = {
-                "Uitstekend fietsnetwerk": 5,
-                "Redelijke verbindingen": 3,
-                "Slechte fietsroutes": 1
-            }[fiets]
-            
-            parkeren = st.selectbox(
-                "Parkeernormen",
-                options=["Ruim voldoende parkeren", "Voldoende parkeren", "Onvoldoende capaciteit"],
-                key=f"parkeren_{selected_location}"
-            )
-            parkeer_score = {
-                "Ruim voldoende parkeren": 5,
-                "Voldoende parkeren": 3,
-                "Onvoldoende capaciteit": 1
-            }[parkeren]
+            for subcriterium, label, key in (
+                ("Wegontsluiting", "Wegontsluiting", "wegen"),
+                ("Openbaar vervoer", "Openbaar vervoer", "ov"),
+                ("Fietsbereikbaarheid", "Fietsbereikbaarheid", "fiets"),
+                ("Parkeren", "Parkeernormen", "parkeren"),
+            ):
+                antwoorden[subcriterium] = vraag(
+                    st.selectbox, label, "Bereikbaarheid", subcriterium,
+                    key=f"{key}_{selected_location}"
+                )
             
-            bereikbaarheid_score = round((wegen_score + ov_score + fiets_score + parkeer_score) / 4)
-            st.info(f"**Eindscore Bereikbaarheid**: {bereikbaarheid_score}/5")
+            categorie_scores = get_scoremodel().bereken_rij(antwoorden)
+            st.info(f"**Eindscore Bereikbaarheid**: {categorie_scores['Bereikbaarheid']}/5")
 
         # --- Visualisaties ---
         st.subheader("📊 Totaalbeoordeling")
@@ -668,7 +770,7 @@ with tab1:
         # Data voorbereiden
         scores_data = {
             "Categorie": ["Ruimtelijk", "Milieu", "Veiligheid", "Bereikbaarheid"],
-            "Score": [ruimtelijke_score, milieu_score, veiligheid_techniek_score, bereikbaarheid_score]
+            "Score": list(categorie_scores.values())
         }
         scores_df = pd.DataFrame(scores_data)
         
@@ -689,12 +791,24 @@ with tab1:
                     ha='center', va='bottom')
         st.pyplot(fig)
         
-        # Update DataFrame
-        loc_index = st.session_state.df[st.session_state.df["Locatie"] == selected_location].index[0]
-        st.session_state.df.at[loc_index, "Ruimtelijke Score"] = ruimtelijke_score
-        st.session_state.df.at[loc_index, "Milieu Score"] = milieu_score
-        st.session_state.df.at[loc_index, "Veiligheid Techniek Score"] = veiligheid_techniek_score
-        st.session_state.df.at[loc_index, "Bereikbaarheid Score"] = bereikbaarheid_score
+        # Update DataFrame: wijzigingen blijven in de sessie-overlay tot ze worden opgeslagen.
+        # Alleen na een eigen keuze, anders zouden de standaardantwoorden geïmporteerde scores overschrijven.
+        gewijzigd = {}
+        if selected_location in st.session_state.get('beoordeeld', ()):
+            gewijzigd = {
+                kolom: waarde for kolom, waarde in {**antwoorden, **categorie_scores}.items()
+                if locatie_details.get(kolom) != waarde
+            }
+        if gewijzigd:
+            st.session_state.overlay.zet(selected_location, gewijzigd)
+            zet_dataset()
+        
+        if selected_location in st.session_state.overlay:
+            st.caption("Deze beoordeling is nog niet opgeslagen voor andere gebruikers")
+            if st.button("💾 Beoordeling opslaan", key=f"opslaan_{selected_location}"):
+                get_portefeuille().werk_bij(selected_location, st.session_state.overlay.haal_op(selected_location))
+                zet_dataset()
+                st.success("Beoordeling opgeslagen")
 
 with tab2:
     # ======================
@@ -783,6 +897,19 @@ with tab2:
         else:
             st.warning("Selecteer minimaal 1 locatie")
 
+        # Gewogen ranglijst van alle locaties; een ander wegingsprofiel is één matrix-vectorproduct
+        st.markdown("⚖️ Gewogen ranking van alle locaties")
+        with st.expander("Weging aanpassen", expanded=False):
+            toon_weging_invoer(GEWICHTEN, naast_elkaar=True)
+        weging = get_weging(GEWICHTEN)
+        ranking = toon_ranglijst(get_ranglijst(), weging, selected_locs)
+
+        # Hoe stabiel is de ranglijst als de weging een beetje anders was geweest?
+        toon_gevoeligheid(get_ranglijst(), weging, selected_locs)
+
+        # Locaties die bij geen enkele weging door een andere locatie overtroffen worden
+        toon_pareto(get_ranglijst(), ranking, selected_locs)
+
 with tab4:
     # ======================
     # TAB 4: LOCATIE ZOEKEN
@@ -793,23 +920,51 @@ with tab4:
     col_filters, col_results = st.columns([1, 2])
     
     with col_filters:
-        with st.form(key='search_form'):
+        # Geen st.form: elke wijziging ververst direct de facet-aantallen (uit de bitmapindex);
+        # de eigenlijke zoekactie gebeurt pas met de knop
+        bitmaps = get_filter_bitmaps()
+        gekozen_scores = {criterium: st.session_state.get(f"zoek_min_{criterium}", 0) for criterium in SCORE_LEGEND}
+        gekozen_totaal = st.session_state.get("zoek_min_totaal", 0)
+        en_logica = st.session_state.get("zoek_logica", "OF") == "EN"
+        with st.container(border=True):
             st.markdown("Zoekfilters")
             
             # Basis zoekopdracht
             search_query = st.text_input("Adres, plaatsnaam of postcode", 
                                        help="Laat leeg om alle locaties te doorzoeken")
+            notitie_query = st.text_input("Zoek in opmerkingen",
+                                          help="Bijv. 'geluidsoverlast' of 'sanering'; 'geluid*' zoekt op het begin van een woord. "
+                                               "Alleen locaties waarvan de opmerkingen overeenkomen worden getoond")
             
             # Locatiefilters
             with st.expander("📍 Locatiefilters", expanded=True):
+                zoekmodus = st.radio("Zoekmodus", ["Binnen straal", "Dichtstbijzijnde locaties", "Meerdere centra", "Gebied"],
+                                     horizontal=True,
+                                     help="Dichtstbijzijnde: de k locaties het dichtst bij het adres. Meerdere centra: binnen de straal "
+                                          "van minstens één adres. Gebied: binnen een GeoJSON-polygoon of een op de kaart getekend gebied. "
+                                          "In deze modi gelden de scorefilters als voorwaarde.")
+                
                 # Straalzoeken (altijd zichtbaar)
-                radius_km = st.slider("Straal zoeken (km)", 0.0, 50.0, 0.0, 0.1,
+                radius_km = st.slider("Straal zoeken (km)", 0.0, MAX_ZOEKSTRAAL_KM, 0.0, 0.1,
                                     help="0 km betekent geen straal filter")
+                aantal_dichtstbij = st.number_input("Aantal dichtstbijzijnde locaties", min_value=1, max_value=100, value=10,
+                                                    help="Alleen gebruikt bij zoekmodus 'Dichtstbijzijnde locaties'")
+                centra_tekst = st.text_area("Centra (één adres per regel)",
+                                            help="Alleen gebruikt bij zoekmodus 'Meerdere centra'")
+                gebied_bestand = st.file_uploader("Gebied (GeoJSON)", type=["geojson", "json"],
+                                                  help="Alleen gebruikt bij zoekmodus 'Gebied', bijv. een gemeentegrens")
+                dichtstbij_modus = zoekmodus == "Dichtstbijzijnde locaties"
+                gebiedsmodus = zoekmodus != "Binnen straal"
                 
-                if search_query and radius_km > 0:
+                if search_query and (radius_km > 0 or dichtstbij_modus):
                     try:
-                        geolocator = Nominatim(user_agent="radius_search_app")
-                        location = geolocator.geocode(search_query)
+                        # Zelfde zoekterm als vorige keer (alleen de straal verschoven): centrum hergebruiken
+                        vorig_centrum = st.session_state.get('zoek_centrum')
+                        if vorig_centrum and vorig_centrum[0] == search_query:
+                            location = vorig_centrum[1]
+                        else:
+                            location = cached_geocode(search_query)
+                            st.session_state.zoek_centrum = (search_query, location)
                         if location:
                             st.success(f"Centrumpunt: {location.address[:50]}...")
                             center_coords = (location.latitude, location.longitude)
@@ -821,16 +976,31 @@ with tab4:
                         center_coords = None
                 else:
                     center_coords = None
+                
+                # Facet: aantal locaties binnen de straal, uit de gesorteerde afstandslijst van het centrum
+                straal_bitmap = None
+                if center_coords and radius_km > 0 and zoekmodus == "Binnen straal":
+                    straal_bitmap = locaties_bitmap(bitmaps, get_portefeuille().ruimtelijke_index().straal(
+                        center_coords, radius_km, volgorde_km=MAX_ZOEKSTRAAL_KM
+                    ))
+                    gekozen_bitmap = bitmaps.scorefilter(gekozen_totaal, gekozen_scores) if en_logica else None
+                    binnen = bitmaps.aantal(straal_bitmap if gekozen_bitmap is None else bitmaps.en(straal_bitmap, gekozen_bitmap))
+                    st.caption(f"{binnen} locatie(s) binnen {radius_km:g} km")
             
-            # Scorefilters met selectboxen
+            # Scorefilters met selectboxen; onder elke keuzelijst het aantal treffers per keuze,
+            # gegeven de overige scorefilters (en bij EN ook de straal)
+            extra_bitmap = straal_bitmap if en_logica else None
             with st.expander("⭐ Scorefilters", expanded=False):
                 # Totaalscore filter
+                totaal_opties = [0, 10, 15, 20, 25, 30]
                 min_total = st.selectbox(
                     "Minimale totaalscore",
-                    options=[0, 10, 15, 20, 25, 30],
+                    options=totaal_opties,
                     index=0,
+                    key="zoek_min_totaal",
                     help="Selecteer minimale totaalscore (0 = geen minimum)"
                 )
+                st.caption(facet_tekst(bitmaps.aantallen_totaal(totaal_opties[1:], facet_basis(bitmaps, 0, gekozen_scores, extra_bitmap))))
                 
                 # Individuele score filters
                 score_filters = {}
@@ -839,11 +1009,33 @@ with tab4:
                         f"Minimum {criterium}",
                         options=[0, 1, 2, 3, 4, 5],
                         index=0,
+                        key=f"zoek_min_{criterium}",
                         help=f"Selecteer minimum score voor {criterium}"
                     )
+                    overige = {ander: score for ander, score in gekozen_scores.items() if ander != criterium}
+                    st.caption(facet_tekst(bitmaps.aantallen(criterium, facet_basis(bitmaps, gekozen_totaal, overige, extra_bitmap))))
+            
+            filter_logica = st.radio("Filters combineren", ["OF", "EN"], horizontal=True, key="zoek_logica",
+                                     format_func=lambda logica: {"OF": "Eén filter volstaat (OF)",
+                                                                 "EN": "Alle filters (EN)"}[logica],
+                                     help="Hoe straal, tekst en scores samen tellen. Bij dichtstbij, meerdere "
+                                          "centra en gebied gelden de scorefilters altijd als voorwaarde")
             
-            # Zoekknop binnen de form
-            submitted = st.form_submit_button("Zoek locaties")
+            submitted = st.button("Zoek locaties", type="primary")
+        
+        # Tekenen kan niet binnen een form; de laatst getekende gebieden blijven in de sessie
+        with st.expander("✏️ Gebied tekenen", expanded=False):
+            teken_kaart = folium.Map(location=[52.1326, 5.2913], zoom_start=7)
+            folium.plugins.Draw(
+                draw_options={"polyline": False, "circle": False, "marker": False, "circlemarker": False},
+                edit_options={"edit": False}
+            ).add_to(teken_kaart)
+            tekening = st_folium(teken_kaart, key="teken_kaart", height=350, width=None,
+                                 use_container_width=True, returned_objects=["all_drawings"])
+            if tekening and tekening.get("all_drawings") is not None:
+                st.session_state.getekende_gebieden = tekening["all_drawings"]
+            st.caption(f"{len(st.session_state.get('getekende_gebieden') or [])} getekend(e) gebied(en); "
+                       "gebruikt bij zoekmodus 'Gebied'")
     
 with col_results:
     if submitted:
@@ -852,51 +1044,154 @@ with col_results:
         if 'df' not in st.session_state or st.session_state.df.empty:
             st.warning("Nog geen locaties beschikbaar - voeg eerst locaties toe")
         else:
-            # Begin met alle locaties
-            search_df = st.session_state.df.copy()
-            filters_applied = False
+            # Begin met alle locaties (alleen lezen, dus zonder kopie)
+            search_df = st.session_state.df
+            
+            # Zelfde zoekopdracht op dezelfde versie van de portefeuille (en met dezelfde niet-opgeslagen
+            # wijzigingen): het resultaat komt uit de gedeelde cache, zonder opnieuw te zoeken of te geocoderen
+            gebied_bron = None
+            if zoekmodus == "Gebied":
+                gebied_bron = (
+                    hashlib.sha1(gebied_bestand.getvalue()).hexdigest() if gebied_bestand is not None else None,
+                    json.dumps(st.session_state.get('getekende_gebieden') or [], sort_keys=True)
+                )
+            zoek_sleutel = (
+                zoekmodus,
+                normaliseer_tekst(search_query),
+                normaliseer_tekst(notitie_query),
+                tuple(round(coordinaat, 6) for coordinaat in center_coords) if center_coords else None,
+                radius_km,
+                int(aantal_dichtstbij) if dichtstbij_modus else None,
+                tuple(normaliseer_tekst(regel) for regel in centra_tekst.splitlines() if regel.strip())
+                if zoekmodus == "Meerdere centra" else None,
+                gebied_bron,
+                min_total,
+                tuple(score_filters.items()),
+                filter_logica,
+                st.session_state.overlay.sleutel(),
+            )
+            versie = st.session_state.dataset_versie
+            zoekcache = get_zoekcache()
+            uit_cache = zoekcache.haal_op(zoek_sleutel, versie)
+            if uit_cache is not None:
+                combined_results, centra, gebieden, meldingen = uit_cache
+            else:
+                meldingen = []
+                # Elk filter levert een bitmap van rijen op; pas na het combineren worden rijen opgehaald
+                filter_bitmaps = []
+                score_bitmap = bitmaps.scorefilter(min_total, score_filters)
             
-            # Maak aparte subsets voor verschillende filters
-            radius_matches = pd.DataFrame()
-            text_matches = pd.DataFrame()
-            score_matches = pd.DataFrame()
+                # 0. Dichtstbij / meerdere centra / gebied: scorefilters als voorwaarde (AND)
+                straal_treffers = None
+                gebied_treffers = None
+                tekst_treffers = None
+                centra = []
+                gebieden = []
+                if gebiedsmodus:
+                    toegestaan = None
+                    if score_bitmap is not None:
+                        toegestaan = set(search_df['Locatie'].to_numpy()[bitmaps.posities(score_bitmap)])
+                    ruimtelijke_index = get_portefeuille().ruimtelijke_index()
+                
+                    if dichtstbij_modus:
+                        if center_coords:
+                            straal_treffers = ruimtelijke_index.dichtstbij(center_coords, int(aantal_dichtstbij), toegestaan)
+                        elif not search_query:
+                            meldingen.append(("info", "Voer een adres in als vertrekpunt voor de dichtstbijzijnde locaties"))
+                
+                    elif zoekmodus == "Meerdere centra":
+                        adressen = [regel.strip() for regel in centra_tekst.splitlines() if regel.strip()]
+                        gevonden = geocodeer_adressen(adressen)
+                        centra = [gevonden[adres] for adres in adressen if adres in gevonden]
+                        niet_gevonden = [adres for adres in adressen if adres not in gevonden]
+                        if niet_gevonden:
+                            meldingen.append(("warning", f"Niet gevonden: {', '.join(niet_gevonden)}"))
+                        if not centra:
+                            meldingen.append(("info", "Voer één of meer adressen in als centra"))
+                        elif radius_km <= 0:
+                            meldingen.append(("info", "Kies een straal groter dan 0 km"))
+                        else:
+                            straal_treffers = ruimtelijke_index.meerdere_centra(centra, radius_km, volgorde_km=MAX_ZOEKSTRAAL_KM)
+                
+                    else:
+                        try:
+                            if gebied_bestand is not None:
+                                gebied_bestand.seek(0)
+                                gebieden += polygonen_uit_geojson(json.load(gebied_bestand))
+                            gebieden += polygonen_uit_geojson(
+                                {"type": "FeatureCollection", "features": st.session_state.get('getekende_gebieden') or []}
+                            )
+                        except (ValueError, KeyError, TypeError, IndexError) as e:
+                            meldingen.append(("error", f"Ongeldig GeoJSON-bestand: {str(e)}"))
+                        if gebieden:
+                            gebied_treffers = ruimtelijke_index.gebied(PolygoonIndex(gebieden))
+                        else:
+                            meldingen.append(("info", "Upload een GeoJSON-gebied of teken een gebied op de kaart"))
+                
+                    treffers = straal_treffers if straal_treffers is not None else gebied_treffers
+                    if treffers and toegestaan is not None:
+                        treffers = {naam: waarde for naam, waarde in treffers.items() if naam in toegestaan}
+                    filter_bitmaps.append(locaties_bitmap(bitmaps, treffers or ()))
             
-            # 1. Straal filter (optioneel)
-            if radius_km > 0 and center_coords:
-                from geopy.distance import geodesic
-                radius_matches = search_df[
-                    search_df.apply(lambda row: 
-                        pd.notna(row['Latitude']) and 
-                        pd.notna(row['Longitude']) and
-                        geodesic(center_coords, (row['Latitude'], row['Longitude'])).km <= radius_km,
-                        axis=1
+                # 1. Straal filter (optioneel)
+                elif radius_km > 0 and center_coords:
+                    # Ruimtelijke index: per centrum één op afstand gesorteerde lijst tot de maximale
+                    # straal, zodat een andere straal alleen een binaire zoekactie is
+                    straal_treffers = get_portefeuille().ruimtelijke_index().straal(
+                        center_coords, radius_km, volgorde_km=MAX_ZOEKSTRAAL_KM
                     )
-                ]
-                filters_applied = True
+                    filter_bitmaps.append(locaties_bitmap(bitmaps, straal_treffers))
             
-            # 2. Tekst filter (optioneel)
-            if search_query:
-                text_matches = search_df[
-                    search_df['Locatie'].str.contains(search_query, case=False) |
-                    search_df['Adres'].str.contains(search_query, case=False)
-                ]
-                filters_applied = True
+                # 2. Tekst filter (optioneel)
+                if search_query and not gebiedsmodus:
+                    # Trigramindex in plaats van str.contains: letterlijke tekst, ook op plaats en
+                    # postcode, met rangschikking en bij een tikfout fuzzy treffers
+                    tekst_treffers = dict(get_portefeuille().tekst_index().zoek(search_query, limiet=None))
+                    filter_bitmaps.append(locaties_bitmap(bitmaps, tekst_treffers))
             
-            # 3. Score filters (optioneel)
-            if min_total > 0 or any(score > 0 for score in score_filters.values()):
-                score_matches = search_df.copy()
-                if min_total > 0:
-                    score_matches['Totaalscore'] = score_matches[list(SCORE_LEGEND.keys())].sum(axis=1)
-                    score_matches = score_matches[score_matches['Totaalscore'] >= min_total]
-                
-                for criterium, min_score in score_filters.items():
-                    if min_score > 0:
-                        score_matches = score_matches[score_matches[criterium] >= min_score]
+                # 3. Score filters (optioneel)
+                if not gebiedsmodus and score_bitmap is not None:
+                    filter_bitmaps.append(score_bitmap)
+            
+                # Combineer de bitmaps (OF of EN tussen filters)
+                if filter_bitmaps:
+                    resultaat = bitmaps.en(*filter_bitmaps) if filter_logica == "EN" else bitmaps.of(*filter_bitmaps)
+                else:
+                    resultaat = bitmaps.alles()
+                # Zoeken in opmerkingen (BM25 over de persistente notitie-index) is altijd een voorwaarde
+                notitie_treffers = None
+                if notitie_query:
+                    notitie_treffers = dict(get_opslag().notities.zoek(notitie_query, limiet=None))
+                    resultaat = bitmaps.en(resultaat, locaties_bitmap(bitmaps, notitie_treffers))
+                combined_results = search_df.iloc[bitmaps.posities(resultaat)] if filter_bitmaps or notitie_query else search_df
+                if notitie_treffers is not None:
+                    combined_results = combined_results.assign(
+                        **{'Relevantie opmerkingen': combined_results['Locatie'].map(notitie_treffers).round(2)}
+                    )
+                    if straal_treffers is None and not tekst_treffers:
+                        combined_results = combined_results.sort_values('Relevantie opmerkingen', ascending=False)
+                if straal_treffers is not None and not combined_results.empty:
+                    # Afstand ook voor tekst-/scoretreffers buiten de straal; binnen de straal de exacte waarde
+                    afstand_km = combined_results['Locatie'].map(straal_treffers)
+                    if center_coords and not centra:
+                        afstand_km = afstand_km.fillna(
+                            pd.Series(afstanden_tot(combined_results, center_coords), index=combined_results.index)
+                        )
+                    combined_results = combined_results.assign(**{'Afstand (km)': afstand_km.round(2)})
+                    combined_results = combined_results.sort_values('Afstand (km)', na_position='last')
+                elif tekst_treffers and not combined_results.empty:
+                    relevantie = combined_results['Locatie'].map(tekst_treffers)
+                    combined_results = combined_results.assign(Relevantie=relevantie.round(2))
+                    combined_results = combined_results.sort_values('Relevantie', ascending=False, na_position='last')
+                if gebied_treffers is not None and not combined_results.empty:
+                    combined_results = combined_results.assign(Gebied=combined_results['Locatie'].map(gebied_treffers))
                 
-                filters_applied = True
+                zoekcache.bewaar(zoek_sleutel, versie, (combined_results, centra, gebieden, meldingen))
             
-            # Combineer resultaten (OR-logica tussen filters)
-            combined_results = pd.concat([radius_matches, text_matches, score_matches]).drop_duplicates() if filters_applied else search_df
+            for soort, melding in meldingen:
+                getattr(st, soort)(melding)
+            if uit_cache is not None:
+                st.caption("⚡ Resultaat uit de zoekcache")
             
             # Toon resultaten
             if not combined_results.empty:
@@ -904,17 +1199,22 @@ with col_results:
                 
                 # Kaart weergeven
                 if not combined_results[['Latitude', 'Longitude']].isna().all().all():
-                    map_center = center_coords if center_coords else [52.1326, 5.2913]
+                    map_center = center_coords if center_coords else (centra[0] if centra else [52.1326, 5.2913])
                     m = folium.Map(location=map_center, zoom_start=10)
                     
-                    if radius_km > 0 and center_coords:
-                        folium.Circle(
-                            center_coords,
-                            radius=radius_km * 1000,
-                            color='#3186cc',
-                            fill=True,
-                            fill_color='#3186cc'
-                        ).add_to(m)
+                    cirkels = centra if centra else ([center_coords] if center_coords and not gebiedsmodus else [])
+                    for cirkel_centrum in cirkels:
+                        if radius_km > 0:
+                            folium.Circle(
+                                cirkel_centrum,
+                                radius=radius_km * 1000,
+                                color='#3186cc',
+                                fill=True,
+                                fill_color='#3186cc'
+                            ).add_to(m)
+                    for naam, ringen in gebieden:
+                        folium.Polygon([ring.tolist() for ring in ringen], tooltip=naam, color='#3186cc',
+                                       fill=True, fill_opacity=0.1).add_to(m)
                     
                     for idx, row in combined_results.iterrows():
                         if pd.notna(row['Latitude']) and pd.notna(row['Longitude']):
@@ -928,7 +1228,7 @@ with col_results:
                 
                 # Toon gedetailleerde tabel
                 with st.expander("📋 Toon details"):
-                    display_df = combined_results.copy()
+                    display_df = combined_results.drop(columns=["RD_X", "RD_Y"], errors="ignore")
                     if 'Totaalscore' not in display_df.columns:
                         display_df['Totaalscore'] = display_df[list(SCORE_LEGEND.keys())].sum(axis=1)
                     
@@ -964,7 +1264,7 @@ with st.sidebar:
             # PDF export
             if 'loc_select' in st.session_state:
                 selected_location = st.session_state.loc_select
-                if selected_location in st.session_state.df["Locatie"].values:
+                if selected_location in st.session_state.locatie_index:
                     if st.button("📄 PDF Rapport"):
                         with st.spinner("Rapport genereren..."):
                             pdf_bytes = generate_pdf(selected_location)
@@ -976,6 +1276,21 @@ with st.sidebar:
                                     mime="application/pdf"
                                 )
                 st.caption("Genereer een uitgebreid PDF rapport voor de geselecteerde locatie")
+    
+    with st.expander("🧮 Geheugengebruik", expanded=False):
+        rapport = geheugen_rapport(st.session_state.df)
+        st.caption(f"{len(st.session_state.df)} locaties, {rapport['Bytes'].sum() / 1024:.1f} KB in totaal")
+        st.dataframe(rapport, use_container_width=True)
+    
+    with st.expander("🔄 Scores herberekenen", expanded=False):
+        st.caption("Pas de scoreregels opnieuw toe op de opgeslagen antwoorden van alle locaties")
+        if st.button("Alle scores herberekenen"):
+            start = time.perf_counter()
+            wijzigingen = get_scoremodel().wijzigingen(get_opslag().laad(BASIS_KOLOMMEN))
+            get_opslag().werk_bij_batch(wijzigingen)
+            get_portefeuille().ververs()
+            zet_dataset()
+            st.success(f"{len(wijzigingen)} locatie(s) bijgewerkt in {time.perf_counter() - start:.2f} s")
         
     # Toon geselecteerde locatie in opvallend wit vakje
     if 'loc_select' in st.session_state:
@@ -1019,8 +1334,8 @@ with st.sidebar:
     </style>
     """, unsafe_allow_html=True)
 
-    if 'loc_select' in st.session_state:
-        loc_data = st.session_state.df[st.session_state.df["Locatie"] == st.session_state.loc_select].iloc[0]
+    if 'loc_select' in st.session_state and st.session_state.loc_select in st.session_state.locatie_index:
+        loc_data = get_locatie_rij(st.session_state.loc_select)
         scores = [loc_data[c] for c in SCORE_LEGEND.keys()]
         totaal = sum(scores)
         max_score = len(scores) * 5
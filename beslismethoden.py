@@ -0,0 +1,190 @@
+from itertools import combinations
+
+import numpy as np
+
+# ======================
+# CONSTANTEN
+# ======================
+# Random Index van Saaty per aantal criteria, voor de consistentieratio van een AHP-matrix
+RANDOM_INDEX = [0.0, 0.0, 0.0, 0.58, 0.90, 1.12, 1.24, 1.32, 1.41, 1.45, 1.49]
+MAX_CONSISTENTIERATIO = 0.1
+
+# PROMETHEE: onverschilligheids- en voorkeursdrempel van de lineaire voorkeursfunctie.
+# Op de 1-5 schaal: 1 punt verschil is een halve voorkeur, 2 punten of meer een volledige.
+PROMETHEE_DREMPELS = (0.0, 2.0)
+
+# Skyline: kandidaten per blok, en maximaal aantal vergelijkingen (kandidaten x frontpunten) per stap
+MAX_VERGELIJKINGEN = 4_000_000
+MAX_BLOK_SKYLINE = 1024
+
+
+# ======================
+# METHODEN
+# ======================
+def gewogen_som(matrix, gewichten):
+    """Gewogen som per locatie (rijen van de matrix)"""
+    return matrix @ gewichten
+
+
+def topsis(matrix, gewichten):
+    """
+    TOPSIS: relatieve nabijheid (0-1) tot de ideale oplossing, na vectornormalisatie per
+    criterium. Alle criteria zijn baten (hoger is beter).
+    """
+    norm = np.sqrt(np.square(matrix).sum(axis=0))
+    norm[norm == 0] = 1.0
+    gewogen = matrix / norm * gewichten
+    tot_ideaal = np.sqrt(np.square(gewogen - gewogen.max(axis=0)).sum(axis=1))
+    tot_anti_ideaal = np.sqrt(np.square(gewogen - gewogen.min(axis=0)).sum(axis=1))
+    noemer = tot_ideaal + tot_anti_ideaal
+    # Zonder verschillen tussen locaties is iedereen ideaal
+    return np.divide(tot_anti_ideaal, noemer, out=np.ones_like(noemer), where=noemer > 0)
+
+
+def voorkeur(verschil, onverschillig=0.0, strikt=0.0):
+    """Lineaire voorkeursfunctie (type V); zonder drempels is elk positief verschil een volledige voorkeur"""
+    if strikt <= onverschillig:
+        return (verschil > onverschillig).astype(np.float64)
+    return np.clip((verschil - onverschillig) / (strikt - onverschillig), 0.0, 1.0)
+
+
+def _voorkeurssom(waarden, aantallen, punten, onverschillig, strikt):
+    """
+    Som over alle waarden u (gesorteerd, met hun aantallen) van aantal_u * voorkeur(punt - u),
+    voor elk punt. De voorkeursfunctie is stuksgewijs lineair, dus met prefixsommen van de
+    aantallen en van aantal * waarde is elke som een paar searchsorted-opzoekingen.
+    """
+    cum_aantal = np.concatenate(([0], np.cumsum(aantallen)))
+    if strikt <= onverschillig:
+        return cum_aantal[np.searchsorted(waarden, punten - onverschillig, side="left")]
+    cum_som = np.concatenate(([0.0], np.cumsum(aantallen * waarden)))
+    # u <= punt - strikt: volledige voorkeur; daartussen tot punt - onverschillig: lineair
+    vol = np.searchsorted(waarden, punten - strikt, side="right")
+    tot = np.searchsorted(waarden, punten - onverschillig, side="left")
+    aantal = cum_aantal[tot] - cum_aantal[vol]
+    som = cum_som[tot] - cum_som[vol]
+    return cum_aantal[vol] + ((punten - onverschillig) * aantal - som) / (strikt - onverschillig)
+
+
+def promethee_ii(matrix, gewichten, drempels=PROMETHEE_DREMPELS):
+    """
+    PROMETHEE II: netto uitgaande stroom (-1 tot 1) per locatie.
+
+    De voorkeur van a boven b is een gewogen som over de criteria, dus de stromen zijn per
+    criterium op te tellen. Per criterium volgt de rij-som van de paarsgewijze voorkeursmatrix
+    uit de gesorteerde unieke waarden, zonder de n x n matrix op te bouwen: O(n log n) in
+    plaats van O(n²), ook bij tienduizenden locaties met continue scores.
+    """
+    n = matrix.shape[0]
+    if n < 2:
+        return np.zeros(n)
+    onverschillig, strikt = drempels
+    netto = np.zeros(n)
+    for j, gewicht in enumerate(gewichten):
+        if gewicht == 0:
+            continue
+        waarden, terug, aantallen = np.unique(matrix[:, j], return_inverse=True, return_counts=True)
+        uitgaand = _voorkeurssom(waarden, aantallen, waarden, onverschillig, strikt)
+        # Inkomend: voorkeur(u - a) is hetzelfde als voorkeur(-a - -u) over de gespiegelde waarden
+        inkomend = _voorkeurssom(-waarden[::-1], aantallen[::-1], -waarden, onverschillig, strikt)
+        netto += gewicht * (uitgaand - inkomend)[terug.reshape(-1)]
+    return netto / (n - 1)
+
+
+# Alle methoden geven per locatie een score waarbij hoger beter is
+METHODEN = {
+    "Gewogen som": gewogen_som,
+    "TOPSIS": topsis,
+    "PROMETHEE II": promethee_ii,
+}
+
+
+# ======================
+# AHP
+# ======================
+def ahp_matrix(criteria, oordelen):
+    """
+    Reciproque paarvergelijkingsmatrix uit {(a, b): verhouding}; een verhouding van 3 betekent
+    dat a drie keer zo belangrijk is als b. Ontbrekende paren zijn even belangrijk.
+    """
+    criteria = list(criteria)
+    matrix = np.ones((len(criteria), len(criteria)))
+    for i, j in combinations(range(len(criteria)), 2):
+        verhouding = float(oordelen.get((criteria[i], criteria[j]), 1.0))
+        matrix[i, j] = verhouding
+        matrix[j, i] = 1.0 / verhouding
+    return matrix
+
+
+def ahp_gewichten(matrix):
+    """Gewichten (hoofdeigenvector, som 1) en consistentieratio van een paarvergelijkingsmatrix"""
+    matrix = np.asarray(matrix, dtype=np.float64)
+    n = matrix.shape[0]
+    eigenwaarden, eigenvectoren = np.linalg.eig(matrix)
+    hoofd = np.argmax(eigenwaarden.real)
+    gewichten = np.abs(eigenvectoren[:, hoofd].real)
+    gewichten /= gewichten.sum()
+    if n < 3:
+        return gewichten, 0.0
+    consistentie_index = (eigenwaarden[hoofd].real - n) / (n - 1)
+    random_index = RANDOM_INDEX[n] if n < len(RANDOM_INDEX) else RANDOM_INDEX[-1]
+    return gewichten, max(consistentie_index / random_index, 0.0)
+
+
+# ======================
+# PARETO-FRONT
+# ======================
+def _domineert(kandidaten, anderen):
+    """
+    Matrix (kandidaten x anderen): True waar de andere rij overal minstens even hoog scoort.
+    Per criterium opgebouwd, zodat er geen driedimensionale tussenmatrix nodig is.
+    """
+    matrix = anderen[None, :, 0] >= kandidaten[:, 0, None]
+    for j in range(1, kandidaten.shape[1]):
+        matrix &= anderen[None, :, j] >= kandidaten[:, j, None]
+    return matrix
+
+
+def _gedomineerd(kandidaten, front):
+    """Welke kandidaten door minstens één frontpunt gedomineerd worden, per stuk van het front"""
+    gedomineerd = np.zeros(len(kandidaten), dtype=bool)
+    stuk = max(1, MAX_VERGELIJKINGEN // max(len(kandidaten), 1))
+    for start in range(0, len(front), stuk):
+        open_ = np.flatnonzero(~gedomineerd)
+        if not len(open_):
+            break
+        gedomineerd[open_] = _domineert(kandidaten[open_], front[start:start + stuk]).any(axis=1)
+    return gedomineerd
+
+
+def skyline(matrix):
+    """
+    Masker van de rijen op het Pareto-front: rijen die door geen enkele andere rij gedomineerd
+    worden (overal minstens even goed en ergens beter; hoger is beter).
+
+    Sort-filter-skyline over de unieke scoreprofielen: gesorteerd op aflopende som kan een
+    profiel alleen gedomineerd worden door een eerder profiel, en dan ook door een profiel dat
+    al op het front staat. Kandidaten worden per blok in één keer tegen het front tot nu toe
+    getoetst; alleen de overlevers worden daarna nog onderling vergeleken.
+    """
+    matrix = np.asarray(matrix, dtype=np.float64)
+    if len(matrix) == 0:
+        return np.zeros(0, dtype=bool)
+    profielen, terug = np.unique(matrix, axis=0, return_inverse=True)
+    volgorde = np.argsort(-profielen.sum(axis=1), kind="stable")
+    kandidaten = profielen[volgorde]
+    front = np.empty((0, matrix.shape[1]))
+    op_front = np.zeros(len(kandidaten), dtype=bool)
+    for start in range(0, len(kandidaten), MAX_BLOK_SKYLINE):
+        deel = kandidaten[start:start + MAX_BLOK_SKYLINE]
+        over = np.flatnonzero(~_gedomineerd(deel, front))
+        if len(over):
+            # Een overlever die door een andere overlever gedomineerd wordt, valt alsnog af
+            binnen = _domineert(deel[over], deel[over])
+            np.fill_diagonal(binnen, False)
+            over = over[~binnen.any(axis=1)]
+            op_front[start + over] = True
+            front = np.vstack([front, deel[over]])
+    masker = np.empty(len(kandidaten), dtype=bool)
+    masker[volgorde] = op_front
+    return masker[terug.reshape(-1)]
@@ -0,0 +1,167 @@
+import time
+from itertools import combinations
+
+import streamlit as st
+
+from beslismethoden import METHODEN, MAX_CONSISTENTIERATIO, ahp_matrix, ahp_gewichten
+from scoremodel import Weging, maak_procespool
+
+# ======================
+# CONSTANTEN
+# ======================
+# Aantal locaties in de gewogen ranglijst
+TOP_RANGLIJST = 25
+
+# Spreiding van de getrokken wegingen rond de ingestelde weging (Dirichlet-concentratie)
+SPREIDING_WEGING = {"Klein": 200, "Gemiddeld": 50, "Groot": 15}
+
+
+# ======================
+# WEGING
+# ======================
+@st.cache_resource(show_spinner=False)
+def get_procespool():
+    """Werkprocessen voor de gevoeligheidsanalyse, gedeeld door alle sessies, als (pool, werkers)"""
+    return maak_procespool()
+
+
+def ahp_oordelen(gewichten):
+    """Verhoudingen uit de AHP-schuifjes; stand s > 0 betekent 'links is s+1 keer zo belangrijk'"""
+    oordelen = {}
+    for links, rechts in combinations(gewichten, 2):
+        stand = st.session_state.get(f"ahp_{links}_{rechts}", 0)
+        oordelen[(links, rechts)] = stand + 1 if stand >= 0 else 1 / (1 - stand)
+    return oordelen
+
+
+def ahp_label(links, rechts):
+    return lambda stand: "Even belangrijk" if stand == 0 else (
+        f"{links} {stand + 1}×" if stand > 0 else f"{rechts} {1 - stand}×"
+    )
+
+
+def get_weging(gewichten):
+    """Weging uit de sessie (schuifjes of AHP, anders de standaardweging); de gewogen score loopt van 0 tot 100"""
+    if st.session_state.get('weging_bron') == "AHP-paarvergelijking":
+        ahp, _ = ahp_gewichten(ahp_matrix(gewichten, ahp_oordelen(gewichten)))
+        return Weging(dict(zip(gewichten, ahp)), schaal=20)
+    ingesteld = {criterium: st.session_state.get(f"gewicht_{criterium}", gewicht) for criterium, gewicht in gewichten.items()}
+    if not any(ingesteld.values()):
+        ingesteld = gewichten
+    return Weging(ingesteld, schaal=20)
+
+
+def herstel_weging(gewichten):
+    for criterium, gewicht in gewichten.items():
+        st.session_state[f"gewicht_{criterium}"] = gewicht
+
+
+# ======================
+# PANELEN
+# ======================
+def toon_weging_invoer(gewichten, naast_elkaar=False):
+    """Schuifjes of AHP-paarvergelijking voor de weging; met naast_elkaar de schuifjes in kolommen"""
+    bron = st.radio("Gewichten bepalen met", ["Schuifjes", "AHP-paarvergelijking"], horizontal=naast_elkaar, key="weging_bron")
+    if bron == "Schuifjes":
+        plekken = st.columns(len(gewichten)) if naast_elkaar else [st] * len(gewichten)
+        for plek, (criterium, gewicht) in zip(plekken, gewichten.items()):
+            st.session_state.setdefault(f"gewicht_{criterium}", gewicht)
+            plek.slider(f"{criterium} (%)", 0, 100, step=5, key=f"gewicht_{criterium}")
+        st.button("↩️ Standaardweging", on_click=herstel_weging, args=(gewichten,))
+    else:
+        st.caption("Welk criterium is belangrijker, en hoeveel keer? (schaal van Saaty, 1-9)")
+        for links, rechts in combinations(gewichten, 2):
+            st.select_slider(
+                f"{links} ↔ {rechts}", options=list(range(8, -9, -1)), value=0,
+                format_func=ahp_label(links, rechts), key=f"ahp_{links}_{rechts}"
+            )
+        _, consistentie = ahp_gewichten(ahp_matrix(gewichten, ahp_oordelen(gewichten)))
+        if consistentie > MAX_CONSISTENTIERATIO:
+            st.warning(f"Consistentieratio {consistentie:.2f}: de vergelijkingen spreken elkaar tegen (streef naar ≤ {MAX_CONSISTENTIERATIO})")
+        else:
+            st.caption(f"Consistentieratio {consistentie:.2f}")
+
+
+def toon_ranglijst(ranglijst, weging, geselecteerd):
+    """Beslismethode, ranglijst van alle locaties en de positie van de geselecteerde; geeft de ranglijst terug"""
+    methode = st.selectbox(
+        "Beslismethode", list(METHODEN), key="beslismethode",
+        help="Gewogen som: 0-100 · TOPSIS: nabijheid tot de ideale locatie (0-1) · PROMETHEE II: netto voorkeursstroom (-1 tot 1)"
+    )
+    ranking = ranglijst.rangschik(weging, methode)
+    scoreformaat = {ranking.columns[-1]: "{:.1f}" if methode == "Gewogen som" else "{:.3f}"}
+    st.caption("Weging: " + ", ".join(
+        f"{categorie} {percentage:.0f}%" for categorie, percentage in weging.percentages().items()
+    ))
+    col1, col2 = st.columns([2, 1])
+    with col1:
+        st.dataframe(
+            ranking.head(TOP_RANGLIJST).style.format(scoreformaat),
+            hide_index=True,
+            use_container_width=True
+        )
+    with col2:
+        if geselecteerd:
+            st.markdown("**Positie van de geselecteerde locaties**")
+            st.dataframe(
+                ranking[ranking["Locatie"].isin(geselecteerd)].style.format(scoreformaat),
+                hide_index=True,
+                use_container_width=True
+            )
+    return ranking
+
+
+def toon_gevoeligheid(ranglijst, weging, geselecteerd):
+    """Hoe stabiel is de ranglijst als de weging een beetje anders was geweest?"""
+    with st.expander("🎲 Gevoeligheid van de ranglijst voor de weging", expanded=False):
+        col1, col2, col3 = st.columns(3)
+        aantal_trekkingen = col1.select_slider("Aantal trekkingen", options=[500, 1000, 2000, 5000, 10000], value=2000)
+        spreiding = col2.select_slider("Spreiding rond de weging", options=list(SPREIDING_WEGING), value="Gemiddeld")
+        top_k = col3.number_input("Top-k", min_value=1, max_value=max(1, len(ranglijst)), value=min(3, len(ranglijst)))
+        instellingen = (weging.sleutel, aantal_trekkingen, spreiding, top_k)
+        if st.button("Analyse starten", key="gevoeligheid_starten"):
+            start = time.perf_counter()
+            pool, werkers = get_procespool()
+            with st.spinner("Wegingen trekken en scoren..."):
+                analyse = ranglijst.gevoeligheid(
+                    weging, aantal=aantal_trekkingen, concentratie=SPREIDING_WEGING[spreiding],
+                    top_k=int(top_k), pool=pool, werkers=werkers
+                )
+            st.session_state.gevoeligheid = (ranglijst, instellingen, analyse, time.perf_counter() - start)
+        bewaard = st.session_state.get('gevoeligheid')
+        if bewaard and bewaard[0] is ranglijst and bewaard[1] == instellingen:
+            _, _, analyse, duur = bewaard
+            kans = f"Kans top-{int(top_k)}"
+            stabiel = (analyse["Beste rang"] == analyse["Slechtste rang"]).mean()
+            st.caption(
+                f"{aantal_trekkingen} wegingen in {duur:.2f} s · {stabiel:.0%} van de locaties houdt in elke trekking "
+                f"dezelfde rang · {int((analyse[kans] > 0).sum())} locatie(s) kunnen in de top-{int(top_k)} komen"
+            )
+            st.dataframe(
+                analyse[(analyse[kans] > 0) | analyse["Locatie"].isin(geselecteerd)]
+                .sort_values(kans, ascending=False)
+                .head(TOP_RANGLIJST)
+                .style.format({"Gemiddelde rang": "{:.1f}", "Spreiding rang": "{:.1f}", kans: "{:.0%}"}),
+                hide_index=True,
+                use_container_width=True
+            )
+
+
+def toon_pareto(ranglijst, ranking, geselecteerd):
+    """Locaties die bij geen enkele weging door een andere locatie overtroffen worden"""
+    with st.expander("🧭 Pareto-front: niet-gedomineerde locaties", expanded=False):
+        bereik = st.radio("Vergelijken binnen", ["Alle locaties", "Geselecteerde locaties"], horizontal=True, key="pareto_bereik")
+        if bereik == "Alle locaties":
+            front, totaal = ranglijst.pareto(), len(ranglijst)
+        else:
+            front, totaal = ranglijst.pareto(geselecteerd), len(geselecteerd)
+        st.caption(
+            f"{len(front)} van {totaal} locaties worden door geen andere locatie overtroffen "
+            f"(nergens lager en ergens hoger); de beste locatie bij elke weging staat hiertussen"
+        )
+        st.dataframe(
+            ranking[["Rang", "Locatie"]].merge(front, on="Locatie").head(TOP_RANGLIJST)
+            .style.format({criterium: "{:g}" for criterium in front.columns[1:]}),
+            hide_index=True,
+            use_container_width=True
+        )
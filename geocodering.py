@@ -0,0 +1,607 @@
+import os
+import random
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+import unicodedata
+from bisect import bisect_left
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import partial
+
+import numpy as np
+import pandas as pd
+from geopy.adapters import RequestsAdapter
+from geopy.exc import GeocoderRateLimited, GeocoderServiceError, GeocoderTimedOut, GeocoderUnavailable
+from geopy.geocoders import Nominatim
+
+from locatie_import import csv_scheidingsteken
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# ======================
+# CONSTANTEN
+# ======================
+CACHE_PAD = os.environ.get(
+    "GEOCODE_CACHE_DB",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "geocode_cache.db")
+)
+CACHE_TTL = int(os.environ.get("GEOCODE_CACHE_TTL", 30 * 24 * 3600))  # 30 dagen
+CACHE_MAX_ITEMS = int(os.environ.get("GEOCODE_CACHE_MAX", 100_000))
+
+USER_AGENT = "locatie_beoordeling_app"
+# Nominatim staat maximaal 1 verzoek per seconde toe voor de publieke server
+MAX_VERZOEKEN_PER_SECONDE = float(os.environ.get("GEOCODE_RATE", 1.0))
+LIMITER_PAD = os.path.join(tempfile.gettempdir(), "locatie_geocode_limiter.lock")
+
+# Lokaal adressenbestand (BAG/PDOK-export); leeg = alleen Nominatim
+GAZETTEER_PAD = os.environ.get("GAZETTEER_CSV", "")
+# Met GEOCODE_OFFLINE=1 wordt bij een miss in het adresboek niet naar Nominatim gegaan
+ALLEEN_OFFLINE = os.environ.get("GEOCODE_OFFLINE", "") == "1"
+
+# Zelfde attribuutnamen als geopy's Location, zodat bestaande code blijft werken
+GeocodeResultaat = namedtuple("GeocodeResultaat", ["latitude", "longitude", "address"])
+
+
+def normaliseer_adres(adres):
+    """Maak een cachesleutel: kleine letters, zonder accenten, vaste spaties en postcode als '1234ab'"""
+    tekst = unicodedata.normalize("NFKD", str(adres)).encode("ascii", "ignore").decode("ascii")
+    tekst = tekst.lower().strip()
+    tekst = re.sub(r"\b(\d{4})\s*([a-z]{2})\b", r"\1\2", tekst)
+    tekst = re.sub(r"\s*,\s*", ", ", tekst)
+    tekst = re.sub(r"\s+", " ", tekst)
+    return tekst.strip(" ,")
+
+
+def naar_resultaat(location):
+    """Zet een geopy Location (of None) om naar een klein, opslagbaar resultaat"""
+    if location is None:
+        return None
+    return GeocodeResultaat(location.latitude, location.longitude, location.address)
+
+
+# ======================
+# CACHE
+# ======================
+class GeocodeCache:
+    """Persistente SQLite-cache voor geocoderesultaten met TTL en LRU-opruiming"""
+
+    def __init__(self, pad=CACHE_PAD, ttl=CACHE_TTL, max_items=CACHE_MAX_ITEMS):
+        self.pad = pad
+        self.ttl = ttl
+        self.max_items = max_items
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.RLock()
+        self._sinds_opruimen = 0
+        self._conn = sqlite3.connect(pad, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS geocode_cache (
+                sleutel TEXT PRIMARY KEY,
+                latitude REAL,
+                longitude REAL,
+                adres TEXT,
+                aangemaakt REAL NOT NULL,
+                laatst_gebruikt REAL NOT NULL
+            )
+        """)
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_geocode_lru ON geocode_cache (laatst_gebruikt)"
+        )
+
+    def haal_op(self, adres):
+        """Geef (gevonden, resultaat); resultaat is None als het adres eerder niet gevonden werd"""
+        sleutel = normaliseer_adres(adres)
+        nu = time.time()
+        with self._lock:
+            rij = self._conn.execute(
+                "SELECT latitude, longitude, adres, aangemaakt FROM geocode_cache WHERE sleutel = ?",
+                (sleutel,)
+            ).fetchone()
+            if rij is None or nu - rij[3] > self.ttl:
+                if rij is not None:
+                    self._conn.execute("DELETE FROM geocode_cache WHERE sleutel = ?", (sleutel,))
+                self.misses += 1
+                return False, None
+            self._conn.execute(
+                "UPDATE geocode_cache SET laatst_gebruikt = ? WHERE sleutel = ?", (nu, sleutel)
+            )
+            self.hits += 1
+        if rij[0] is None:
+            return True, None
+        return True, GeocodeResultaat(rij[0], rij[1], rij[2])
+
+    def zet(self, adres, resultaat):
+        """Sla een resultaat op; None betekent 'niet gevonden' en wordt ook onthouden"""
+        sleutel = normaliseer_adres(adres)
+        nu = time.time()
+        waarden = (None, None, None) if resultaat is None else tuple(resultaat)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO geocode_cache "
+                "(sleutel, latitude, longitude, adres, aangemaakt, laatst_gebruikt) VALUES (?, ?, ?, ?, ?, ?)",
+                (sleutel, *waarden, nu, nu)
+            )
+            self._sinds_opruimen += 1
+            if self._sinds_opruimen >= 100:
+                self.ruim_op()
+
+    def haal_op_of_zoek(self, adres, zoek):
+        """Geef het gecachede resultaat, of roep zoek(adres) aan en onthoud de uitkomst"""
+        gevonden, resultaat = self.haal_op(adres)
+        if gevonden:
+            return resultaat
+        resultaat = naar_resultaat(zoek(adres))
+        self.zet(adres, resultaat)
+        return resultaat
+
+    def ruim_op(self):
+        """Verwijder verlopen items en daarna de minst recent gebruikte boven max_items"""
+        with self._lock:
+            self._sinds_opruimen = 0
+            self._conn.execute(
+                "DELETE FROM geocode_cache WHERE aangemaakt < ?", (time.time() - self.ttl,)
+            )
+            teveel = self.aantal() - self.max_items
+            if teveel > 0:
+                self._conn.execute(
+                    "DELETE FROM geocode_cache WHERE sleutel IN "
+                    "(SELECT sleutel FROM geocode_cache ORDER BY laatst_gebruikt LIMIT ?)",
+                    (teveel,)
+                )
+
+    def aantal(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM geocode_cache").fetchone()[0]
+
+    @property
+    def hit_rate(self):
+        totaal = self.hits + self.misses
+        return self.hits / totaal if totaal else 0.0
+
+
+# ======================
+# RATE LIMITING
+# ======================
+class _BestandsLock:
+    """Exclusieve lock op een bestand, zodat meerdere worker-processen dezelfde bucket delen"""
+
+    def __init__(self, bestand):
+        self.bestand = bestand
+
+    def __enter__(self):
+        if fcntl is not None:
+            fcntl.flock(self.bestand.fileno(), fcntl.LOCK_EX)
+        else:
+            self.bestand.seek(0)
+            msvcrt.locking(self.bestand.fileno(), msvcrt.LK_LOCK, 1)
+        return self
+
+    def __exit__(self, *exc):
+        if fcntl is not None:
+            fcntl.flock(self.bestand.fileno(), fcntl.LOCK_UN)
+        else:
+            self.bestand.seek(0)
+            msvcrt.locking(self.bestand.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class TokenBucket:
+    """Token-bucket rate limiter; de stand staat in een lock-bestand en geldt dus voor alle processen"""
+
+    def __init__(self, snelheid=MAX_VERZOEKEN_PER_SECONDE, capaciteit=1, pad=LIMITER_PAD):
+        self.snelheid = snelheid
+        self.capaciteit = capaciteit
+        self.pad = pad
+        self._lock = threading.Lock()
+        self._bestand = open(pad, "a+b")
+
+    def _lees(self):
+        self._bestand.seek(0)
+        inhoud = self._bestand.read().decode("ascii", errors="ignore").split()
+        try:
+            return float(inhoud[0]), float(inhoud[1])
+        except (IndexError, ValueError):
+            return float(self.capaciteit), time.time()
+
+    def _schrijf(self, tokens, tijdstip):
+        self._bestand.seek(0)
+        self._bestand.truncate()
+        self._bestand.write(f"{tokens:.6f} {tijdstip:.6f}".encode("ascii"))
+        self._bestand.flush()
+
+    def neem(self):
+        """Wacht tot er een token vrij is en neem het; geeft de wachttijd in seconden terug"""
+        gewacht = 0.0
+        while True:
+            with self._lock, _BestandsLock(self._bestand):
+                tokens, vorige = self._lees()
+                nu = time.time()
+                tokens = min(self.capaciteit, tokens + max(nu - vorige, 0) * self.snelheid)
+                if tokens >= 1:
+                    self._schrijf(tokens - 1, nu)
+                    return gewacht
+                wachten = (1 - tokens) / self.snelheid
+            time.sleep(wachten)
+            gewacht += wachten
+
+
+# ======================
+# OFFLINE ADRESBOEK
+# ======================
+# Kolomnamen zoals ze in BAG/PDOK-exports (en eenvoudige eigen CSV's) voorkomen
+GAZETTEER_KOLOMMEN = {
+    "straat": ["straat", "openbareruimte", "openbare_ruimte", "straatnaam", "street"],
+    "huisnummer": ["huisnummer", "nummer", "number", "housenumber"],
+    "huisletter": ["huisletter", "letter"],
+    "toevoeging": ["huisnummertoevoeging", "toevoeging", "addition"],
+    "postcode": ["postcode", "postal_code", "zipcode"],
+    "plaats": ["woonplaats", "plaats", "city", "woonplaatsnaam"],
+    "latitude": ["latitude", "lat", "breedtegraad"],
+    "longitude": ["longitude", "lon", "lng", "lengtegraad"],
+}
+
+_POSTCODE = re.compile(r"\b(\d{4}[a-z]{2})\b")
+_HUISNUMMER = re.compile(r"\b(\d+)(?:\s*-?\s*([a-z]|\d{1,4})\b(?!\s*\d))?")
+
+
+def _kolom(df, naam):
+    """Zoek de kolom die bij een gazetteer-veld hoort; None als het bestand hem niet heeft"""
+    kolommen = {str(k).strip().lower(): k for k in df.columns}
+    for alias in GAZETTEER_KOLOMMEN[naam]:
+        if alias in kolommen:
+            return df[kolommen[alias]]
+    return None
+
+
+def _tekst(reeks):
+    """Vectorized variant van normaliseer_adres voor losse adresdelen"""
+    # Straat- en plaatsnamen herhalen zich sterk: alleen de unieke waarden normaliseren
+    codes, uniek = pd.factorize(reeks.fillna("").astype(str))
+    uniek = (
+        pd.Series(uniek, dtype=object)
+        .str.normalize("NFKD").str.encode("ascii", "ignore").str.decode("ascii")
+        .str.lower().str.replace(r"[\s,]+", " ", regex=True).str.strip()
+    )
+    return pd.Series(uniek.to_numpy()[codes], index=reeks.index)
+
+
+class Gazetteer:
+    """
+    Offline geocoder op basis van een lokale adressenexport (BAG/PDOK-achtige CSV).
+
+    Alle sleutels ('straat nummer plaats' en 'postcode nummer') staan in één gesorteerde
+    lijst; een opzoeking is een binaire zoekactie en een prefix (bijv. alleen een postcode)
+    is een aaneengesloten bereik in die lijst. Coördinaten staan in float32-arrays
+    (ruim binnen een meter nauwkeurig) en straat/plaats als categorie-codes.
+    """
+
+    def __init__(self, sleutels, rijen, latitude, longitude, straten, straat_codes,
+                 nummers, postcodes, plaatsen, plaats_codes):
+        self.sleutels = sleutels
+        self.rijen = rijen
+        self.latitude = latitude
+        self.longitude = longitude
+        self.straten = straten
+        self.straat_codes = straat_codes
+        self.nummers = nummers
+        self.postcodes = postcodes
+        self.plaatsen = plaatsen
+        self.plaats_codes = plaats_codes
+
+    @classmethod
+    def laad_csv(cls, pad, chunk_grootte=200_000):
+        """Bouw de index uit een CSV; het bestand wordt in blokken gelezen"""
+        delen = []
+        with open(pad, encoding="utf-8-sig", newline="") as bestand:
+            sep = csv_scheidingsteken(bestand)
+            for chunk in pd.read_csv(bestand, sep=sep, dtype=str, chunksize=chunk_grootte,
+                                     keep_default_na=False, na_values=[""]):
+                straat = _kolom(chunk, "straat")
+                nummer = _kolom(chunk, "huisnummer")
+                lat = _kolom(chunk, "latitude")
+                lon = _kolom(chunk, "longitude")
+                if straat is None or nummer is None or lat is None or lon is None:
+                    raise ValueError(
+                        "Adressenbestand mist verplichte kolommen (straat, huisnummer, latitude, longitude)"
+                    )
+                postcode = _kolom(chunk, "postcode")
+                plaats = _kolom(chunk, "plaats")
+                leeg = pd.Series("", index=chunk.index)
+
+                # Huisletter en toevoeging horen bij het nummer: '12a', '12-2'
+                nummer = nummer.fillna("").str.strip()
+                for extra in ("huisletter", "toevoeging"):
+                    kolom = _kolom(chunk, extra)
+                    if kolom is not None:
+                        kolom = kolom.fillna("").str.strip()
+                        scheiding = "" if extra == "huisletter" else "-"
+                        nummer = nummer.where(kolom == "", nummer + scheiding + kolom)
+
+                deel = pd.DataFrame({
+                    "straat": straat.fillna("").str.strip(),
+                    "nummer": nummer,
+                    "postcode": (postcode if postcode is not None else leeg).fillna("")
+                    .str.replace(" ", "", regex=False).str.upper(),
+                    "plaats": (plaats if plaats is not None else leeg).fillna("").str.strip(),
+                    "latitude": pd.to_numeric(lat.str.replace(",", ".", regex=False), errors="coerce"),
+                    "longitude": pd.to_numeric(lon.str.replace(",", ".", regex=False), errors="coerce"),
+                })
+                delen.append(deel.dropna(subset=["latitude", "longitude"]))
+
+        adressen = pd.concat(delen, ignore_index=True) if delen else pd.DataFrame(
+            columns=["straat", "nummer", "postcode", "plaats", "latitude", "longitude"]
+        )
+        return cls.van_dataframe(adressen)
+
+    @classmethod
+    def van_dataframe(cls, adressen):
+        """Bouw de index uit een DataFrame met straat, nummer, postcode, plaats, latitude, longitude"""
+        nummer = _tekst(adressen["nummer"]).str.replace(" ", "", regex=False)
+        straat_sleutel = _tekst(adressen["straat"]) + " " + nummer + " " + _tekst(adressen["plaats"])
+        postcode_sleutel = adressen["postcode"].str.lower() + " " + nummer
+        heeft_postcode = adressen["postcode"] != ""
+
+        sleutels = np.concatenate([
+            straat_sleutel.str.strip().to_numpy(dtype=object),
+            postcode_sleutel[heeft_postcode].to_numpy(dtype=object),
+        ])
+        rijen = np.concatenate([
+            np.arange(len(adressen), dtype=np.int32),
+            np.flatnonzero(heeft_postcode.to_numpy()).astype(np.int32),
+        ])
+        volgorde = np.argsort(sleutels, kind="stable")
+
+        straten = adressen["straat"].astype("category")
+        plaatsen = adressen["plaats"].astype("category")
+        return cls(
+            sleutels=sleutels[volgorde].tolist(),
+            rijen=rijen[volgorde],
+            latitude=adressen["latitude"].to_numpy(dtype=np.float32),
+            longitude=adressen["longitude"].to_numpy(dtype=np.float32),
+            straten=straten.cat.categories.tolist(),
+            straat_codes=straten.cat.codes.to_numpy(),
+            nummers=adressen["nummer"].to_numpy(dtype=object),
+            postcodes=adressen["postcode"].to_numpy(dtype=object),
+            plaatsen=plaatsen.cat.categories.tolist(),
+            plaats_codes=plaatsen.cat.codes.to_numpy(),
+        )
+
+    def __len__(self):
+        return len(self.latitude)
+
+    def _bereik(self, prefix):
+        """Index-bereik van alle sleutels die met prefix beginnen"""
+        begin = bisect_left(self.sleutels, prefix)
+        eind = bisect_left(self.sleutels, prefix + "\uffff", begin)
+        return begin, eind
+
+    def _exact(self, sleutel):
+        positie = bisect_left(self.sleutels, sleutel)
+        if positie < len(self.sleutels) and self.sleutels[positie] == sleutel:
+            return int(self.rijen[positie])
+        return None
+
+    def _weergave(self, rij):
+        straat = self.straten[self.straat_codes[rij]] if self.straat_codes[rij] >= 0 else ""
+        plaats = self.plaatsen[self.plaats_codes[rij]] if self.plaats_codes[rij] >= 0 else ""
+        postcode = self.postcodes[rij]
+        if len(postcode) == 6:
+            postcode = f"{postcode[:4]} {postcode[4:]}"
+        return f"{straat} {self.nummers[rij]}, {postcode} {plaats}".replace(",  ", ", ").strip(" ,")
+
+    def _resultaat(self, rij):
+        return GeocodeResultaat(float(self.latitude[rij]), float(self.longitude[rij]), self._weergave(rij))
+
+    def zoek(self, adres):
+        """Zoek een adres of postcode op; None als het adresboek het niet kent"""
+        tekst = normaliseer_adres(adres).replace(",", " ")
+        tekst = re.sub(r"\s+", " ", re.sub(r"\b(nederland|the netherlands|netherlands)\b", "", tekst)).strip()
+        if not tekst:
+            return None
+
+        postcode = _POSTCODE.search(tekst)
+        zonder_postcode = _POSTCODE.sub(" ", tekst) if postcode else tekst
+        huisnummer = _HUISNUMMER.search(zonder_postcode)
+        nummer = ""
+        if huisnummer:
+            nummer = huisnummer.group(1)
+            if huisnummer.group(2):
+                toevoeging = huisnummer.group(2)
+                nummer += toevoeging if toevoeging.isalpha() else "-" + toevoeging
+
+        if postcode and nummer:
+            rij = self._exact(f"{postcode.group(1)} {nummer}")
+            if rij is None and nummer != huisnummer.group(1):
+                rij = self._exact(f"{postcode.group(1)} {huisnummer.group(1)}")
+            if rij is not None:
+                return self._resultaat(rij)
+
+        if huisnummer:
+            straat = zonder_postcode[:huisnummer.start()].strip()
+            plaats = zonder_postcode[huisnummer.end():].strip()
+            for kandidaat in (nummer, huisnummer.group(1)):
+                rij = self._exact(re.sub(r"\s+", " ", f"{straat} {kandidaat} {plaats}").strip())
+                if rij is not None:
+                    return self._resultaat(rij)
+            if not plaats:
+                # Zonder plaatsnaam alleen een treffer als de straat+nummer uniek is
+                begin, eind = self._bereik(f"{straat} {nummer} ")
+                if eind - begin == 1:
+                    return self._resultaat(int(self.rijen[begin]))
+
+        if postcode and not nummer:
+            # Alleen een postcode: het midden van alle adressen met die postcode
+            begin, eind = self._bereik(postcode.group(1) + " ")
+            if eind > begin:
+                rijen = self.rijen[begin:eind]
+                plaats_code = self.plaats_codes[rijen[0]]
+                plaats = self.plaatsen[plaats_code] if plaats_code >= 0 else ""
+                pc = postcode.group(1).upper()
+                return GeocodeResultaat(
+                    float(self.latitude[rijen].mean()), float(self.longitude[rijen].mean()),
+                    f"{pc[:4]} {pc[4:]} {plaats}".strip()
+                )
+        return None
+
+    def suggesties(self, prefix, limiet=10):
+        """Adressen waarvan de sleutel met de (genormaliseerde) invoer begint, bijv. voor autocomplete"""
+        tekst = normaliseer_adres(prefix).replace(",", " ")
+        tekst = re.sub(r"\s+", " ", tekst).strip()
+        if not tekst:
+            return []
+        begin, eind = self._bereik(tekst)
+        gezien = set()
+        resultaat = []
+        for rij in self.rijen[begin:eind]:
+            if rij in gezien:
+                continue
+            gezien.add(rij)
+            resultaat.append(self._weergave(int(rij)))
+            if len(resultaat) >= limiet:
+                break
+        return resultaat
+
+
+# ======================
+# GEOCODEERSERVICE
+# ======================
+class GeocodeerService:
+    """Eén geocoder voor de hele app: cache, gedeelde HTTP-sessie, rate limiting en retries"""
+
+    def __init__(self, cache=None, user_agent=USER_AGENT, timeout=5, pogingen=3, backoff=1.0,
+                 limiter=None, gazetteer=None, alleen_offline=ALLEEN_OFFLINE):
+        self.cache = cache if cache is not None else GeocodeCache()
+        self.gazetteer = gazetteer
+        self.alleen_offline = alleen_offline
+        self.limiter = limiter if limiter is not None else TokenBucket()
+        self.pogingen = pogingen
+        self.backoff = backoff
+        # Eén Nominatim-client met één requests-sessie, zodat verbindingen hergebruikt worden.
+        # Retries doen we zelf (met backoff en binnen de rate limit), dus niet in de adapter.
+        self.geolocator = Nominatim(
+            user_agent=user_agent,
+            timeout=timeout,
+            adapter_factory=partial(RequestsAdapter, pool_connections=1, pool_maxsize=4, max_retries=0)
+        )
+
+    def _zoek(self, adres):
+        for poging in range(self.pogingen):
+            self.limiter.neem()
+            try:
+                return self.geolocator.geocode(adres)
+            except GeocoderRateLimited as e:
+                fout = e
+                wachten = e.retry_after or self.backoff * 2 ** poging
+            except (GeocoderTimedOut, GeocoderUnavailable) as e:
+                fout = e
+                wachten = self.backoff * 2 ** poging
+            except GeocoderServiceError as e:
+                # Algemene serverfouten opnieuw proberen; subklassen (query, quota, auth) niet
+                if type(e) is not GeocoderServiceError:
+                    raise
+                fout = e
+                wachten = self.backoff * 2 ** poging
+            if poging < self.pogingen - 1:
+                time.sleep(wachten + random.uniform(0, self.backoff / 2))
+        raise fout
+
+    def zoek_lokaal(self, adres):
+        """Geef (gevonden, resultaat) uit het offline adresboek of de cache, zonder netwerk"""
+        if self.gazetteer is not None:
+            resultaat = self.gazetteer.zoek(adres)
+            if resultaat is not None:
+                return True, resultaat
+            if self.alleen_offline:
+                return True, None
+        return self.cache.haal_op(adres)
+
+    def geocode(self, adres):
+        """Geocodeer één adres: eerst het offline adresboek, dan de cache, Nominatim alleen bij een miss"""
+        if self.gazetteer is not None:
+            resultaat = self.gazetteer.zoek(adres)
+            if resultaat is not None or self.alleen_offline:
+                return resultaat
+        return self.cache.haal_op_of_zoek(adres, self._zoek)
+
+
+# ======================
+# BATCH GEOCODERING
+# ======================
+class BatchGeocoder:
+    """
+    Geocodeert duizenden adressen parallel, binnen de rate limit van de service.
+
+    Elk uniek (genormaliseerd) adres wordt maar één keer opgezocht. Ieder resultaat gaat
+    direct de persistente cache in, dus een afgebroken batch gaat bij een nieuwe start
+    verder waar hij gebleven was: al gevonden adressen komen dan meteen uit de cache.
+    """
+
+    def __init__(self, service, werkers=4):
+        self.service = service
+        self.werkers = werkers
+        self.fouten = {}
+
+    def stroom(self, adressen, voortgang=None):
+        """Levert (adres, resultaat) op zodra ze klaar zijn; voortgang(klaar, totaal) na elk adres"""
+        uniek = {}
+        for adres in adressen:
+            if adres is None or not str(adres).strip():
+                continue
+            uniek.setdefault(normaliseer_adres(adres), adres)
+
+        totaal = len(uniek)
+        klaar = 0
+        te_zoeken = []
+        for adres in uniek.values():
+            gevonden, resultaat = self.service.zoek_lokaal(adres)
+            if not gevonden:
+                te_zoeken.append(adres)
+                continue
+            klaar += 1
+            if voortgang is not None:
+                voortgang(klaar, totaal)
+            yield adres, resultaat
+
+        if not te_zoeken:
+            return
+
+        with ThreadPoolExecutor(max_workers=self.werkers) as pool:
+            futures = {pool.submit(self.service.geocode, adres): adres for adres in te_zoeken}
+            try:
+                for future in as_completed(futures):
+                    adres = futures[future]
+                    try:
+                        resultaat = future.result()
+                    except Exception as e:
+                        # Niet gecachet: bij een volgende run wordt dit adres opnieuw geprobeerd
+                        self.fouten[adres] = str(e)
+                        resultaat = None
+                    klaar += 1
+                    if voortgang is not None:
+                        voortgang(klaar, totaal)
+                    yield adres, resultaat
+            finally:
+                # Bij afbreken (generator gesloten) geen nieuwe verzoeken meer starten
+                for future in futures:
+                    future.cancel()
+
+    def geocodeer(self, adressen, voortgang=None):
+        """Geocodeer alle adressen; geeft een dict van elk oorspronkelijk adres naar zijn resultaat"""
+        adressen = list(adressen)
+        per_sleutel = {
+            normaliseer_adres(adres): resultaat
+            for adres, resultaat in self.stroom(adressen, voortgang)
+        }
+        return {
+            adres: per_sleutel.get(normaliseer_adres(adres))
+            for adres in adressen
+            if adres is not None
+        }
@@ -0,0 +1,172 @@
+import json
+
+import pandas as pd
+
+# ======================
+# CONSTANTEN
+# ======================
+CHUNK_GROOTTE = 5000
+ONDERSTEUNDE_BESTANDEN = ["csv", "geojson", "json", "xlsx"]
+
+
+# ======================
+# LEZEN IN BLOKKEN
+# ======================
+def csv_scheidingsteken(bestand):
+    """Bepaal of een CSV met ';' (zoals onze eigen export) of ',' gescheiden is"""
+    positie = bestand.tell()
+    eerste_regel = bestand.readline()
+    bestand.seek(positie)
+    if isinstance(eerste_regel, bytes):
+        eerste_regel = eerste_regel.decode("utf-8", errors="ignore")
+    return ";" if eerste_regel.count(";") >= eerste_regel.count(",") else ","
+
+
+def lees_csv(bestand, chunk_grootte=CHUNK_GROOTTE):
+    """Lees een CSV blok voor blok zodat het geheugengebruik begrensd blijft"""
+    sep = csv_scheidingsteken(bestand)
+    yield from pd.read_csv(bestand, sep=sep, chunksize=chunk_grootte, dtype=str,
+                           keep_default_na=False, na_values=[""], encoding="utf-8-sig")
+
+
+def lees_geojson(bestand, chunk_grootte=CHUNK_GROOTTE):
+    """Lees een GeoJSON FeatureCollection; punten leveren Latitude/Longitude op"""
+    data = json.load(bestand)
+    features = data.get("features", []) if data.get("type") == "FeatureCollection" else [data]
+
+    rijen = []
+    for feature in features:
+        rij = dict(feature.get("properties") or {})
+        geometrie = feature.get("geometry") or {}
+        if geometrie.get("type") == "Point":
+            lon, lat = geometrie["coordinates"][:2]
+            rij.setdefault("Latitude", lat)
+            rij.setdefault("Longitude", lon)
+        rijen.append(rij)
+        if len(rijen) >= chunk_grootte:
+            yield pd.DataFrame(rijen)
+            rijen = []
+    if rijen:
+        yield pd.DataFrame(rijen)
+
+
+def lees_xlsx(bestand, chunk_grootte=CHUNK_GROOTTE):
+    """Lees het eerste werkblad van een Excel-bestand in read-only modus, blok voor blok"""
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ImportError("Voor XLSX-import is het pakket 'openpyxl' nodig (pip install openpyxl)")
+
+    werkboek = load_workbook(bestand, read_only=True, data_only=True)
+    try:
+        rijen = werkboek.worksheets[0].iter_rows(values_only=True)
+        kop = [str(k).strip() if k is not None else "" for k in next(rijen, [])]
+        blok = []
+        for rij in rijen:
+            if all(waarde is None for waarde in rij):
+                continue
+            blok.append(rij)
+            if len(blok) >= chunk_grootte:
+                yield pd.DataFrame(blok, columns=kop)
+                blok = []
+        if blok:
+            yield pd.DataFrame(blok, columns=kop)
+    finally:
+        werkboek.close()
+
+
+def lees_chunks(bestand, bestandsnaam, chunk_grootte=CHUNK_GROOTTE):
+    """Kies de juiste lezer op basis van de bestandsextensie"""
+    extensie = bestandsnaam.rsplit(".", 1)[-1].lower()
+    if extensie == "csv":
+        return lees_csv(bestand, chunk_grootte)
+    if extensie in ("geojson", "json"):
+        return lees_geojson(bestand, chunk_grootte)
+    if extensie == "xlsx":
+        return lees_xlsx(bestand, chunk_grootte)
+    raise ValueError(f"Bestandstype .{extensie} wordt niet ondersteund")
+
+
+# ======================
+# GEOCODERING
+# ======================
+def geocodeer_ontbrekende(df, geocodeer):
+    """Zoek coördinaten op voor rijen zonder Latitude/Longitude; elk uniek adres maar één keer"""
+    if geocodeer is None or "Adres" not in df.columns:
+        return df
+    zonder_coords = df["Latitude"].isna() | df["Longitude"].isna()
+    adressen = df.loc[zonder_coords, "Adres"].astype("string").str.strip()
+    if "Plaats" in df.columns:
+        # Plaats alleen toevoegen als die nog niet in het adres staat (onze export doet dat al)
+        plaatsen = df.loc[zonder_coords, "Plaats"]
+        adressen = pd.Series([
+            f"{adres}, {plaats}" if isinstance(plaats, str) and plaats and isinstance(adres, str)
+            and plaats.lower() not in adres.lower() else adres
+            for adres, plaats in zip(adressen, plaatsen)
+        ], index=adressen.index, dtype="string")
+    adressen = adressen.dropna()
+    adressen = adressen[adressen != ""]
+    if adressen.empty:
+        return df
+
+    resultaten = geocodeer(adressen.drop_duplicates().tolist())
+    coords = adressen.map(lambda adres: resultaten.get(adres))
+    gevonden = coords.dropna()
+    df.loc[gevonden.index, "Latitude"] = [c[0] for c in gevonden]
+    df.loc[gevonden.index, "Longitude"] = [c[1] for c in gevonden]
+    return df
+
+
+# ======================
+# IMPORT
+# ======================
+def importeer(opslag, bestand, bestandsnaam, geocodeer=None, voortgang=None,
+              chunk_grootte=CHUNK_GROOTTE):
+    """
+    Importeer een CSV, GeoJSON of XLSX; elk blok wordt in een eigen transactie opgeslagen.
+
+    geocodeer krijgt een lijst unieke adressen en geeft een dict adres -> (lat, lon) terug.
+    Dat gebeurt vóór de transactie, zodat trage netwerkaanvragen de opslag niet blokkeren
+    voor andere sessies; de lock wordt alleen vastgehouden tijdens het wegschrijven.
+    voortgang wordt na elk blok aangeroepen met het aantal verwerkte rijen.
+    Geeft een dict met het aantal toegevoegde rijen en een DataFrame met afgekeurde rijen.
+    """
+    toegevoegd = 0
+    verwerkt = 0
+    fouten = []
+
+    for chunk in lees_chunks(bestand, bestandsnaam, chunk_grootte):
+        chunk = chunk.rename(columns=lambda k: str(k).strip())
+        chunk.index = pd.RangeIndex(verwerkt, verwerkt + len(chunk))
+        namen = chunk["Locatie"].dropna().astype(str).str.strip().unique().tolist() if "Locatie" in chunk else []
+        # Rijen uit eerdere blokken zijn al opgeslagen en dus zichtbaar
+        bestaande = opslag.bestaande_namen(namen)
+
+        if opslag.schema is not None:
+            geldig, chunk_fouten = opslag.schema.valideer_df(chunk, bestaande)
+        else:
+            geldig, chunk_fouten = chunk, pd.DataFrame(columns=["Locatie", "Fout"])
+
+        geldig = geocodeer_ontbrekende(geldig, geocodeer)
+        with opslag.transactie():
+            # Een andere sessie kan tijdens het geocoderen dezelfde naam hebben toegevoegd
+            alsnog = opslag.bestaande_namen(geldig["Locatie"].tolist()) if "Locatie" in geldig else set()
+            if alsnog:
+                dubbel = geldig["Locatie"].isin(alsnog)
+                chunk_fouten = pd.concat([
+                    chunk_fouten, geldig.loc[dubbel, ["Locatie"]].assign(Fout="Locatie bestaat al")
+                ]).sort_index()
+                geldig = geldig.loc[~dubbel]
+            toegevoegd += opslag.voeg_toe_batch(geldig)
+        verwerkt += len(chunk)
+        if not chunk_fouten.empty:
+            fouten.append(chunk_fouten.assign(Rij=chunk_fouten.index + 2))
+
+        if voortgang is not None:
+            voortgang(verwerkt)
+
+    return {
+        "toegevoegd": toegevoegd,
+        "verwerkt": verwerkt,
+        "fouten": pd.concat(fouten, ignore_index=True) if fouten else pd.DataFrame(columns=["Locatie", "Fout", "Rij"]),
+    }
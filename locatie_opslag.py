@@ -0,0 +1,716 @@
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from ruimtelijk import RuimtelijkeIndex, wgs84_naar_rd
+from zoeken import NotitieIndex, TrigramIndex
+
+# ======================
+# CONSTANTEN
+# ======================
+DB_PAD = os.environ.get(
+    "LOCATIE_DB",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "locaties.db")
+)
+
+KOLOM_TYPES = {
+    "Datum": "TEXT",
+    "Latitude": "REAL",
+    "Longitude": "REAL",
+    "Oppervlakte": "REAL",
+    "RD_X": "REAL",
+    "RD_Y": "REAL",
+}
+RD_KOLOMMEN = ["RD_X", "RD_Y"]
+# Aantal sessieweergaven (momentopname + overlay) dat per proces bewaard blijft
+MAX_WEERGAVEN = 32
+
+
+def _quote(kolom):
+    """Zet een kolomnaam tussen aanhalingstekens (kolommen bevatten spaties)"""
+    return '"' + str(kolom).replace('"', '""') + '"'
+
+
+def _naar_sql(waarde):
+    """Zet pandas/numpy waarden om naar iets wat sqlite3 kan opslaan"""
+    if waarde is None:
+        return None
+    try:
+        if pd.isna(waarde):
+            return None
+    except (TypeError, ValueError):
+        pass
+    if hasattr(waarde, "item"):
+        return waarde.item()
+    if hasattr(waarde, "isoformat"):
+        return waarde.isoformat()
+    return waarde
+
+
+def met_rd(df):
+    """Voeg RD New x/y (EPSG:28992) toe op basis van Latitude/Longitude, voor alle rijen tegelijk"""
+    if "Latitude" not in df.columns or "Longitude" not in df.columns:
+        return df
+    x, y = wgs84_naar_rd(
+        pd.to_numeric(df["Latitude"], errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan),
+        pd.to_numeric(df["Longitude"], errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+    )
+    return df.assign(RD_X=x, RD_Y=y)
+
+
+# ======================
+# SCHEMA
+# ======================
+class LocatieSchema:
+    """Compact, expliciet kolomschema voor de locatietabel"""
+
+    TEKST_KOLOMMEN = ["Locatie", "Adres", "Opmerkingen"]
+
+    def __init__(self, score_kolommen, antwoord_kolommen=(), standaard_score=3, min_score=1, max_score=5):
+        self.score_kolommen = list(score_kolommen)
+        # Antwoorden per subcriterium; anders dan scores blijven ontbrekende antwoorden leeg
+        self.antwoord_kolommen = list(antwoord_kolommen)
+        self.standaard_score = standaard_score
+        self.min_score = min_score
+        self.max_score = max_score
+
+    @property
+    def dtypes(self):
+        dtypes = {
+            "Datum": "datetime64[ns]",
+            "Plaats": "category",
+            "Latitude": "float64",
+            "Longitude": "float64",
+            "Oppervlakte": "float32",
+            "RD_X": "float64",
+            "RD_Y": "float64",
+        }
+        dtypes.update({kolom: "int8" for kolom in self.score_kolommen})
+        dtypes.update({kolom: "float32" for kolom in self.antwoord_kolommen})
+        return dtypes
+
+    @property
+    def sql_types(self):
+        types = dict(KOLOM_TYPES)
+        types.update({kolom: "INTEGER" for kolom in self.score_kolommen + self.antwoord_kolommen})
+        return types
+
+    def pas_toe(self, df):
+        """Zet alle schemakolommen in één keer (gevectoriseerd) om naar hun compacte type"""
+        df = df.copy()
+        for kolom in self.TEKST_KOLOMMEN:
+            if kolom in df.columns:
+                df[kolom] = df[kolom].astype(object).where(df[kolom].notna(), None)
+        if "Datum" in df.columns:
+            df["Datum"] = pd.to_datetime(df["Datum"], errors="coerce", format="ISO8601")
+        if "Plaats" in df.columns:
+            df["Plaats"] = df["Plaats"].astype("category")
+        for kolom in ("Latitude", "Longitude", "Oppervlakte", "RD_X", "RD_Y"):
+            if kolom in df.columns:
+                df[kolom] = pd.to_numeric(df[kolom], errors="coerce").astype(self.dtypes[kolom])
+        for kolom in self.score_kolommen:
+            if kolom in df.columns:
+                df[kolom] = (
+                    pd.to_numeric(df[kolom], errors="coerce")
+                    .fillna(self.standaard_score)
+                    .round()
+                    .clip(self.min_score, self.max_score)
+                    .astype("int8")
+                )
+        for kolom in self.antwoord_kolommen:
+            if kolom in df.columns:
+                df[kolom] = pd.to_numeric(df[kolom], errors="coerce").astype("float32")
+        return df
+
+    def valideer_rij(self, rij):
+        """Controleer en normaliseer één rij vóór het opslaan; geeft een ValueError bij ongeldige waarden"""
+        rij = dict(rij)
+        if "Locatie" in rij and not str(rij["Locatie"] or "").strip():
+            raise ValueError("Locatienaam is verplicht")
+        if rij.get("Datum") is not None:
+            datum = pd.to_datetime(rij["Datum"], errors="coerce")
+            if pd.isna(datum):
+                raise ValueError(f"Ongeldige datum: {rij['Datum']}")
+            rij["Datum"] = datum.strftime("%Y-%m-%d")
+        for kolom, grens in (("Latitude", 90), ("Longitude", 180)):
+            if rij.get(kolom) is not None and not pd.isna(rij[kolom]):
+                waarde = float(rij[kolom])
+                if not -grens <= waarde <= grens:
+                    raise ValueError(f"{kolom} buiten bereik: {waarde}")
+                rij[kolom] = waarde
+        if rij.get("Oppervlakte") is not None and not pd.isna(rij["Oppervlakte"]):
+            rij["Oppervlakte"] = float(rij["Oppervlakte"])
+        for kolom in self.score_kolommen:
+            if kolom in rij:
+                score = rij[kolom]
+                if score is None or pd.isna(score):
+                    score = self.standaard_score
+                score = int(score)
+                if not self.min_score <= score <= self.max_score:
+                    raise ValueError(f"Score voor {kolom} moet tussen {self.min_score} en {self.max_score} liggen")
+                rij[kolom] = score
+        for kolom in self.antwoord_kolommen:
+            if rij.get(kolom) is not None and not pd.isna(rij[kolom]):
+                antwoord = int(rij[kolom])
+                if not self.min_score <= antwoord <= self.max_score:
+                    raise ValueError(f"Antwoord voor {kolom} moet tussen {self.min_score} en {self.max_score} liggen")
+                rij[kolom] = antwoord
+        return rij
+
+    def valideer_df(self, df, bestaande_namen=()):
+        """Gevectoriseerde validatie van een heel blok rijen; geeft (geldig, fouten) terug"""
+        df = df.copy()
+        if "Locatie" not in df.columns:
+            df["Locatie"] = None
+        namen = df["Locatie"].astype("string").str.strip()
+        df["Locatie"] = namen.astype(object)
+
+        # Eerste gevonden fout per rij wint, dus de checks staan van belangrijk naar minder belangrijk
+        fout = pd.Series("", index=df.index, dtype=object)
+        def markeer(masker, melding):
+            fout[(fout == "") & masker.fillna(False).astype(bool)] = melding
+
+        markeer(namen.isna() | (namen == ""), "Locatienaam ontbreekt")
+        markeer(namen.duplicated(keep="first"), "Dubbele locatienaam in bestand")
+        markeer(namen.isin(list(bestaande_namen)), "Locatie bestaat al")
+
+        if "Datum" in df.columns and df["Datum"].notna().any():
+            datum = pd.to_datetime(df["Datum"], errors="coerce", format="mixed", dayfirst=True)
+            markeer(df["Datum"].notna() & datum.isna(), "Ongeldige datum")
+            datum = datum.fillna(pd.Timestamp(datetime.now().date()))
+        else:
+            datum = pd.Series(pd.Timestamp(datetime.now().date()), index=df.index)
+        df["Datum"] = datum.dt.strftime("%Y-%m-%d")
+
+        for kolom, grens in (("Latitude", 90), ("Longitude", 180)):
+            if kolom not in df.columns:
+                df[kolom] = np.nan
+            ruw = df[kolom]
+            if ruw.dtype == object:
+                ruw = ruw.astype("string").str.replace(",", ".", regex=False)
+            waarden = pd.to_numeric(ruw, errors="coerce")
+            markeer(df[kolom].notna() & waarden.isna(), f"Ongeldige {kolom}")
+            markeer(waarden.abs() > grens, f"{kolom} buiten bereik")
+            df[kolom] = waarden.astype("float64")
+
+        if "Oppervlakte" in df.columns:
+            df["Oppervlakte"] = pd.to_numeric(df["Oppervlakte"], errors="coerce")
+
+        for kolom in self.score_kolommen:
+            if kolom not in df.columns:
+                df[kolom] = self.standaard_score
+                continue
+            scores = pd.to_numeric(df[kolom], errors="coerce")
+            markeer(df[kolom].notna() & scores.isna(), f"Ongeldige score voor {kolom}")
+            scores = scores.fillna(self.standaard_score)
+            markeer(
+                (scores % 1 != 0) | (scores < self.min_score) | (scores > self.max_score),
+                f"Score voor {kolom} moet tussen {self.min_score} en {self.max_score} liggen"
+            )
+            df[kolom] = scores.where(fout == "", self.standaard_score).astype("int64")
+
+        for kolom in self.antwoord_kolommen:
+            if kolom in df.columns:
+                antwoorden = pd.to_numeric(df[kolom], errors="coerce")
+                markeer(df[kolom].notna() & antwoorden.isna(), f"Ongeldig antwoord voor {kolom}")
+                # Een ontbrekend antwoord is toegestaan (zoals in valideer_rij); alleen ingevulde waarden toetsen
+                markeer(
+                    antwoorden.notna() & (
+                        (antwoorden % 1 != 0) | (antwoorden < self.min_score) | (antwoorden > self.max_score)
+                    ),
+                    f"Antwoord voor {kolom} moet tussen {self.min_score} en {self.max_score} liggen"
+                )
+                df[kolom] = antwoorden
+
+        # Overige kolommen (bijv. uit onze eigen CSV-export) numeriek opslaan als dat kan
+        bekend = set(self.TEKST_KOLOMMEN) | set(self.dtypes)
+        for kolom in df.columns:
+            if kolom not in bekend and df[kolom].dtype == object:
+                numeriek = pd.to_numeric(df[kolom], errors="coerce")
+                if numeriek.notna().sum() == df[kolom].notna().sum():
+                    df[kolom] = numeriek
+
+        ongeldig = fout != ""
+        fouten = df.loc[ongeldig, ["Locatie"]].assign(Fout=fout[ongeldig])
+        return df.loc[~ongeldig], fouten
+
+
+def geheugen_rapport(df):
+    """Geheugengebruik per kolom (inclusief Python-objecten) als DataFrame"""
+    gebruik = df.memory_usage(deep=True, index=False)
+    rapport = pd.DataFrame({
+        "Type": df.dtypes.astype(str),
+        "Bytes": gebruik,
+    })
+    rapport["Bytes per rij"] = (rapport["Bytes"] / max(len(df), 1)).round(1)
+    return rapport.sort_values("Bytes", ascending=False)
+
+
+# ======================
+# OPSLAG
+# ======================
+class LocatieOpslag:
+    """Persistente SQLite-opslag voor locaties met losse inserts, updates en deletes"""
+
+    def __init__(self, pad=DB_PAD, kolommen=None, types=None, schema=None):
+        self.pad = pad
+        self.schema = schema
+        self.types = dict(schema.sql_types if schema else KOLOM_TYPES, **(types or {}))
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(pad, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(f"CREATE TABLE IF NOT EXISTS locaties ({_quote('Locatie')} TEXT PRIMARY KEY)")
+        self.kolommen = self._lees_kolommen()
+        self.zorg_voor_kolommen(kolommen or [])
+        if kolommen and "Latitude" in kolommen:
+            self.zorg_voor_kolommen(RD_KOLOMMEN)
+            self.vul_rd_aan()
+        self.notities = NotitieIndex(self._conn, self._lock)
+        self.vul_notities_aan()
+
+    def _lees_kolommen(self):
+        return [rij[1] for rij in self._conn.execute("PRAGMA table_info(locaties)")]
+
+    def zorg_voor_kolommen(self, kolommen, types=None):
+        """Voeg ontbrekende kolommen toe aan de tabel (ALTER TABLE is goedkoop in SQLite)"""
+        types = dict(self.types, **(types or {}))
+        with self._lock:
+            for kolom in kolommen:
+                if kolom in self.kolommen:
+                    continue
+                # Zonder type bewaart SQLite de waarde zoals hij binnenkomt
+                sql_type = types.get(kolom, "")
+                self._conn.execute(f"ALTER TABLE locaties ADD COLUMN {_quote(kolom)} {sql_type}")
+                self.kolommen.append(kolom)
+
+    def vul_rd_aan(self):
+        """Bereken RD-coördinaten voor bestaande rijen die ze nog niet hebben (eenmalige migratie)"""
+        if "RD_X" not in self.kolommen or "Latitude" not in self.kolommen:
+            return 0
+        with self._lock:
+            rijen = pd.read_sql_query(
+                f"SELECT rowid, {_quote('Latitude')}, {_quote('Longitude')} FROM locaties "
+                f"WHERE {_quote('RD_X')} IS NULL AND {_quote('Latitude')} IS NOT NULL "
+                f"AND {_quote('Longitude')} IS NOT NULL",
+                self._conn
+            )
+            if rijen.empty:
+                return 0
+            rijen = met_rd(rijen).dropna(subset=RD_KOLOMMEN)
+            self._conn.executemany(
+                f"UPDATE locaties SET {_quote('RD_X')} = ?, {_quote('RD_Y')} = ? WHERE rowid = ?",
+                zip(rijen["RD_X"].tolist(), rijen["RD_Y"].tolist(), rijen["rowid"].tolist())
+            )
+        return len(rijen)
+
+    def vul_notities_aan(self):
+        """Indexeer opmerkingen die nog niet in de notitie-index staan (eenmalige migratie)"""
+        if "Opmerkingen" not in self.kolommen:
+            return 0
+        with self._lock:
+            rijen = self._conn.execute(
+                f"SELECT {_quote('Locatie')}, {_quote('Opmerkingen')} FROM locaties "
+                f"WHERE {_quote('Opmerkingen')} IS NOT NULL AND {_quote('Opmerkingen')} != '' "
+                f"AND {_quote('Locatie')} NOT IN (SELECT locatie FROM notitie_documenten)"
+            ).fetchall()
+            if rijen:
+                with self._atomair():
+                    self.notities.indexeer_batch(rijen)
+        return len(rijen)
+
+    def laad(self, kolommen=None):
+        """Laad alle locaties als DataFrame (in invoegvolgorde)"""
+        with self._lock:
+            df = pd.read_sql_query("SELECT * FROM locaties ORDER BY rowid", self._conn)
+        if kolommen:
+            for kolom in kolommen:
+                if kolom not in df.columns:
+                    df[kolom] = None
+        if self.schema is not None:
+            df = self.schema.pas_toe(df)
+        return df
+
+    @contextmanager
+    def transactie(self):
+        """Voer alle schrijfacties binnen het blok uit als één transactie"""
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                yield self
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                self.kolommen = self._lees_kolommen()
+                raise
+            self._conn.execute("COMMIT")
+
+    @contextmanager
+    def _atomair(self):
+        """Als transactie(), maar ook binnen een lopende transactie te gebruiken (savepoint)"""
+        with self._lock:
+            self._conn.execute("SAVEPOINT atomair")
+            try:
+                yield self
+            except BaseException:
+                self._conn.execute("ROLLBACK TO atomair")
+                self._conn.execute("RELEASE atomair")
+                self.kolommen = self._lees_kolommen()
+                raise
+            self._conn.execute("RELEASE atomair")
+
+    def bestaande_namen(self, namen):
+        """Welke van de gegeven locatienamen staan al in de opslag"""
+        namen = [naam for naam in namen if naam is not None]
+        gevonden = set()
+        with self._lock:
+            # SQLite staat standaard maximaal 999 parameters per query toe
+            for start in range(0, len(namen), 900):
+                deel = namen[start:start + 900]
+                gevonden.update(rij[0] for rij in self._conn.execute(
+                    f"SELECT {_quote('Locatie')} FROM locaties "
+                    f"WHERE {_quote('Locatie')} IN ({', '.join('?' for _ in deel)})",
+                    deel
+                ))
+        return gevonden
+
+    def bestaat(self, locatie):
+        """Controleer of een locatienaam al in de opslag staat"""
+        with self._lock:
+            rij = self._conn.execute(
+                f"SELECT 1 FROM locaties WHERE {_quote('Locatie')} = ?", (locatie,)
+            ).fetchone()
+        return rij is not None
+
+    def voeg_toe(self, rij):
+        """Voeg één locatie toe; geeft een sqlite3.IntegrityError bij een dubbele naam"""
+        if self.schema is not None:
+            rij = self.schema.valideer_rij(rij)
+        if "Latitude" in rij and "Longitude" in rij:
+            rij.update(self._rd_voor(rij["Latitude"], rij["Longitude"]))
+        with self._atomair():
+            self.zorg_voor_kolommen(rij.keys())
+            kolommen = list(rij.keys())
+            self._conn.execute(
+                f"INSERT INTO locaties ({', '.join(_quote(k) for k in kolommen)}) "
+                f"VALUES ({', '.join('?' for _ in kolommen)})",
+                [_naar_sql(rij[k]) for k in kolommen]
+            )
+            if rij.get("Opmerkingen"):
+                self.notities.indexeer(rij["Locatie"], rij["Opmerkingen"])
+
+    def voeg_toe_batch(self, df):
+        """Voeg een heel blok (al gevalideerde) rijen toe met één executemany"""
+        if df.empty:
+            return 0
+        df = met_rd(df)
+        kolommen = list(df.columns)
+        waarden = df.astype(object).where(df.notna(), None)
+        with self._atomair():
+            self.zorg_voor_kolommen(kolommen)
+            self._conn.executemany(
+                f"INSERT INTO locaties ({', '.join(_quote(k) for k in kolommen)}) "
+                f"VALUES ({', '.join('?' for _ in kolommen)})",
+                waarden.itertuples(index=False, name=None)
+            )
+            if "Opmerkingen" in df.columns:
+                notities = waarden.loc[waarden["Opmerkingen"].notna(), ["Locatie", "Opmerkingen"]]
+                self.notities.indexeer_batch(notities.itertuples(index=False, name=None))
+        return len(df)
+
+    def werk_bij(self, locatie, waarden):
+        """Werk één of meer velden van een bestaande locatie bij"""
+        if not waarden:
+            return
+        if self.schema is not None:
+            waarden = self.schema.valideer_rij(waarden)
+        with self._atomair():
+            if "Latitude" in waarden or "Longitude" in waarden:
+                # De andere coördinaat kan uit de bestaande rij komen
+                huidig = self._conn.execute(
+                    f"SELECT {_quote('Latitude')}, {_quote('Longitude')} FROM locaties WHERE {_quote('Locatie')} = ?",
+                    (locatie,)
+                ).fetchone() if "Latitude" in self.kolommen and "Longitude" in self.kolommen else None
+                huidig = huidig or (None, None)
+                waarden = dict(waarden, **self._rd_voor(waarden.get("Latitude", huidig[0]),
+                                                        waarden.get("Longitude", huidig[1])))
+            self.zorg_voor_kolommen(waarden.keys())
+            kolommen = list(waarden.keys())
+            self._conn.execute(
+                f"UPDATE locaties SET {', '.join(_quote(k) + ' = ?' for k in kolommen)} "
+                f"WHERE {_quote('Locatie')} = ?",
+                [_naar_sql(waarden[k]) for k in kolommen] + [locatie]
+            )
+            nieuwe_naam = waarden.get("Locatie", locatie)
+            if nieuwe_naam != locatie:
+                self.notities.hernoem(locatie, nieuwe_naam)
+            if "Opmerkingen" in waarden:
+                self.notities.indexeer(nieuwe_naam, waarden["Opmerkingen"])
+
+    def werk_bij_batch(self, df):
+        """Werk dezelfde (al gevalideerde) kolommen van veel locaties bij met één executemany"""
+        if df.empty:
+            return 0
+        kolommen = [kolom for kolom in df.columns if kolom != "Locatie"]
+        waarden = df[kolommen + ["Locatie"]].astype(object)
+        waarden = waarden.where(waarden.notna(), None)
+        with self._atomair():
+            self.zorg_voor_kolommen(kolommen)
+            self._conn.executemany(
+                f"UPDATE locaties SET {', '.join(_quote(k) + ' = ?' for k in kolommen)} "
+                f"WHERE {_quote('Locatie')} = ?",
+                waarden.itertuples(index=False, name=None)
+            )
+        return len(df)
+
+    @staticmethod
+    def _rd_voor(lat, lon):
+        """RD-kolommen voor één rij; None als er geen (Nederlandse) coördinaten zijn"""
+        lat = _naar_sql(lat)
+        lon = _naar_sql(lon)
+        if lat is None or lon is None:
+            return {"RD_X": None, "RD_Y": None}
+        x, y = wgs84_naar_rd([float(lat)], [float(lon)])
+        return {"RD_X": _naar_sql(x[0]), "RD_Y": _naar_sql(y[0])}
+
+    def verwijder(self, locatie):
+        """Verwijder één locatie; geeft True terug als er iets verwijderd is"""
+        with self._atomair():
+            cursor = self._conn.execute(
+                f"DELETE FROM locaties WHERE {_quote('Locatie')} = ?", (locatie,)
+            )
+            self.notities.verwijder(locatie)
+        return cursor.rowcount > 0
+
+    def aantal(self):
+        """Aantal opgeslagen locaties"""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM locaties").fetchone()[0]
+
+    def sluit(self):
+        with self._lock:
+            self._conn.close()
+
+
+# ======================
+# INDEX
+# ======================
+class LocatieIndex:
+    """Hash-index van locatienaam naar rijlabel in het DataFrame (O(1) opzoeken)"""
+
+    def __init__(self, df=None):
+        self._labels = {}
+        if df is not None and not df.empty:
+            self._labels = dict(zip(df["Locatie"], df.index))
+
+    def __contains__(self, locatie):
+        return locatie in self._labels
+
+    def __len__(self):
+        return len(self._labels)
+
+    def get(self, locatie):
+        """Rijlabel van een locatie, of None als de naam onbekend is"""
+        return self._labels.get(locatie)
+
+    def voeg_toe(self, locatie, label):
+        self._labels[locatie] = label
+
+    def verwijder(self, locatie):
+        self._labels.pop(locatie, None)
+
+
+# ======================
+# GEDEELDE PORTEFEUILLE
+# ======================
+class SessieOverlay:
+    """Niet-opgeslagen wijzigingen van één sessie bovenop de gedeelde momentopname"""
+
+    def __init__(self):
+        self.wijzigingen = {}
+
+    def __len__(self):
+        return len(self.wijzigingen)
+
+    def __contains__(self, locatie):
+        return locatie in self.wijzigingen
+
+    def zet(self, locatie, waarden):
+        self.wijzigingen.setdefault(locatie, {}).update(waarden)
+
+    def sleutel(self):
+        """Hashbare samenvatting van alle wijzigingen (bijv. als deel van een cachesleutel)"""
+        return tuple(sorted(
+            (locatie, tuple(sorted(waarden.items()))) for locatie, waarden in self.wijzigingen.items()
+        ))
+
+    def haal_op(self, locatie):
+        """Neem de wijzigingen van één locatie uit de overlay (bijv. om op te slaan)"""
+        return self.wijzigingen.pop(locatie, {})
+
+    def leeg(self, locatie=None):
+        if locatie is None:
+            self.wijzigingen.clear()
+        else:
+            self.wijzigingen.pop(locatie, None)
+
+    def pas_toe(self, df, index, schema=None):
+        """
+        Copy-on-write: alleen de gewijzigde kolommen worden gekopieerd, de rest deelt geheugen.
+        Met een schema krijgen de gewijzigde kolommen daarna weer hun compacte type.
+        """
+        kolom_wijzigingen = {}
+        for locatie, waarden in self.wijzigingen.items():
+            label = index.get(locatie)
+            if label is None:
+                continue
+            for kolom, waarde in waarden.items():
+                kolom_wijzigingen.setdefault(kolom, []).append((label, waarde))
+
+        weergave = df.copy(deep=False)
+        for kolom, paren in kolom_wijzigingen.items():
+            if kolom in df.columns:
+                nieuwe_kolom = df[kolom].astype(object)
+            else:
+                nieuwe_kolom = pd.Series(None, index=df.index, dtype=object)
+            for label, waarde in paren:
+                nieuwe_kolom.at[label] = waarde
+            weergave[kolom] = nieuwe_kolom
+        if kolom_wijzigingen:
+            gewijzigd = list(kolom_wijzigingen)
+            if schema is not None:
+                weergave[gewijzigd] = schema.pas_toe(weergave[gewijzigd])
+            weergave[gewijzigd] = weergave[gewijzigd].infer_objects()
+        return weergave
+
+
+class GedeeldePortefeuille:
+    """Eén onveranderlijke momentopname van de portefeuille per proces, gedeeld door alle sessies"""
+
+    def __init__(self, opslag, kolommen=None):
+        self.opslag = opslag
+        self.kolommen = kolommen
+        self.versie = 0
+        # Reentrant: opbouw van een index en schrijfacties vragen zelf weer de momentopname op
+        self._lock = threading.RLock()
+        self._snapshot = None
+        self._ruimtelijk = None
+        self._tekst = None
+        self._weergaven = OrderedDict()
+
+    def snapshot(self):
+        """Geef (df, index) van de huidige versie; wordt maximaal één keer per wijziging opgebouwd"""
+        with self._lock:
+            if self._snapshot is None:
+                df = self.opslag.laad(self.kolommen)
+                self._snapshot = (df, LocatieIndex(df))
+            return self._snapshot
+
+    def ververs(self):
+        """Markeer de momentopname als verouderd (bijv. na een bulkimport direct op de opslag)"""
+        with self._lock:
+            self.versie += 1
+            self._snapshot = None
+            self._weergaven.clear()
+            self._ruimtelijk = None
+            self._tekst = None
+
+    def _nieuwe_versie(self):
+        """Na een wijziging via de portefeuille; de afgeleide indexen zijn dan al bijgewerkt"""
+        with self._lock:
+            self.versie += 1
+            self._snapshot = None
+            self._weergaven.clear()
+
+    def ruimtelijke_index(self):
+        """
+        Rasterindex over de coördinaten; één keer opgebouwd en daarna per wijziging bijgewerkt.
+        De opbouw houdt de lock vast, zodat een schrijfactie niet tussen momentopname en
+        opslaan van de index kan vallen (en dan nooit meer in de index zou komen).
+        """
+        with self._lock:
+            if self._ruimtelijk is None:
+                df, _ = self.snapshot()
+                self._ruimtelijk = RuimtelijkeIndex.van_dataframe(df)
+            return self._ruimtelijk
+
+    def tekst_index(self):
+        """Trigramindex over naam, adres, plaats en postcode; opgebouwd en bijgewerkt zoals de ruimtelijke index"""
+        with self._lock:
+            if self._tekst is None:
+                df, _ = self.snapshot()
+                self._tekst = TrigramIndex.van_dataframe(df)
+            return self._tekst
+
+    def weergave(self, overlay=None):
+        """
+        Momentopname met eventuele sessie-overlay; zonder overlay wordt er niets gekopieerd.
+        Weergaven worden per (versie, overlay) bewaard, zodat een rerun zonder wijzigingen
+        hetzelfde DataFrame terugkrijgt en de afgeleide caches van de sessie geldig blijven.
+        """
+        with self._lock:
+            df, index = self.snapshot()
+            if not overlay:
+                return df, index
+            sleutel = (self.versie, overlay.sleutel())
+            weergave = self._weergaven.get(sleutel)
+            if weergave is None:
+                weergave = (overlay.pas_toe(df, index, self.opslag.schema), index)
+                self._weergaven[sleutel] = weergave
+                if len(self._weergaven) > MAX_WEERGAVEN:
+                    self._weergaven.popitem(last=False)
+            else:
+                self._weergaven.move_to_end(sleutel)
+            return weergave
+
+    # Schrijfacties houden de lock vast van opslaan tot en met het bijwerken van de indexen
+    def voeg_toe(self, rij):
+        with self._lock:
+            self.opslag.voeg_toe(rij)
+            if self._ruimtelijk is not None:
+                self._ruimtelijk.voeg_toe(rij["Locatie"], rij.get("Latitude"), rij.get("Longitude"))
+            if self._tekst is not None:
+                self._tekst.voeg_toe(rij["Locatie"], rij)
+            self._nieuwe_versie()
+
+    def werk_bij(self, locatie, waarden):
+        with self._lock:
+            self.opslag.werk_bij(locatie, waarden)
+            ruimtelijk = self._ruimtelijk is not None and {"Locatie", "Latitude", "Longitude"} & set(waarden)
+            tekst = self._tekst is not None and {"Locatie", "Adres", "Plaats"} & set(waarden)
+            if ruimtelijk or tekst:
+                # Een waarde die niet meegegeven is komt uit de momentopname
+                nieuwe_naam = waarden.get("Locatie", locatie)
+                df, index = self.snapshot()
+                label = index.get(locatie)
+                if label is None:
+                    label = index.get(nieuwe_naam)
+                huidig = df.loc[label] if label is not None else {}
+                if ruimtelijk:
+                    self._ruimtelijk.verwijder(locatie)
+                    self._ruimtelijk.voeg_toe(
+                        nieuwe_naam,
+                        waarden.get("Latitude", huidig.get("Latitude")),
+                        waarden.get("Longitude", huidig.get("Longitude"))
+                    )
+                if tekst:
+                    self._tekst.verwijder(locatie)
+                    self._tekst.voeg_toe(nieuwe_naam, {
+                        veld: waarden.get(veld, huidig.get(veld)) for veld in ("Adres", "Plaats")
+                    })
+            self._nieuwe_versie()
+
+    def verwijder(self, locatie):
+        with self._lock:
+            verwijderd = self.opslag.verwijder(locatie)
+            if self._ruimtelijk is not None:
+                self._ruimtelijk.verwijder(locatie)
+            if self._tekst is not None:
+                self._tekst.verwijder(locatie)
+            self._nieuwe_versie()
+            return verwijderd
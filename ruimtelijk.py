@@ -0,0 +1,744 @@
+import gc
+import threading
+from collections import OrderedDict
+from itertools import chain
+
+import numpy as np
+import pandas as pd
+
+# ======================
+# CONSTANTEN
+# ======================
+AARDSTRAAL_KM = 6371.0088  # gemiddelde straal (IUGG)
+WGS84_A_KM = 6378.137
+WGS84_F = 1 / 298.257223563
+# Lambert's formule zit op afstanden tot enkele honderden km binnen een paar meter van de
+# exacte geodetische afstand; alleen punten binnen deze marge rond de straal worden nagerekend
+GRENS_MARGE_KM = 0.01
+# Euclidische RD-afstanden wijken binnen Nederland hooguit ~0,012% af van de geodetische
+# afstand (schaalfout van de projectie); bij RD-afstanden groeit de marge mee met de straal
+RD_SCHAALFOUT = 2e-4
+
+# Rasterindex: cellen van CEL_KM bij CEL_KM in RD New; buiten Nederland een equirectangulaire
+# projectie rond Amersfoort
+REFERENTIE_LAT = 52.155
+CEL_KM = 2.0
+# Aantal centrumpunten waarvan de op afstand gesorteerde volgorde bewaard blijft
+MAX_VOLGORDES = 16
+
+# RD New (EPSG:28992): benaderingsformules van Schreutelaar, binnen ~0,25 m van RDNAPTRANS.
+# Sleutels zijn (p, q) voor dphi^p * dlam^q, met dphi/dlam in eenheden van 10.000 boogseconden.
+RD_X0, RD_Y0 = 155000.0, 463000.0
+RD_PHI0, RD_LAM0 = 52.15517440, 5.38720621
+RD_X_COEF = {
+    (0, 1): 190094.945, (1, 1): -11832.228, (2, 1): -114.221, (0, 3): -32.391, (1, 0): -0.705,
+    (3, 1): -2.340, (1, 3): -0.608, (0, 2): -0.008, (2, 3): 0.148,
+}
+RD_Y_COEF = {
+    (1, 0): 309056.544, (0, 2): 3638.893, (2, 0): 73.077, (1, 2): -157.984, (3, 0): 59.788,
+    (0, 1): 0.433, (2, 2): -6.439, (1, 1): -0.032, (0, 4): 0.092, (1, 4): -0.054,
+}
+# Buiten dit gebied (zuid, west, noord, oost) zijn de formules niet bruikbaar
+RD_GEBIED = (50.5, 2.5, 54.0, 7.6)
+
+
+# ======================
+# AFSTANDEN
+# ======================
+def haversine_km(lat, lon, centrum_lat, centrum_lon):
+    """Grootcirkelafstand in km van alle punten tot één centrum, volledig vectorized"""
+    lat = np.radians(np.asarray(lat, dtype=np.float64))
+    lon = np.radians(np.asarray(lon, dtype=np.float64))
+    centrum_lat = np.radians(centrum_lat)
+    centrum_lon = np.radians(centrum_lon)
+    a = (np.sin((lat - centrum_lat) / 2) ** 2
+         + np.cos(lat) * np.cos(centrum_lat) * np.sin((lon - centrum_lon) / 2) ** 2)
+    return 2 * AARDSTRAAL_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def lambert_km(lat, lon, centrum_lat, centrum_lon):
+    """Ellipsoïdische afstand (WGS84) met Lambert's formule, vectorized; op meters nauwkeurig"""
+    beta1 = np.arctan((1 - WGS84_F) * np.tan(np.radians(np.asarray(lat, dtype=np.float64))))
+    beta2 = np.arctan((1 - WGS84_F) * np.tan(np.radians(centrum_lat)))
+    dlon = np.radians(np.asarray(lon, dtype=np.float64) - centrum_lon)
+    a = np.sin((beta1 - beta2) / 2) ** 2 + np.cos(beta1) * np.cos(beta2) * np.sin(dlon / 2) ** 2
+    sigma = 2 * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+    p = (beta1 + beta2) / 2
+    q = (beta2 - beta1) / 2
+    with np.errstate(divide="ignore", invalid="ignore"):
+        x = (sigma - np.sin(sigma)) * np.sin(p) ** 2 * np.cos(q) ** 2 / np.cos(sigma / 2) ** 2
+        y = (sigma + np.sin(sigma)) * np.cos(p) ** 2 * np.sin(q) ** 2 / np.sin(sigma / 2) ** 2
+    correctie = np.where(sigma > 0, x + y, 0.0)
+    return WGS84_A_KM * (sigma - WGS84_F / 2 * correctie)
+
+
+def wgs84_naar_rd(lat, lon):
+    """WGS84 naar RD New x/y in meters, vectorized; NaN buiten Nederland of zonder coördinaten"""
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    dphi = 0.36 * (lat - RD_PHI0)
+    dlam = 0.36 * (lon - RD_LAM0)
+    x = np.full(lat.shape, RD_X0)
+    y = np.full(lat.shape, RD_Y0)
+    for (p, q), coef in RD_X_COEF.items():
+        x += coef * dphi ** p * dlam ** q
+    for (p, q), coef in RD_Y_COEF.items():
+        y += coef * dphi ** p * dlam ** q
+    zuid, west, noord, oost = RD_GEBIED
+    buiten = ~((lat >= zuid) & (lat <= noord) & (lon >= west) & (lon <= oost))
+    x[buiten] = np.nan
+    y[buiten] = np.nan
+    return x, y
+
+
+def rd_afstand_km(x, y, centrum_x, centrum_y):
+    """Euclidische afstand in km tussen RD-coördinaten (meters); binnen Nederland op ~0,01% nauwkeurig"""
+    return np.hypot(np.asarray(x, dtype=np.float64) - centrum_x, np.asarray(y, dtype=np.float64) - centrum_y) / 1000
+
+
+def geodetisch_km(lat, lon, centrum):
+    """Exacte ellipsoïdische afstand (geopy) voor een klein aantal punten"""
+    from geopy.distance import geodesic
+    return np.array([geodesic(centrum, (la, lo)).km for la, lo in zip(lat, lon)], dtype=np.float64)
+
+
+def binnen_straal(lat, lon, centrum, straal_km, verfijn=True):
+    """
+    Bepaal welke punten binnen straal_km van centrum liggen.
+
+    Eerst een goedkope bounding box, dan Lambert's formule voor de kandidaten en alleen voor
+    punten vlak bij de rand (binnen GRENS_MARGE_KM) de exacte geodetische afstand.
+    Geeft (masker, afstanden); afstanden is NaN voor punten zonder coördinaten.
+    """
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    centrum_lat, centrum_lon = centrum
+    afstanden = np.full(lat.shape, np.nan)
+    if lat.size == 0:
+        return np.zeros(lat.shape, dtype=bool), afstanden
+
+    # Bounding box met ruime marge; bij de polen of een straal over de halve aarde geen box
+    ruim = straal_km * 1.01 + GRENS_MARGE_KM
+    dlat = np.degrees(ruim / AARDSTRAAL_KM)
+    cos_lat = np.cos(np.radians(min(abs(centrum_lat) + dlat, 90.0)))
+    kandidaat = np.isfinite(lat) & np.isfinite(lon)
+    if cos_lat > 1e-6 and dlat < 90:
+        dlon = np.degrees(ruim / (AARDSTRAAL_KM * cos_lat))
+        kandidaat &= np.abs(lat - centrum_lat) <= dlat
+        if dlon < 180:
+            kandidaat &= np.abs((lon - centrum_lon + 180) % 360 - 180) <= dlon
+
+    posities = np.flatnonzero(kandidaat)
+    afstand = lambert_km(lat[posities], lon[posities], centrum_lat, centrum_lon)
+
+    if verfijn and posities.size:
+        grens = np.abs(afstand - straal_km) <= GRENS_MARGE_KM
+        if grens.any():
+            afstand[grens] = geodetisch_km(lat[posities[grens]], lon[posities[grens]], centrum)
+
+    afstanden[posities] = afstand
+    masker = np.zeros(lat.shape, dtype=bool)
+    masker[posities] = afstand <= straal_km
+    return masker, afstanden
+
+
+def grens_marge_km(straal_km):
+    """Marge rond de straal waarbinnen een benaderde afstand exact nagerekend wordt"""
+    return GRENS_MARGE_KM + RD_SCHAALFOUT * straal_km
+
+
+def afstanden_km(lat, lon, x, y, centrum):
+    """
+    Afstand (km) van elk punt tot centrum; NaN zonder coördinaten.
+
+    Punten met RD-coördinaten krijgen bij een centrum in Nederland een Euclidische afstand
+    (geen goniometrie); de rest, en alles buiten Nederland, Lambert's formule op lat/lon.
+    """
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    afstanden = np.full(lat.shape, np.nan)
+    centrum_x, centrum_y = wgs84_naar_rd([centrum[0]], [centrum[1]])
+    if x is not None and np.isfinite(centrum_x[0]):
+        afstanden = rd_afstand_km(x, y, centrum_x[0], centrum_y[0])
+    ontbreekt = np.isnan(afstanden)
+    if ontbreekt.any():
+        afstanden[ontbreekt] = lambert_km(lat[ontbreekt], lon[ontbreekt], *centrum)
+    return afstanden
+
+
+def afstanden_tot(df, centrum):
+    """Afstand (km) van elke rij in df tot centrum, als array; met voorberekende RD-kolommen waar die er zijn"""
+    heeft_rd = "RD_X" in df.columns and "RD_Y" in df.columns
+    return afstanden_km(
+        df["Latitude"].to_numpy(dtype=np.float64, na_value=np.nan),
+        df["Longitude"].to_numpy(dtype=np.float64, na_value=np.nan),
+        df["RD_X"].to_numpy(dtype=np.float64, na_value=np.nan) if heeft_rd else None,
+        df["RD_Y"].to_numpy(dtype=np.float64, na_value=np.nan) if heeft_rd else None,
+        centrum
+    )
+
+
+def punten_in_polygoon(lat, lon, ring):
+    """Even-odd-test voor alle punten tegelijk; ring is een lijst (lat, lon)-hoekpunten"""
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    ring = np.asarray(ring, dtype=np.float64)
+    binnen = np.zeros(lat.shape, dtype=bool)
+    if len(ring) < 3:
+        return binnen
+    lat_a, lon_a = ring[:, 0], ring[:, 1]
+    lat_b, lon_b = np.roll(lat_a, -1), np.roll(lon_a, -1)
+    # Per zijde vectorized over alle punten; het aantal zijden is klein t.o.v. het aantal punten
+    for y1, x1, y2, x2 in zip(lat_a, lon_a, lat_b, lon_b):
+        if y1 == y2:
+            continue
+        kruist = (y1 > lat) != (y2 > lat)
+        x_snij = x1 + (lat - y1) * (x2 - x1) / (y2 - y1)
+        binnen ^= kruist & (lon < x_snij)
+    return binnen
+
+
+def punten_in_vlak(lat, lon, ringen):
+    """Even-odd over alle ringen samen, zodat gaten (binnenringen) vanzelf uitgesloten worden"""
+    binnen = np.zeros(np.shape(lat), dtype=bool)
+    for ring in ringen:
+        binnen ^= punten_in_polygoon(lat, lon, ring)
+    return binnen
+
+
+# ======================
+# POLYGONEN
+# ======================
+def polygonen_uit_geojson(data, naam_veld=None):
+    """
+    Haal alle (Multi)Polygonen uit een GeoJSON-object als lijst (naam, ringen).
+
+    Ringen zijn lijsten (lat, lon); een MultiPolygon levert één item per deel met dezelfde naam.
+    """
+    if data.get("type") == "FeatureCollection":
+        features = data.get("features", [])
+    elif data.get("type") == "Feature":
+        features = [data]
+    else:
+        features = [{"type": "Feature", "geometry": data, "properties": {}}]
+
+    polygonen = []
+    for nummer, feature in enumerate(features, start=1):
+        geometrie = feature.get("geometry") or {}
+        eigenschappen = feature.get("properties") or {}
+        naam = None
+        for veld in ([naam_veld] if naam_veld else []) + ["naam", "name", "statnaam", "gemeentenaam"]:
+            if eigenschappen.get(veld):
+                naam = str(eigenschappen[veld])
+                break
+        naam = naam or f"Gebied {nummer}"
+
+        if geometrie.get("type") == "Polygon":
+            delen = [geometrie["coordinates"]]
+        elif geometrie.get("type") == "MultiPolygon":
+            delen = geometrie["coordinates"]
+        else:
+            continue
+        for deel in delen:
+            # GeoJSON is (lon, lat); intern werken we met (lat, lon)
+            ringen = [np.asarray(ring, dtype=np.float64)[:, [1, 0]] for ring in deel if len(ring) >= 3]
+            if ringen:
+                polygonen.append((naam, ringen))
+    return polygonen
+
+
+class PolygoonIndex:
+    """
+    R-tree (Sort-Tile-Recursive, in één keer opgebouwd) over de bounding boxes van polygonen.
+
+    bevat() loopt de boom af met hele arrays punten tegelijk: per knoop gaan alleen de punten
+    binnen die knoop verder, en pas in de bladeren volgt de exacte point-in-polygon-test.
+    """
+
+    def __init__(self, polygonen, knoop_grootte=8):
+        self.namen = [naam for naam, _ in polygonen]
+        self.ringen = [ringen for _, ringen in polygonen]
+        self.knoop_grootte = knoop_grootte
+        if not polygonen:
+            self.wortel = None
+            return
+        # Bladeren: (bbox, polygoonnummer); knopen: (bbox, kinderen)
+        niveau = []
+        for nummer, ringen in enumerate(self.ringen):
+            punten = np.concatenate(ringen)
+            bbox = (punten[:, 0].min(), punten[:, 1].min(), punten[:, 0].max(), punten[:, 1].max())
+            niveau.append((bbox, nummer))
+        self.bboxen = [bbox for bbox, _ in niveau]
+        self.bbox = self._omhullende(self.bboxen)
+        while len(niveau) > 1 or not isinstance(niveau[0][1], list):
+            niveau = self._pak_in(niveau)
+        self.wortel = niveau[0]
+
+    def __len__(self):
+        return len(self.namen)
+
+    @staticmethod
+    def _omhullende(bboxen):
+        bboxen = np.asarray(bboxen)
+        return (bboxen[:, 0].min(), bboxen[:, 1].min(), bboxen[:, 2].max(), bboxen[:, 3].max())
+
+    def _pak_in(self, items):
+        """Eén STR-niveau: sorteer op lengtegraad, verdeel in stroken, sorteer per strook op breedtegraad"""
+        m = self.knoop_grootte
+        aantal_knopen = int(np.ceil(len(items) / m))
+        stroken = int(np.ceil(np.sqrt(aantal_knopen)))
+        items = sorted(items, key=lambda item: item[0][1] + item[0][3])
+        per_strook = stroken * m
+        knopen = []
+        for begin in range(0, len(items), per_strook):
+            strook = sorted(items[begin:begin + per_strook], key=lambda item: item[0][0] + item[0][2])
+            for i in range(0, len(strook), m):
+                kinderen = strook[i:i + m]
+                knopen.append((self._omhullende([bbox for bbox, _ in kinderen]), kinderen))
+        return knopen
+
+    def kandidaten(self, zuid, west, noord, oost):
+        """Nummers van polygonen waarvan de bounding box de gegeven box raakt"""
+        if self.wortel is None:
+            return []
+        gevonden = []
+        stapel = [self.wortel]
+        while stapel:
+            (z, w, n, o), inhoud = stapel.pop()
+            if z > noord or n < zuid or w > oost or o < west:
+                continue
+            if isinstance(inhoud, list):
+                stapel.extend(inhoud)
+            else:
+                gevonden.append(inhoud)
+        return gevonden
+
+    def bevat(self, lat, lon):
+        """Per punt het nummer van de (eerste) polygoon waarin het ligt, of -1"""
+        lat = np.asarray(lat, dtype=np.float64)
+        lon = np.asarray(lon, dtype=np.float64)
+        resultaat = np.full(lat.shape, -1, dtype=np.int64)
+        if self.wortel is None or lat.size == 0:
+            return resultaat
+
+        stapel = [(self.wortel, np.arange(lat.size))]
+        while stapel:
+            ((z, w, n, o), inhoud), posities = stapel.pop()
+            binnen_box = ((lat[posities] >= z) & (lat[posities] <= n)
+                          & (lon[posities] >= w) & (lon[posities] <= o))
+            posities = posities[binnen_box]
+            if posities.size == 0:
+                continue
+            if isinstance(inhoud, list):
+                stapel.extend((kind, posities) for kind in inhoud)
+                continue
+            # Blad: alleen punten die nog geen polygoon hebben exact testen
+            posities = posities[resultaat[posities] < 0]
+            if posities.size:
+                binnen = punten_in_vlak(lat[posities], lon[posities], self.ringen[inhoud])
+                resultaat[posities[binnen]] = inhoud
+        return resultaat
+
+
+# ======================
+# RUIMTELIJKE INDEX
+# ======================
+class AfstandsVolgorde:
+    """Alle locaties binnen max_km van één centrum, oplopend gesorteerd op afstand"""
+
+    def __init__(self, centrum, max_km, namen, lat, lon, afstanden):
+        volgorde = np.argsort(afstanden, kind="stable")
+        self.centrum = centrum
+        self.max_km = max_km
+        self.namen = np.asarray(namen, dtype=object)[volgorde]
+        self.lat = np.asarray(lat, dtype=np.float64)[volgorde]
+        self.lon = np.asarray(lon, dtype=np.float64)[volgorde]
+        self.afstanden = np.asarray(afstanden, dtype=np.float64)[volgorde]
+
+    def binnen(self, straal_km):
+        """Locaties binnen straal_km als dict locatie -> afstand; een binaire zoekactie, geen herberekening"""
+        if straal_km > self.max_km:
+            raise ValueError(f"Straal {straal_km} km is groter dan de bewaarde {self.max_km} km")
+        marge = grens_marge_km(straal_km)
+        zeker = np.searchsorted(self.afstanden, straal_km - marge, side="right")
+        eind = np.searchsorted(self.afstanden, straal_km + marge, side="right")
+        treffers = dict(zip(self.namen[:zeker].tolist(), self.afstanden[:zeker].tolist()))
+        if eind > zeker:
+            # Alleen de paar punten vlak bij de rand exact narekenen
+            exact = geodetisch_km(self.lat[zeker:eind], self.lon[zeker:eind], self.centrum)
+            treffers.update((naam, afstand) for naam, afstand in zip(self.namen[zeker:eind].tolist(), exact.tolist())
+                            if afstand <= straal_km)
+        return treffers
+
+
+class RuimtelijkeIndex:
+    """
+    Rasterindex over geprojecteerde coördinaten, per locatienaam bij te werken.
+
+    Locaties in Nederland vallen in een cel van CEL_KM in RD New en worden met Euclidische
+    afstanden gemeten; locaties daarbuiten staan in een apart raster op lat/lon en krijgen
+    Lambert's formule. Een zoekvraag bekijkt alleen de cellen die het zoekgebied raken en
+    rekent daarna exact na. Toevoegen en verwijderen zijn O(1), dus de index hoeft bij een
+    nieuwe of verwijderde locatie niet opnieuw opgebouwd te worden.
+    """
+
+    def __init__(self, cel_km=CEL_KM):
+        self.cel_km = cel_km
+        self._km_per_graad_lat = np.pi / 180 * AARDSTRAAL_KM
+        self._km_per_graad_lon = self._km_per_graad_lat * np.cos(np.radians(REFERENTIE_LAT))
+        # Cellen per raster: (x, y) -> {locatie: (lat, lon, rd_x, rd_y)}
+        self._rd_cellen = {}
+        self._cellen = {}
+        # locatie -> (in RD-raster, cel)
+        self._punten = {}
+        self._lock = threading.RLock()
+        self._volgordes = OrderedDict()
+        # Opgehoogd bij elke wijziging; een volgorde berekend op een oudere stand wordt niet bewaard
+        self._wijzigingen = 0
+
+    @classmethod
+    def van_dataframe(cls, df, cel_km=CEL_KM):
+        """Bouw de index uit een DataFrame met Locatie, Latitude en Longitude (en RD_X/RD_Y als die er zijn)"""
+        index = cls(cel_km)
+        if df is None or df.empty:
+            return index
+        lat = pd.to_numeric(df["Latitude"], errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+        lon = pd.to_numeric(df["Longitude"], errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+        geldig = np.isfinite(lat) & np.isfinite(lon)
+        lat, lon = lat[geldig], lon[geldig]
+        if "RD_X" in df.columns and "RD_Y" in df.columns:
+            x = pd.to_numeric(df["RD_X"], errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)[geldig]
+            y = pd.to_numeric(df["RD_Y"], errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)[geldig]
+        else:
+            x = y = np.full(lat.shape, np.nan)
+        # Voorberekende RD-kolommen gebruiken; alleen ontbrekende (bijv. uit een overlay) omrekenen
+        ontbreekt = np.isnan(x) | np.isnan(y)
+        if ontbreekt.any():
+            x, y = x.copy(), y.copy()
+            x[ontbreekt], y[ontbreekt] = wgs84_naar_rd(lat[ontbreekt], lon[ontbreekt])
+        in_rd = np.isfinite(x) & np.isfinite(y)
+        cel_x = np.where(in_rd, np.floor(x / (cel_km * 1000)),
+                         np.floor(lon * index._km_per_graad_lon / cel_km)).astype(np.int64)
+        cel_y = np.where(in_rd, np.floor(y / (cel_km * 1000)),
+                         np.floor(lat * index._km_per_graad_lat / cel_km)).astype(np.int64)
+        # De cyclische garbage collector zou bij elke paar duizend nieuwe tuples de hele
+        # (groeiende) index doorlopen; tijdens het opbouwen even uitzetten scheelt een factor vier
+        gc_aan = gc.isenabled()
+        gc.disable()
+        try:
+            for locatie, rd, cx, cy, punt in zip(df["Locatie"].to_numpy()[geldig].tolist(), in_rd.tolist(),
+                                                cel_x.tolist(), cel_y.tolist(),
+                                                zip(lat.tolist(), lon.tolist(), x.tolist(), y.tolist())):
+                if locatie in index._punten:
+                    index.verwijder(locatie)
+                cel = (cx, cy)
+                (index._rd_cellen if rd else index._cellen).setdefault(cel, {})[locatie] = punt
+                index._punten[locatie] = (rd, cel)
+        finally:
+            if gc_aan:
+                gc.enable()
+        return index
+
+    def __len__(self):
+        return len(self._punten)
+
+    def __contains__(self, locatie):
+        return locatie in self._punten
+
+    def _cel(self, lat, lon):
+        """Cel in het lat/lon-raster"""
+        return (int(np.floor(lon * self._km_per_graad_lon / self.cel_km)),
+                int(np.floor(lat * self._km_per_graad_lat / self.cel_km)))
+
+    def _rd_cel(self, x, y):
+        """Cel in het RD-raster (coördinaten in meters)"""
+        return (int(np.floor(x / (self.cel_km * 1000))), int(np.floor(y / (self.cel_km * 1000))))
+
+    def voeg_toe(self, locatie, lat, lon):
+        """Voeg een locatie toe of verplaats hem; zonder geldige coördinaten wordt hij verwijderd"""
+        self.verwijder(locatie)
+        try:
+            lat, lon = float(lat), float(lon)
+        except (TypeError, ValueError):
+            return
+        if not (np.isfinite(lat) and np.isfinite(lon)):
+            return
+        x, y = wgs84_naar_rd([lat], [lon])
+        x, y = float(x[0]), float(y[0])
+        rd = np.isfinite(x) and np.isfinite(y)
+        cel = self._rd_cel(x, y) if rd else self._cel(lat, lon)
+        with self._lock:
+            (self._rd_cellen if rd else self._cellen).setdefault(cel, {})[locatie] = (lat, lon, x, y)
+            self._punten[locatie] = (rd, cel)
+            self._wijzigingen += 1
+            self._volgordes.clear()
+
+    def verwijder(self, locatie):
+        with self._lock:
+            plek = self._punten.pop(locatie, None)
+            if plek is None:
+                return
+            self._wijzigingen += 1
+            self._volgordes.clear()
+            rd, cel = plek
+            cellen = self._rd_cellen if rd else self._cellen
+            punten = cellen[cel]
+            punten.pop(locatie, None)
+            if not punten:
+                del cellen[cel]
+
+    @staticmethod
+    def _verzamel(cellen, x0, y0, x1, y1, resultaat):
+        """Voeg de namen en punten uit alle cellen in [x0, x1] x [y0, y1] toe aan resultaat"""
+        namen, punten = resultaat
+        if (x1 - x0 + 1) * (y1 - y0 + 1) <= len(cellen):
+            gekozen = (cellen.get((x, y)) for x in range(x0, x1 + 1) for y in range(y0, y1 + 1))
+        else:
+            # Groot zoekgebied: sneller om alleen de bezette cellen af te lopen
+            gekozen = (cel for (x, y), cel in cellen.items() if x0 <= x <= x1 and y0 <= y <= y1)
+        for cel in gekozen:
+            if cel:
+                namen.extend(cel.keys())
+                punten.extend(cel.values())
+
+    @staticmethod
+    def _als_arrays(resultaat):
+        """(namen, lat, lon, rd_x, rd_y) als arrays"""
+        namen, punten = resultaat
+        # fromiter over een platte reeks is vele malen sneller dan np.array op een lijst tuples
+        punten = np.fromiter(chain.from_iterable(punten), dtype=np.float64, count=4 * len(punten)).reshape(-1, 4)
+        return np.array(namen, dtype=object), punten[:, 0], punten[:, 1], punten[:, 2], punten[:, 3]
+
+    @staticmethod
+    def _rd_box(zuid, west, noord, oost):
+        """
+        RD-rechthoek (meters) die een rechthoek in graden omvat, of None buiten het RD-gebied.
+        De rand wordt bemonsterd omdat RD ten opzichte van lat/lon licht gedraaid en gekromd is.
+        """
+        rd_zuid, rd_west, rd_noord, rd_oost = RD_GEBIED
+        zuid, west = max(zuid, rd_zuid), max(west, rd_west)
+        noord, oost = min(noord, rd_noord), min(oost, rd_oost)
+        if zuid > noord or west > oost:
+            return None
+        stappen = np.linspace(0.0, 1.0, 9)
+        lat = np.concatenate([np.full(9, zuid), np.full(9, noord), zuid + stappen * (noord - zuid),
+                              zuid + stappen * (noord - zuid)])
+        lon = np.concatenate([west + stappen * (oost - west), west + stappen * (oost - west),
+                              np.full(9, west), np.full(9, oost)])
+        x, y = wgs84_naar_rd(lat, lon)
+        marge = 0.01 * max(x.max() - x.min(), y.max() - y.min()) + 50.0
+        return x.min() - marge, y.min() - marge, x.max() + marge, y.max() + marge
+
+    def _kandidaten(self, zuid, west, noord, oost):
+        """Namen, lat/lon en RD-coördinaten van alle locaties in de cellen die de bounding box raken"""
+        resultaat = ([], [])
+        rd_box = self._rd_box(zuid, west, noord, oost)
+        with self._lock:
+            if rd_box is not None and self._rd_cellen:
+                (x0, y0), (x1, y1) = self._rd_cel(*rd_box[:2]), self._rd_cel(*rd_box[2:])
+                self._verzamel(self._rd_cellen, x0, y0, x1, y1, resultaat)
+            if self._cellen:
+                (x0, y0), (x1, y1) = self._cel(zuid, west), self._cel(noord, oost)
+                self._verzamel(self._cellen, x0, y0, x1, y1, resultaat)
+        return self._als_arrays(resultaat)
+
+    def bbox(self, zuid, west, noord, oost):
+        """Locaties binnen een rechthoek in graden"""
+        namen, lat, lon, _, _ = self._kandidaten(zuid, west, noord, oost)
+        binnen = (lat >= zuid) & (lat <= noord) & (lon >= west) & (lon <= oost)
+        return namen[binnen].tolist()
+
+    def _rond(self, centrum, straal_km):
+        """Kandidaten in de cellen rond een cirkel; in Nederland direct een vierkant in RD-meters"""
+        centrum_lat, centrum_lon = centrum
+        ruim = straal_km * 1.01 + GRENS_MARGE_KM
+        dlat = np.degrees(ruim / AARDSTRAAL_KM)
+        dlon = np.degrees(ruim / (AARDSTRAAL_KM * max(np.cos(np.radians(min(abs(centrum_lat) + dlat, 89.9))), 1e-6)))
+        zuid, west, noord, oost = centrum_lat - dlat, centrum_lon - dlon, centrum_lat + dlat, centrum_lon + dlon
+        centrum_x, centrum_y = wgs84_naar_rd([centrum_lat], [centrum_lon])
+        if np.isfinite(centrum_x[0]):
+            rd_box = (centrum_x[0] - ruim * 1000, centrum_y[0] - ruim * 1000,
+                      centrum_x[0] + ruim * 1000, centrum_y[0] + ruim * 1000)
+        else:
+            rd_box = self._rd_box(zuid, west, noord, oost)
+        resultaat = ([], [])
+        with self._lock:
+            if rd_box is not None and self._rd_cellen:
+                (x0, y0), (x1, y1) = self._rd_cel(*rd_box[:2]), self._rd_cel(*rd_box[2:])
+                self._verzamel(self._rd_cellen, x0, y0, x1, y1, resultaat)
+            if self._cellen:
+                (x0, y0), (x1, y1) = self._cel(zuid, west), self._cel(noord, oost)
+                self._verzamel(self._cellen, x0, y0, x1, y1, resultaat)
+        return self._als_arrays(resultaat)
+
+    def straal(self, centrum, straal_km, volgorde_km=None):
+        """
+        Locaties binnen straal_km van centrum als dict locatie -> afstand in km.
+
+        Met volgorde_km (bijv. het maximum van een schuifregelaar) wordt voor dit centrum één keer
+        een op afstand gesorteerde lijst tot volgorde_km gemaakt; elke andere straal is daarna een
+        binaire zoekactie in die lijst.
+        """
+        if volgorde_km is not None and straal_km <= volgorde_km:
+            return self.afstandsvolgorde(centrum, volgorde_km).binnen(straal_km)
+        namen, lat, lon, rd_x, rd_y = self._rond(centrum, straal_km)
+        afstanden = afstanden_km(lat, lon, rd_x, rd_y, centrum)
+        # Alleen de punten vlak bij de rand exact narekenen
+        grens = np.abs(afstanden - straal_km) <= grens_marge_km(straal_km)
+        if grens.any():
+            afstanden[grens] = geodetisch_km(lat[grens], lon[grens], centrum)
+        masker = afstanden <= straal_km
+        return dict(zip(namen[masker].tolist(), afstanden[masker].tolist()))
+
+    def afstandsvolgorde(self, centrum, max_km):
+        """Op afstand gesorteerde locaties rond centrum; bewaard tot de index verandert"""
+        sleutel = (round(centrum[0], 6), round(centrum[1], 6), max_km)
+        with self._lock:
+            volgorde = self._volgordes.get(sleutel)
+            if volgorde is not None:
+                self._volgordes.move_to_end(sleutel)
+                return volgorde
+            stand = self._wijzigingen
+        namen, lat, lon, rd_x, rd_y = self._rond(centrum, max_km)
+        afstanden = afstanden_km(lat, lon, rd_x, rd_y, centrum)
+        binnen = afstanden <= max_km + grens_marge_km(max_km)
+        volgorde = AfstandsVolgorde(centrum, max_km, namen[binnen], lat[binnen], lon[binnen], afstanden[binnen])
+        with self._lock:
+            if self._wijzigingen != stand:
+                # Tussentijds gewijzigd: wel teruggeven aan deze aanroep, maar niet bewaren
+                return volgorde
+            self._volgordes[sleutel] = volgorde
+            while len(self._volgordes) > MAX_VOLGORDES:
+                self._volgordes.popitem(last=False)
+        return volgorde
+
+    def polygoon(self, ring):
+        """Locaties binnen een polygoon (lijst (lat, lon)-hoekpunten)"""
+        ring = np.asarray(ring, dtype=np.float64)
+        if len(ring) < 3:
+            return []
+        namen, lat, lon, _, _ = self._kandidaten(ring[:, 0].min(), ring[:, 1].min(), ring[:, 0].max(), ring[:, 1].max())
+        return namen[punten_in_polygoon(lat, lon, ring)].tolist()
+
+    def _aantal_cellen(self, zuid, west, noord, oost):
+        x0, y0 = self._cel(zuid, west)
+        x1, y1 = self._cel(noord, oost)
+        return (x1 - x0 + 1) * (y1 - y0 + 1)
+
+    def gebied(self, polygoon_index):
+        """Locaties binnen één van de polygonen als dict locatie -> naam van het gebied"""
+        if polygoon_index.wortel is None:
+            return {}
+        los = sum(self._aantal_cellen(*bbox) for bbox in polygoon_index.bboxen)
+        if 2 * los >= self._aantal_cellen(*polygoon_index.bbox):
+            # Aaneengesloten gebieden (bijv. gemeenten in één regio): één keer kandidaten
+            # ophalen en in één pass door de R-tree halen
+            namen, lat, lon, _, _ = self._kandidaten(*polygoon_index.bbox)
+            nummers = polygoon_index.bevat(lat, lon)
+            binnen = nummers >= 0
+            return dict(zip(namen[binnen].tolist(), (polygoon_index.namen[i] for i in nummers[binnen])))
+
+        # Verspreide, kleine gebieden: per polygoon alleen de cellen rond zijn eigen bounding box
+        treffers = {}
+        for bbox, naam, ringen in zip(polygoon_index.bboxen, polygoon_index.namen, polygoon_index.ringen):
+            namen, lat, lon, _, _ = self._kandidaten(*bbox)
+            for locatie in namen[punten_in_vlak(lat, lon, ringen)].tolist():
+                treffers.setdefault(locatie, naam)
+        return treffers
+
+    def meerdere_centra(self, centra, straal_km, volgorde_km=None):
+        """Locaties binnen straal_km van minstens één centrum als dict locatie -> kleinste afstand"""
+        treffers = {}
+        for centrum in centra:
+            for locatie, afstand in self.straal(centrum, straal_km, volgorde_km).items():
+                if afstand < treffers.get(locatie, np.inf):
+                    treffers[locatie] = afstand
+        return dict(sorted(treffers.items(), key=lambda item: item[1]))
+
+    @staticmethod
+    def _ringen(cellen, cx, cy, k, past, afstand, cel_km):
+        """
+        Zoek ring voor ring om cel (cx, cy) tot de k-de afstand binnen de doorzochte ringen valt.
+        cel_km is de afstand die elke ring minimaal toevoegt; zonder centrumcel (cx None) wordt
+        het hele raster in één keer doorlopen. Geeft (namen, afstanden) van alle gevonden punten.
+        """
+        namen, afstanden = [], []
+        ring = None if cx is None else 0
+        while True:
+            if ring is None or (ring > 0 and 8 * ring > len(cellen)):
+                # Ringen worden groter dan het raster zelf: de rest in één keer doorlopen
+                gekozen = [punten for (x, y), punten in cellen.items()
+                           if ring is None or max(abs(x - cx), abs(y - cy)) >= ring]
+                ring = None
+            elif ring == 0:
+                gekozen = [cellen.get((cx, cy))]
+            else:
+                rand = [(cx + d, cy - ring) for d in range(-ring, ring + 1)]
+                rand += [(cx + d, cy + ring) for d in range(-ring, ring + 1)]
+                rand += [(cx - ring, cy + d) for d in range(-ring + 1, ring)]
+                rand += [(cx + ring, cy + d) for d in range(-ring + 1, ring)]
+                gekozen = [cellen.get(cel) for cel in rand]
+
+            punten = [(locatie, punt) for deel in gekozen if deel for locatie, punt in deel.items()
+                      if past is None or past(locatie)]
+            if punten:
+                namen.extend(locatie for locatie, _ in punten)
+                afstanden.append(afstand(np.array([punt for _, punt in punten], dtype=np.float64)))
+
+            if ring is None:
+                break
+            # Alles buiten de doorzochte ringen ligt minstens ring * cel_km van het centrum
+            if len(namen) >= k:
+                kde = np.partition(np.concatenate(afstanden), k - 1)[k - 1]
+                if kde <= ring * cel_km:
+                    break
+            ring += 1
+        return namen, (np.concatenate(afstanden) if afstanden else np.zeros(0))
+
+    def dichtstbij(self, centrum, k=10, toegestaan=None):
+        """
+        De k dichtstbijzijnde locaties als dict locatie -> afstand in km, oplopend gesorteerd.
+
+        Zoekt ring voor ring om de cel van het centrum, in beide rasters. toegestaan (een set
+        namen of een functie) wordt al bij het verzamelen toegepast, zodat er doorgezocht wordt
+        tot er k locaties gevonden zijn die aan het filter voldoen.
+        """
+        if k <= 0:
+            return {}
+        if toegestaan is None or callable(toegestaan):
+            past = toegestaan
+        else:
+            past = toegestaan.__contains__
+        centrum_lat, centrum_lon = centrum
+        centrum_x, centrum_y = (float(w[0]) for w in wgs84_naar_rd([centrum_lat], [centrum_lon]))
+        # Buiten de referentiebreedte is een cel in werkelijkheid smaller dan cel_km
+        schaal = 0.99 * min(1.0, np.cos(np.radians(min(abs(centrum_lat) + 1.0, 89.0)))
+                            / np.cos(np.radians(REFERENTIE_LAT)))
+
+        with self._lock:
+            if np.isfinite(centrum_x):
+                # Euclidisch in RD, met ringen van precies cel_km
+                rd_cx, rd_cy = self._rd_cel(centrum_x, centrum_y)
+                rd_afstand = lambda punten: rd_afstand_km(punten[:, 2], punten[:, 3], centrum_x, centrum_y)
+            else:
+                # Centrum buiten het RD-gebied: het RD-raster in één keer met Lambert's formule
+                rd_cx = rd_cy = None
+                rd_afstand = lambda punten: lambert_km(punten[:, 0], punten[:, 1], centrum_lat, centrum_lon)
+            delen = []
+            if self._rd_cellen:
+                delen.append(self._ringen(self._rd_cellen, rd_cx, rd_cy, k, past, rd_afstand, self.cel_km))
+            if self._cellen:
+                cx, cy = self._cel(centrum_lat, centrum_lon)
+                delen.append(self._ringen(
+                    self._cellen, cx, cy, k, past,
+                    lambda punten: lambert_km(punten[:, 0], punten[:, 1], centrum_lat, centrum_lon),
+                    self.cel_km * schaal
+                ))
+
+        namen = [naam for deel_namen, _ in delen for naam in deel_namen]
+        if not namen:
+            return {}
+        afstanden = np.concatenate([deel_afstanden for _, deel_afstanden in delen])
+        volgorde = np.argsort(afstanden, kind="stable")[:k]
+        return {namen[i]: float(afstanden[i]) for i in volgorde}
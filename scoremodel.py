@@ -0,0 +1,312 @@
+import multiprocessing
+import os
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from beslismethoden import METHODEN, skyline
+
+# ======================
+# CONSTANTEN
+# ======================
+# Antwoorden die de hele categorie op de laagste score zetten, ongeacht de overige subcriteria
+KNOCKOUTS = {("Ruimtelijke Inpassing", "Bestemmingsplan"): 1}
+
+# Maximaal aantal bewaarde ranglijsten (één per wegingsprofiel)
+MAX_PROFIELEN = 32
+
+# Gevoeligheidsanalyse: aantal werkprocessen en maximaal aantal scores (locaties x trekkingen) per blok
+WERKPROCESSEN = int(os.environ.get("SCORE_WERKPROCESSEN", os.cpu_count() or 1))
+MAX_BLOK = 4_000_000
+# Kleinere analyses zijn in het eigen proces sneller dan het versturen naar de pool
+MIN_POOL_WERK = 5_000_000
+
+
+# ======================
+# SCOREMODEL
+# ======================
+class ScoreModel:
+    """
+    Berekent de categorie- en totaalscores uit de antwoorden per subcriterium, voor de hele
+    portefeuille tegelijk.
+
+    De regels volgen uit SCORE_LEGEND: een categoriescore is het (gewogen) gemiddelde van de
+    beantwoorde subcriteria, afgerond op een hele score, en een knock-out-antwoord zet de
+    categorie op de laagste score. Het gemiddelde is één matrixvermenigvuldiging van de
+    antwoordmatrix (locaties x subcriteria) met een aggregatiematrix (subcriteria x categorieën).
+    """
+
+    def __init__(self, legend, knockouts=None, gewichten=None, min_score=1, max_score=5):
+        self.categorieen = list(legend)
+        self.subcriteria = [sub for categorie in legend for sub in legend[categorie]]
+        self.min_score = min_score
+        self.max_score = max_score
+        gewichten = gewichten or {}
+        self._aggregatie = np.zeros((len(self.subcriteria), len(self.categorieen)))
+        j = 0
+        for c, categorie in enumerate(self.categorieen):
+            for sub in legend[categorie]:
+                self._aggregatie[j, c] = gewichten.get(sub, 1.0)
+                j += 1
+        knockouts = KNOCKOUTS if knockouts is None else knockouts
+        self._knockouts = [
+            (self.subcriteria.index(sub), self.categorieen.index(categorie), antwoord)
+            for (categorie, sub), antwoord in knockouts.items()
+            if categorie in self.categorieen and sub in self.subcriteria
+        ]
+
+    def antwoorden(self, df):
+        """Antwoordmatrix (locaties x subcriteria) uit een DataFrame; ontbrekend wordt NaN"""
+        if df.empty:
+            return np.empty((0, len(self.subcriteria)))
+        return (
+            df.reindex(columns=self.subcriteria)
+            .apply(pd.to_numeric, errors="coerce")
+            .to_numpy(np.float64, na_value=np.nan)
+        )
+
+    def bereken(self, antwoorden):
+        """Categoriescores (locaties x categorieën); NaN voor een categorie zonder antwoorden"""
+        antwoorden = np.atleast_2d(np.asarray(antwoorden, dtype=np.float64))
+        aanwezig = ~np.isnan(antwoorden)
+        teller = np.where(aanwezig, antwoorden, 0.0) @ self._aggregatie
+        noemer = aanwezig @ self._aggregatie
+        with np.errstate(invalid="ignore", divide="ignore"):
+            # np.round rondt half naar even af, net als round() in de oude per-locatie berekening
+            scores = np.round(teller / noemer)
+        for j, c, antwoord in self._knockouts:
+            scores[antwoorden[:, j] == antwoord, c] = self.min_score
+        return np.clip(scores, self.min_score, self.max_score)
+
+    def bereken_rij(self, antwoorden):
+        """Categoriescores voor één locatie uit een dict {subcriterium: antwoord}"""
+        rij = [antwoorden.get(sub, np.nan) for sub in self.subcriteria]
+        scores = self.bereken([[np.nan if a is None else a for a in rij]])[0]
+        return {
+            categorie: None if np.isnan(score) else int(score)
+            for categorie, score in zip(self.categorieen, scores)
+        }
+
+    def scores(self, df):
+        """
+        Categoriescores plus Totaalscore voor alle locaties in df. Een categorie zonder
+        antwoorden houdt de score die al in df staat (bijv. uit een import).
+        """
+        scores = pd.DataFrame(self.bereken(self.antwoorden(df)), index=df.index, columns=self.categorieen)
+        for categorie in self.categorieen:
+            if categorie in df.columns:
+                scores[categorie] = scores[categorie].fillna(pd.to_numeric(df[categorie], errors="coerce"))
+        scores["Totaalscore"] = scores[self.categorieen].sum(axis=1, min_count=1)
+        return scores
+
+    def wijzigingen(self, df):
+        """Alleen de locaties waarvan een categoriescore door de regels verandert (Locatie + categorieën)"""
+        nieuw = self.scores(df)[self.categorieen]
+        oud = df.reindex(columns=self.categorieen).apply(pd.to_numeric, errors="coerce")
+        anders = (nieuw.to_numpy() != oud.to_numpy()) & ~np.isnan(nieuw.to_numpy())
+        gewijzigd = anders.any(axis=1)
+        return nieuw.loc[gewijzigd].astype("Int64").assign(Locatie=df.loc[gewijzigd, "Locatie"].to_numpy())
+
+
+# ======================
+# WEGING
+# ======================
+class Weging:
+    """Gewichten per criterium, omgezet naar een genormaliseerde gewichtsvector (som 1)"""
+
+    def __init__(self, gewichten, schaal=1.0):
+        self.criteria = list(gewichten)
+        vector = np.array([float(gewichten[criterium]) for criterium in self.criteria])
+        if (vector < 0).any() or vector.sum() <= 0:
+            raise ValueError("Gewichten moeten positief zijn en mogen niet allemaal 0 zijn")
+        self.vector = vector / vector.sum()
+        self.schaal = schaal
+
+    @property
+    def sleutel(self):
+        """Hashbare identiteit van het profiel; gelijke verhoudingen geven dezelfde sleutel"""
+        return tuple(self.criteria), tuple(np.round(self.vector, 9)), self.schaal
+
+    def percentages(self):
+        return {criterium: 100 * gewicht for criterium, gewicht in zip(self.criteria, self.vector)}
+
+    def vector_voor(self, criteria):
+        """Gewichtsvector in de kolomvolgorde van een criteriummatrix"""
+        volgorde = {criterium: i for i, criterium in enumerate(self.criteria)}
+        return np.array([self.vector[volgorde[c]] if c in volgorde else 0.0 for c in criteria])
+
+    def totaal(self, scores):
+        """Gewogen totaalscore van één locatie uit een dict {criterium: score}"""
+        return self.schaal * sum(float(scores.get(c) or 0) * w for c, w in zip(self.criteria, self.vector))
+
+
+def maak_procespool(werkers=WERKPROCESSEN):
+    """
+    Pool met werkprocessen plus het aantal werkers, als (pool, werkers); 'spawn' omdat forken
+    vanuit een proces met threads niet veilig is
+    """
+    return ProcessPoolExecutor(max_workers=werkers, mp_context=multiprocessing.get_context("spawn")), werkers
+
+
+def rangen(scores, aantallen=None):
+    """
+    Rangen per rij met scores (trekkingen x locaties): de hoogste score krijgt rang 1 en gelijke
+    scores delen de beste rang (1, 2, 2, 4). Met `aantallen` staat elke kolom voor zoveel
+    locaties met precies dezelfde scores.
+    """
+    # Afronden zodat wegingen als 0.3 * 5 + 0.2 * 1 en 0.2 * 5 + 0.3 * 1 ... echt gelijk eindigen
+    scores = np.round(scores, 9)
+    volgorde = np.argsort(-scores, axis=1, kind="stable")
+    gesorteerd = np.take_along_axis(scores, volgorde, axis=1)
+    gewicht = np.ones(scores.shape[1], dtype=np.int64) if aantallen is None else np.asarray(aantallen)
+    gewicht = gewicht[volgorde]
+    # Aantal locaties vóór elke positie; binnen een groep gelijke scores geldt dat van de eerste
+    voor = np.cumsum(gewicht, axis=1) - gewicht
+    nieuw = np.ones(gesorteerd.shape, dtype=bool)
+    nieuw[:, 1:] = gesorteerd[:, 1:] != gesorteerd[:, :-1]
+    rang_gesorteerd = np.maximum.accumulate(np.where(nieuw, voor, 0), axis=1) + 1
+    rang = np.empty_like(rang_gesorteerd)
+    np.put_along_axis(rang, volgorde, rang_gesorteerd, axis=1)
+    return rang
+
+
+def _rangstatistiek(profielen, aantallen, alpha, actief, aantal, top_k, seed):
+    """
+    Werker van de gevoeligheidsanalyse: trekt `aantal` gewichtsvectoren uit een Dirichlet-
+    verdeling, scoort alle scoreprofielen per trekking en geeft alleen tellingen per profiel terug.
+    """
+    rng = np.random.default_rng(seed)
+    m = profielen.shape[0]
+    som = np.zeros(m)
+    kwadraten = np.zeros(m)
+    in_top = np.zeros(m, dtype=np.int64)
+    beste = np.full(m, np.iinfo(np.int64).max, dtype=np.int64)
+    slechtste = np.zeros(m, dtype=np.int64)
+    blok = max(1, MAX_BLOK // max(m, 1))
+    for start in range(0, aantal, blok):
+        gewichten = np.zeros((min(blok, aantal - start), profielen.shape[1]))
+        gewichten[:, actief] = rng.dirichlet(alpha, size=len(gewichten))
+        rang = rangen(gewichten @ profielen.T, aantallen)
+        som += rang.sum(axis=0)
+        kwadraten += np.square(rang, dtype=np.float64).sum(axis=0)
+        in_top += (rang <= top_k).sum(axis=0)
+        np.minimum(beste, rang.min(axis=0), out=beste)
+        np.maximum(slechtste, rang.max(axis=0), out=slechtste)
+    return som, kwadraten, in_top, beste, slechtste
+
+
+class Ranglijst:
+    """
+    Criteriummatrix (locaties x criteria) van de portefeuille, waarmee elke weging met één
+    matrix-vectorproduct een volledige ranglijst oplevert. Ranglijsten worden per
+    wegingsprofiel bewaard (LRU), zodat terugschuiven naar een eerder profiel niets kost.
+    """
+
+    def __init__(self, df, criteria, max_profielen=MAX_PROFIELEN):
+        self.criteria = list(criteria)
+        self.locaties = df["Locatie"].to_numpy(dtype=object) if "Locatie" in df.columns else np.array([], dtype=object)
+        if df.empty:
+            self.matrix = np.zeros((0, len(self.criteria)))
+        else:
+            self.matrix = (
+                df.reindex(columns=self.criteria)
+                .apply(pd.to_numeric, errors="coerce")
+                .fillna(0)
+                .to_numpy(np.float64)
+            )
+        self.max_profielen = max_profielen
+        self._ranglijsten = OrderedDict()
+        self._pareto = None
+
+    def __len__(self):
+        return len(self.locaties)
+
+    def totaalscores(self, weging):
+        """Gewogen totaalscore per locatie, in de volgorde van de DataFrame"""
+        return self.matrix @ (weging.vector_voor(self.criteria) * weging.schaal)
+
+    def rangschik(self, weging, methode="Gewogen som"):
+        """
+        Ranglijst (Rang, Locatie, score) van hoog naar laag, gecachet per wegingsprofiel en
+        methode. De gewogen som geeft de kolom Totaalscore, de andere methoden (zie
+        beslismethoden.METHODEN) een kolom Score op hun eigen schaal.
+        """
+        sleutel = (weging.sleutel, methode)
+        ranglijst = self._ranglijsten.get(sleutel)
+        if ranglijst is not None:
+            self._ranglijsten.move_to_end(sleutel)
+            return ranglijst
+        if methode == "Gewogen som":
+            kolom, totaal = "Totaalscore", self.totaalscores(weging)
+        else:
+            kolom, totaal = "Score", METHODEN[methode](self.matrix, weging.vector_voor(self.criteria))
+        # Zelfde regel als rangen() (en dus de gevoeligheidsanalyse): gelijke scores delen de beste rang
+        rang = rangen(totaal[None, :])[0]
+        volgorde = np.lexsort((np.arange(len(rang)), rang))
+        ranglijst = pd.DataFrame({
+            "Rang": rang[volgorde],
+            "Locatie": self.locaties[volgorde],
+            kolom: totaal[volgorde],
+        })
+        self._ranglijsten[sleutel] = ranglijst
+        if len(self._ranglijsten) > self.max_profielen:
+            self._ranglijsten.popitem(last=False)
+        return ranglijst
+
+    def pareto(self, locaties=None):
+        """
+        Locaties op het Pareto-front (Locatie plus criteria): locaties die door geen andere
+        locatie overtroffen worden, ongeacht de weging. Met locaties alleen binnen die selectie;
+        het front van de hele portefeuille wordt bewaard.
+        """
+        if locaties is None:
+            if self._pareto is None:
+                self._pareto = skyline(self.matrix)
+            masker = self._pareto
+            rijen = np.arange(len(self.locaties))
+        else:
+            rijen = np.flatnonzero(pd.Series(self.locaties).isin(list(locaties)).to_numpy())
+            masker = skyline(self.matrix[rijen])
+        rijen = rijen[masker]
+        front = pd.DataFrame(self.matrix[rijen], columns=self.criteria)
+        front.insert(0, "Locatie", self.locaties[rijen])
+        return front
+
+    def gevoeligheid(self, weging, aantal=2000, concentratie=50, top_k=3, pool=None, werkers=1, seed=0):
+        """
+        Monte-Carlo-gevoeligheid van de ranglijst voor de weging. Gewichtsvectoren worden
+        getrokken uit een Dirichlet-verdeling rond de gegeven weging (hoe hoger de concentratie,
+        hoe dichter erbij) en in blokken over de procespool (met `werkers` processen) verdeeld. Locaties met precies
+        dezelfde scores krijgen altijd dezelfde rang, dus er wordt per uniek scoreprofiel gerekend.
+        Geeft per locatie de rangspreiding en de kans op een plek in de top-k.
+        """
+        vector = weging.vector_voor(self.criteria)
+        actief = vector > 0
+        alpha = concentratie * vector[actief] / vector[actief].sum()
+        basis = rangen(self.totaalscores(weging)[None, :])[0]
+        profielen, terug, aantallen = np.unique(self.matrix, axis=0, return_inverse=True, return_counts=True)
+        terug = terug.reshape(-1)
+
+        if pool is None or werkers <= 1 or len(profielen) * aantal < MIN_POOL_WERK:
+            resultaten = [_rangstatistiek(profielen, aantallen, alpha, actief, aantal, top_k, seed)]
+        else:
+            stukken = [len(stuk) for stuk in np.array_split(np.arange(aantal), werkers * 4) if len(stuk)]
+            zaden = np.random.SeedSequence(seed).spawn(len(stukken))
+            resultaten = list(pool.map(
+                _rangstatistiek,
+                *zip(*[(profielen, aantallen, alpha, actief, stuk, top_k, zaad) for stuk, zaad in zip(stukken, zaden)])
+            ))
+
+        gemiddelde = sum(r[0] for r in resultaten) / aantal
+        spreiding = np.sqrt(np.maximum(sum(r[1] for r in resultaten) / aantal - gemiddelde ** 2, 0))
+        return pd.DataFrame({
+            "Locatie": self.locaties,
+            "Rang": basis,
+            "Gemiddelde rang": gemiddelde[terug],
+            "Spreiding rang": spreiding[terug],
+            "Beste rang": np.min([r[3] for r in resultaten], axis=0)[terug],
+            "Slechtste rang": np.max([r[4] for r in resultaten], axis=0)[terug],
+            f"Kans top-{top_k}": (sum(r[2] for r in resultaten) / aantal)[terug],
+        }).sort_values(["Rang", f"Kans top-{top_k}"], ascending=[True, False], ignore_index=True)
@@ -0,0 +1,33 @@
+from ruimtelijk import RuimtelijkeIndex
+
+UTRECHT = (52.0907, 5.1214)
+
+
+def test_afstandsvolgorde_niet_bewaard_na_tussentijdse_wijziging():
+    index = RuimtelijkeIndex()
+    index.voeg_toe("Centrum", 52.0907, 5.1214)
+    index.voeg_toe("Zeist", 52.0894, 5.2330)
+
+    # Een andere sessie voegt een locatie toe terwijl de volgorde berekend wordt
+    rond = index._rond
+
+    def rond_met_wijziging(centrum, straal_km):
+        kandidaten = rond(centrum, straal_km)
+        index.voeg_toe("Houten", 52.0283, 5.1681)
+        return kandidaten
+
+    index._rond = rond_met_wijziging
+    eerste = index.afstandsvolgorde(UTRECHT, 20)
+    index._rond = rond
+
+    assert "Houten" not in eerste.binnen(20)
+    assert "Houten" in index.afstandsvolgorde(UTRECHT, 20).binnen(20)
+    assert "Houten" in index.straal(UTRECHT, 10, volgorde_km=20)
+
+
+def test_afstandsvolgorde_bewaard_zonder_wijziging():
+    index = RuimtelijkeIndex()
+    index.voeg_toe("Centrum", 52.0907, 5.1214)
+    assert index.afstandsvolgorde(UTRECHT, 20) is index.afstandsvolgorde(UTRECHT, 20)
+    index.verwijder("Centrum")
+    assert "Centrum" not in index.afstandsvolgorde(UTRECHT, 20).binnen(20)
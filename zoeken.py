@@ -0,0 +1,640 @@
+import gc
+import math
+import re
+import sqlite3
+import threading
+from collections import Counter, OrderedDict
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from geocodering import normaliseer_adres
+
+# ======================
+# CONSTANTEN
+# ======================
+# Gewicht per veld bij het rangschikken; een treffer in de naam telt zwaarder dan in het adres
+TEKST_VELDEN = {"Locatie": 3.0, "Postcode": 2.0, "Plaats": 1.5, "Adres": 1.0}
+MIN_GELIJKENIS = 0.3
+
+# Maximaal aantal bewaarde zoekresultaten (LRU)
+MAX_ZOEKRESULTATEN = 64
+
+# BM25-parameters (de gangbare standaardwaarden)
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Snowball-stopwoordenlijst voor het Nederlands
+STOPWOORDEN = frozenset("""
+    de en van ik te dat die in een hij het niet zijn is was op aan met als voor had er maar om hem
+    dan zou of wat mijn men dit zo door over ze zich bij ook tot je mij uit der daar haar naar heb
+    hoe heeft hebben deze u want nog zal me zij nu ge geen omdat iets worden toch al waren veel meer
+    doen toen moet ben zonder kan hun dus alles onder ja eens hier wie werd altijd doch wordt wezen
+    kunnen ons zelf tegen na reeds wil kon niets uw iemand geweest andere
+""".split())
+
+_POSTCODE = re.compile(r"\b(\d{4}[a-z]{2})\b")
+_WOORD = re.compile(r"[a-z0-9]+")
+# Aantal gezette bits per byte, voor het tellen van treffers in een bitmap
+_POPCOUNT = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1).astype(np.uint8)
+_KLINKERS = frozenset("aeiouy")
+
+
+def normaliseer_tekst(tekst):
+    """Kleine letters, zonder accenten en met vaste spaties; postcodes als '1234ab'"""
+    if tekst is None or (isinstance(tekst, float) and tekst != tekst):
+        return ""
+    return normaliseer_adres(tekst)
+
+
+def trigrammen(tekst):
+    """Trigrammen van een tekst met twee spaties ervoor, zodat ook het begin van een veld telt"""
+    tekst = f"  {tekst} "
+    return {tekst[i:i + 3] for i in range(len(tekst) - 2)}
+
+
+# ======================
+# TRIGRAM-INDEX
+# ======================
+class TrigramIndex:
+    """
+    Inverted index van trigram naar locaties, over naam, adres, plaats en postcode.
+
+    De index werkt op unieke teksten: elke tekst (bijv. een plaatsnaam die honderden keren
+    voorkomt) wordt één keer opgeslagen, in trigrammen opgeknipt en bij het zoeken één keer
+    gecontroleerd. Per tekst staat bij welke locaties en in welk veld hij voorkomt.
+    Een substring-zoekactie doorsnijdt de postings van alle trigrammen uit de zoekterm en
+    controleert alleen die kandidaten; fuzzy zoeken telt gedeelde trigrammen (zoals pg_trgm).
+    De zoekterm is altijd letterlijke tekst, nooit een reguliere expressie.
+    """
+
+    def __init__(self, velden=None):
+        self.velden = dict(velden or TEKST_VELDEN)
+        self._postings = {}
+        self._tekst_ids = {}
+        self._teksten = []
+        self._voorkomens = []
+        self._vrije_teksten = []
+        self._locaties = {}
+        self._lock = threading.RLock()
+
+    @classmethod
+    def van_dataframe(cls, df, velden=None):
+        index = cls(velden)
+        if df is None or df.empty:
+            return index
+        kolommen = [kolom for kolom in ("Locatie", "Adres", "Plaats") if kolom in df.columns]
+        # Zie RuimtelijkeIndex.van_dataframe: de GC tijdens het opbouwen even uitzetten
+        gc_aan = gc.isenabled()
+        gc.disable()
+        try:
+            for waarden in df[kolommen].itertuples(index=False, name=None):
+                index.voeg_toe(waarden[0], dict(zip(kolommen, waarden)))
+        finally:
+            if gc_aan:
+                gc.enable()
+        return index
+
+    def __len__(self):
+        return len(self._locaties)
+
+    def __contains__(self, locatie):
+        return locatie in self._locaties
+
+    def _velden_voor(self, locatie, rij):
+        teksten = {"Locatie": normaliseer_tekst(locatie)}
+        for veld in ("Adres", "Plaats"):
+            teksten[veld] = normaliseer_tekst(rij.get(veld))
+        postcode = _POSTCODE.search(teksten["Adres"])
+        teksten["Postcode"] = postcode.group(1) if postcode else ""
+        # Komma's weg zodat 'straat 1 utrecht' ook 'straat 1, utrecht' vindt
+        return {veld: tekst.replace(",", "") for veld, tekst in teksten.items() if tekst and veld in self.velden}
+
+    def voeg_toe(self, locatie, rij):
+        """Voeg een locatie toe of werk hem bij; rij bevat (een deel van) Adres en Plaats"""
+        teksten = self._velden_voor(locatie, rij)
+        with self._lock:
+            self.verwijder(locatie)
+            self._locaties[locatie] = teksten
+            for veld, tekst in teksten.items():
+                tid = self._tekst_ids.get(tekst)
+                if tid is None:
+                    tid = self._nieuwe_tekst(tekst)
+                self._voorkomens[tid].setdefault(locatie, set()).add(veld)
+
+    def _nieuwe_tekst(self, tekst):
+        tid = self._vrije_teksten.pop() if self._vrije_teksten else len(self._teksten)
+        if tid == len(self._teksten):
+            self._teksten.append(tekst)
+            self._voorkomens.append({})
+        else:
+            self._teksten[tid] = tekst
+            self._voorkomens[tid] = {}
+        self._tekst_ids[tekst] = tid
+        postings = self._postings
+        for trigram in trigrammen(tekst):
+            lijst = postings.get(trigram)
+            if lijst is None:
+                postings[trigram] = {tid}
+            else:
+                lijst.add(tid)
+        return tid
+
+    def verwijder(self, locatie):
+        with self._lock:
+            teksten = self._locaties.pop(locatie, None)
+            if teksten is None:
+                return
+            for tekst in set(teksten.values()):
+                tid = self._tekst_ids[tekst]
+                voorkomens = self._voorkomens[tid]
+                voorkomens.pop(locatie, None)
+                if voorkomens:
+                    continue
+                # Tekst wordt door geen enkele locatie meer gebruikt: uit de postings halen
+                for trigram in trigrammen(tekst):
+                    postings = self._postings.get(trigram)
+                    if postings is not None:
+                        postings.discard(tid)
+                        if not postings:
+                            del self._postings[trigram]
+                del self._tekst_ids[tekst]
+                self._teksten[tid] = None
+                self._vrije_teksten.append(tid)
+
+    def teksten(self, locatie):
+        """De genormaliseerde, geïndexeerde velden van een locatie"""
+        return dict(self._locaties.get(locatie, {}))
+
+    def _substring_kandidaten(self, zoekterm):
+        if len(zoekterm) >= 3:
+            benodigd = {zoekterm[i:i + 3] for i in range(len(zoekterm) - 2)}
+        else:
+            # Korte zoekterm: alleen woorden die ermee beginnen
+            benodigd = {(" " + zoekterm).rjust(3)}
+        lijsten = sorted((self._postings.get(trigram, set()) for trigram in benodigd), key=len)
+        kandidaten = set(lijsten[0])
+        for postings in lijsten[1:]:
+            kandidaten &= postings
+            if not kandidaten:
+                break
+        return kandidaten
+
+    @staticmethod
+    def _soort_treffer(tekst, zoekterm):
+        """4 = exact, 3 = begin van het veld, 2,5 = begin van een woord, 2 = ergens, 0 = geen"""
+        positie = tekst.find(zoekterm)
+        if positie < 0:
+            return 0.0
+        if tekst == zoekterm:
+            return 4.0
+        if positie == 0:
+            return 3.0
+        if tekst[positie - 1] == " ":
+            return 2.5
+        return 2.0
+
+    def _verspreid(self, tid, soort, velden, scores):
+        """Ken de score van een tekst toe aan alle locaties die hem (in een gezocht veld) hebben"""
+        for locatie, in_velden in self._voorkomens[tid].items():
+            score = soort * max(velden.get(veld, 0.0) for veld in in_velden)
+            if score > scores.get(locatie, 0.0):
+                scores[locatie] = score
+
+    def zoek(self, zoekterm, limiet=50, velden=None, fuzzy=True, min_gelijkenis=MIN_GELIJKENIS):
+        """
+        Zoek locaties op (een deel van) naam, adres, plaats of postcode.
+
+        Geeft een lijst (locatie, score) met de beste treffers eerst. Een exacte treffer scoort
+        hoger dan een prefix, een prefix hoger dan een substring en een substring hoger dan een
+        fuzzy treffer; binnen elke soort telt het gewicht van het veld. Met limiet=None komen
+        alle substringtreffers terug.
+        """
+        zoekterm = normaliseer_tekst(zoekterm).replace(",", "")
+        if not zoekterm:
+            return []
+        velden = {veld: gewicht for veld, gewicht in self.velden.items() if velden is None or veld in velden}
+        scores = {}
+
+        with self._lock:
+            for tid in self._substring_kandidaten(zoekterm):
+                soort = self._soort_treffer(self._teksten[tid], zoekterm)
+                if soort:
+                    self._verspreid(tid, soort, velden, scores)
+
+            if fuzzy and len(scores) < (limiet or 1) and len(zoekterm) >= 3:
+                zoek_trigrammen = trigrammen(zoekterm)
+                telling = Counter()
+                for trigram in zoek_trigrammen:
+                    telling.update(self._postings.get(trigram, ()))
+                minimum = min_gelijkenis * len(zoek_trigrammen)
+                for tid, gedeeld in telling.most_common((limiet or 50) * 5):
+                    if gedeeld < minimum:
+                        break
+                    # Gelijkenis per woord(groep) zodat een lang adres een korte term niet wegdrukt
+                    tekst = self._teksten[tid]
+                    beste = 0.0
+                    for deel in [tekst] + tekst.split():
+                        deel_trigrammen = trigrammen(deel)
+                        gelijk = len(zoek_trigrammen & deel_trigrammen)
+                        beste = max(beste, gelijk / (len(zoek_trigrammen) + len(deel_trigrammen) - gelijk))
+                    if beste >= min_gelijkenis:
+                        # Maal een half: een fuzzy treffer blijft onder elke substringtreffer
+                        fuzzy_scores = {}
+                        self._verspreid(tid, 0.5 * beste, velden, fuzzy_scores)
+                        for locatie, score in fuzzy_scores.items():
+                            if locatie not in scores or scores[locatie] < 2.0 and score > scores[locatie]:
+                                scores[locatie] = score
+
+            resultaat = sorted(((locatie, score) for locatie, score in scores.items() if score > 0),
+                               key=lambda item: (-item[1], item[0]))
+        return resultaat[:limiet] if limiet else resultaat
+
+
+# ======================
+# STEMMING
+# ======================
+def _regio(woord):
+    """Begin van de regio na de eerste medeklinker die op een klinker volgt (Snowball R1/R2)"""
+    for i in range(1, len(woord)):
+        if woord[i] not in _KLINKERS and woord[i - 1] in _KLINKERS:
+            return i + 1
+    return len(woord)
+
+
+def _ontdubbel(woord):
+    return woord[:-1] if woord.endswith(("kk", "dd", "tt")) else woord
+
+
+def _en_einde(woord, r1):
+    """Verwijder -en/-ene als er een medeklinker (maar niet 'gem') voor staat"""
+    for einde in ("ene", "en"):
+        if woord.endswith(einde) and len(woord) - len(einde) >= r1:
+            stam = woord[:-len(einde)]
+            if stam and stam[-1] not in _KLINKERS and not stam.endswith("gem"):
+                return _ontdubbel(stam)
+            return woord
+    return woord
+
+
+# Een notitieverzameling heeft een beperkte woordenschat: elke stam maar één keer uitrekenen
+@lru_cache(maxsize=100_000)
+def stam(woord):
+    """
+    Nederlandse stam volgens het Snowball-algoritme (Porter), bijv. 'saneringen' -> 'saner'.
+
+    Een 'y' aan het begin of na een klinker en een 'i' tussen klinkers tellen als medeklinker;
+    die worden tijdelijk als hoofdletter geschreven, net als in de referentie-implementatie.
+    """
+    if len(woord) < 3 or not woord.isalpha():
+        return woord
+    letters = list(woord)
+    for i, letter in enumerate(letters):
+        if letter == "y" and (i == 0 or letters[i - 1] in _KLINKERS):
+            letters[i] = "Y"
+        elif letter == "i" and 0 < i < len(letters) - 1 and letters[i - 1] in _KLINKERS \
+                and letters[i + 1] in _KLINKERS:
+            letters[i] = "I"
+    woord = "".join(letters)
+
+    r1 = max(_regio(woord), 3)
+    r2 = r1 + _regio(woord[r1:]) if r1 < len(woord) else len(woord)
+
+    # Stap 1: -heden, -en(e), -s(e)
+    if woord.endswith("heden"):
+        if len(woord) - 5 >= r1:
+            woord = woord[:-5] + "heid"
+    elif woord.endswith(("ene", "en")):
+        woord = _en_einde(woord, r1)
+    else:
+        for einde in ("se", "s"):
+            if woord.endswith(einde):
+                stam_deel = woord[:-len(einde)]
+                if len(stam_deel) >= r1 and stam_deel and stam_deel[-1] not in _KLINKERS \
+                        and stam_deel[-1] != "j":
+                    woord = stam_deel
+                break
+
+    # Stap 2: -e
+    e_gevonden = False
+    if woord.endswith("e") and len(woord) - 1 >= r1 and len(woord) > 1 and woord[-2] not in _KLINKERS:
+        woord = _ontdubbel(woord[:-1])
+        e_gevonden = True
+
+    # Stap 3a: -heid
+    if woord.endswith("heid") and len(woord) - 4 >= r2 and not woord.endswith("cheid"):
+        woord = _en_einde(woord[:-4], r1)
+
+    # Stap 3b: afleidingsuitgangen in R2
+    if woord.endswith(("end", "ing")) and len(woord) - 3 >= r2:
+        woord = woord[:-3]
+        if woord.endswith("ig") and len(woord) - 2 >= r2 and not woord.endswith("eig"):
+            woord = woord[:-2]
+        else:
+            woord = _ontdubbel(woord)
+    elif woord.endswith("ig") and len(woord) - 2 >= r2 and not woord.endswith("eig"):
+        woord = woord[:-2]
+    elif woord.endswith("lijk") and len(woord) - 4 >= r2:
+        woord = woord[:-4]
+        if woord.endswith("e") and len(woord) - 1 >= r1 and len(woord) > 1 and woord[-2] not in _KLINKERS:
+            woord = _ontdubbel(woord[:-1])
+    elif woord.endswith("baar") and len(woord) - 4 >= r2:
+        woord = woord[:-4]
+    elif woord.endswith("bar") and len(woord) - 3 >= r2 and e_gevonden:
+        woord = woord[:-3]
+
+    # Stap 4: dubbele klinker in een gesloten laatste lettergreep ('maan' -> 'man')
+    if len(woord) >= 4 and woord[-1] not in _KLINKERS and woord[-1] != "I" \
+            and woord[-3] == woord[-2] and woord[-2] in "aeou" and woord[-4] not in _KLINKERS:
+        woord = woord[:-2] + woord[-1]
+
+    return woord.lower()
+
+
+def tokeniseer(tekst):
+    """Genormaliseerde, gestemde woorden van een tekst, zonder stopwoorden"""
+    return [stam(woord) for woord in _WOORD.findall(normaliseer_tekst(tekst)) if woord not in STOPWOORDEN]
+
+
+# ======================
+# VOLLEDIGE TEKST (BM25)
+# ======================
+class NotitieIndex:
+    """
+    Persistente inverted index over vrije tekst (Opmerkingen) met BM25-rangschikking.
+
+    De postings (term, locatie, termfrequentie) en documentlengtes staan in twee tabellen in
+    dezelfde SQLite-database als de locaties, zodat ze samen met een wijziging in één transactie
+    worden bijgewerkt en een herstart overleven. Een zoekactie leest alleen de postings van de
+    termen uit de zoekopdracht (primaire sleutel op term).
+    """
+
+    def __init__(self, conn=None, lock=None):
+        self._conn = conn or sqlite3.connect(":memory:", check_same_thread=False, isolation_level=None)
+        self._lock = lock or threading.RLock()
+        with self._lock:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS notitie_termen ("
+                "term TEXT NOT NULL, locatie TEXT NOT NULL, tf INTEGER NOT NULL, "
+                "PRIMARY KEY (term, locatie)) WITHOUT ROWID"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS notitie_termen_locatie ON notitie_termen (locatie)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS notitie_documenten (locatie TEXT PRIMARY KEY, lengte INTEGER NOT NULL)"
+            )
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM notitie_documenten").fetchone()[0]
+
+    def indexeer(self, locatie, tekst):
+        """Vervang de postings van één locatie door die van de (nieuwe) tekst"""
+        self.indexeer_batch([(locatie, tekst)])
+
+    def indexeer_batch(self, paren):
+        """Indexeer een reeks (locatie, tekst); lege teksten halen de locatie uit de index"""
+        documenten = []
+        postings = []
+        for locatie, tekst in paren:
+            termen = Counter(tokeniseer(tekst)) if isinstance(tekst, str) else Counter()
+            documenten.append((locatie, sum(termen.values())))
+            postings.extend((term, locatie, tf) for term, tf in termen.items())
+        if not documenten:
+            return
+        with self._lock:
+            self._verwijder([locatie for locatie, _ in documenten])
+            self._conn.executemany(
+                "INSERT INTO notitie_documenten (locatie, lengte) VALUES (?, ?)",
+                [(locatie, lengte) for locatie, lengte in documenten if lengte]
+            )
+            self._conn.executemany(
+                "INSERT INTO notitie_termen (term, locatie, tf) VALUES (?, ?, ?)", postings
+            )
+
+    def hernoem(self, oud, nieuw):
+        with self._lock:
+            self._conn.execute("UPDATE notitie_termen SET locatie = ? WHERE locatie = ?", (nieuw, oud))
+            self._conn.execute("UPDATE notitie_documenten SET locatie = ? WHERE locatie = ?", (nieuw, oud))
+
+    def verwijder(self, locatie):
+        with self._lock:
+            self._verwijder([locatie])
+
+    def _verwijder(self, locaties):
+        self._conn.executemany("DELETE FROM notitie_termen WHERE locatie = ?", [(l,) for l in locaties])
+        self._conn.executemany("DELETE FROM notitie_documenten WHERE locatie = ?", [(l,) for l in locaties])
+
+    def zoek(self, zoekterm, limiet=50):
+        """
+        Zoek in de notities; geeft [(locatie, score)] met de beste treffer eerst.
+
+        Elk woord wordt gestemd zoals bij het indexeren ('saneringen' vindt 'sanering'); een
+        woord dat op '*' eindigt zoekt op prefix ('geluid*' vindt ook 'geluidsoverlast').
+        """
+        woorden = _WOORD.findall(normaliseer_tekst(zoekterm))
+        prefixen = {woord for woord in re.findall(r"([a-z0-9]+)\*", normaliseer_tekst(zoekterm))}
+        termen = {woord if woord in prefixen else stam(woord) for woord in woorden if woord not in STOPWOORDEN}
+        if not termen:
+            return []
+        scores = Counter()
+        with self._lock:
+            aantal, totaal = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(lengte), 0) FROM notitie_documenten"
+            ).fetchone()
+            if not aantal:
+                return []
+            gemiddelde = totaal / aantal
+            for term in termen:
+                if term in prefixen:
+                    rijen = self._conn.execute(
+                        "SELECT t.locatie, SUM(t.tf), d.lengte FROM notitie_termen t "
+                        "JOIN notitie_documenten d ON d.locatie = t.locatie "
+                        "WHERE t.term >= ? AND t.term < ? GROUP BY t.locatie",
+                        (term, term + "\uffff")
+                    ).fetchall()
+                else:
+                    rijen = self._conn.execute(
+                        "SELECT t.locatie, t.tf, d.lengte FROM notitie_termen t "
+                        "JOIN notitie_documenten d ON d.locatie = t.locatie WHERE t.term = ?",
+                        (term,)
+                    ).fetchall()
+                if not rijen:
+                    continue
+                idf = math.log(1 + (aantal - len(rijen) + 0.5) / (len(rijen) + 0.5))
+                for locatie, tf, lengte in rijen:
+                    norm = BM25_K1 * (1 - BM25_B + BM25_B * lengte / gemiddelde)
+                    scores[locatie] += idf * tf * (BM25_K1 + 1) / (tf + norm)
+        return [(locatie, round(score, 4)) for locatie, score in scores.most_common(limiet)]
+
+
+# ======================
+# FILTERS (BITMAPS)
+# ======================
+class FilterBitmaps:
+    """
+    Bitmapindex over de scorekolommen van één DataFrame: per criterium per score een bitmap
+    van de rijen met minstens die score, plus per mogelijke totaalscore een bitmap.
+
+    Een bitmap is een met np.packbits ingepakte rij-array (één bit per rij, de opvulbits van
+    de laatste byte zijn altijd 0). Filters worden zo met een paar bytewise EN/OF-bewerkingen
+    gecombineerd en pas aan het eind omgezet naar rijposities.
+    """
+
+    def __init__(self, df, criteria, min_score=1, max_score=5):
+        self.criteria = list(criteria)
+        self.min_score = min_score
+        self.max_score = max_score
+        self.n = len(df)
+        if self.n and self.criteria:
+            scores = df[self.criteria].apply(pd.to_numeric, errors="coerce").fillna(0).to_numpy(np.int16)
+        else:
+            scores = np.zeros((self.n, len(self.criteria)), dtype=np.int16)
+        self.scores = scores
+        self.totaal = scores.sum(axis=1)
+        self._alles = np.packbits(np.ones(self.n, dtype=bool))
+        self._minimaal = {
+            criterium: {score: np.packbits(scores[:, i] >= score) for score in range(min_score, max_score + 1)}
+            for i, criterium in enumerate(self.criteria)
+        }
+        self._totaal = {
+            totaal: np.packbits(self.totaal >= totaal)
+            for totaal in range(1, max_score * len(self.criteria) + 1)
+        }
+        # Histogrammen (aantal rijen met minstens elke waarde) voor facetten zonder andere filters
+        self._histogram = {
+            criterium: self._cumulatief(scores[:, i]) for i, criterium in enumerate(self.criteria)
+        }
+        self._histogram_totaal = self._cumulatief(self.totaal)
+
+    @staticmethod
+    def _cumulatief(waarden):
+        """aantal[w] = aantal rijen met een waarde van minstens w"""
+        telling = np.bincount(np.clip(waarden, 0, None).astype(np.int64))
+        return telling[::-1].cumsum()[::-1]
+
+    def alles(self):
+        return self._alles.copy()
+
+    def geen(self):
+        return np.zeros_like(self._alles)
+
+    def minimaal(self, criterium, score):
+        """Rijen met minstens deze score voor het criterium (0: alle rijen)"""
+        if score <= 0:
+            return self._alles
+        bitmap = self._minimaal[criterium].get(int(score))
+        return bitmap if bitmap is not None else self.geen()
+
+    def minimaal_totaal(self, totaal):
+        """Rijen met minstens deze totaalscore over alle criteria"""
+        if totaal <= 0:
+            return self._alles
+        bitmap = self._totaal.get(int(totaal))
+        return bitmap if bitmap is not None else self.geen()
+
+    def aantallen(self, criterium, basis=None):
+        """
+        Facet: per minimumscore het aantal rijen dat er (binnen de basis-bitmap) aan voldoet.
+        Zonder basis komt het direct uit het histogram, anders is het één EN plus telling per score.
+        """
+        scores = range(self.min_score, self.max_score + 1)
+        if basis is None:
+            histogram = self._histogram[criterium]
+            return {score: int(histogram[score]) if score < len(histogram) else 0 for score in scores}
+        return {score: self.aantal(np.bitwise_and(basis, self._minimaal[criterium][score])) for score in scores}
+
+    def aantallen_totaal(self, totalen, basis=None):
+        """Facet voor de minimale totaalscore, voor de gegeven keuzes"""
+        resultaat = {}
+        for totaal in totalen:
+            if basis is None:
+                histogram = self._histogram_totaal
+                resultaat[totaal] = int(histogram[max(totaal, 0)]) if max(totaal, 0) < len(histogram) else 0
+            else:
+                resultaat[totaal] = self.aantal(np.bitwise_and(basis, self.minimaal_totaal(totaal)))
+        return resultaat
+
+    def van_posities(self, posities):
+        masker = np.zeros(self.n, dtype=bool)
+        posities = np.asarray(posities, dtype=np.int64)
+        masker[posities[(posities >= 0) & (posities < self.n)]] = True
+        return np.packbits(masker)
+
+    @staticmethod
+    def en(*bitmaps):
+        resultaat = bitmaps[0].copy()
+        for bitmap in bitmaps[1:]:
+            np.bitwise_and(resultaat, bitmap, out=resultaat)
+        return resultaat
+
+    @staticmethod
+    def of(*bitmaps):
+        resultaat = bitmaps[0].copy()
+        for bitmap in bitmaps[1:]:
+            np.bitwise_or(resultaat, bitmap, out=resultaat)
+        return resultaat
+
+    @staticmethod
+    def aantal(bitmap):
+        return int(_POPCOUNT[bitmap].sum(dtype=np.int64))
+
+    def posities(self, bitmap):
+        """Rijposities (oplopend) van de gezette bits"""
+        return np.flatnonzero(np.unpackbits(bitmap, count=self.n))
+
+    def scorefilter(self, min_totaal=0, min_scores=None):
+        """EN van alle opgegeven minimumscores; None als er geen scorefilter actief is"""
+        delen = [self.minimaal(criterium, score) for criterium, score in (min_scores or {}).items() if score > 0]
+        if min_totaal > 0:
+            delen.append(self.minimaal_totaal(min_totaal))
+        return self.en(*delen) if delen else None
+
+
+# ======================
+# RESULTATENCACHE
+# ======================
+class ZoekCache:
+    """
+    LRU-cache van zoekresultaten, gedeeld door alle sessies.
+
+    De versie van de portefeuille (momentopname en sessie-overlay) is deel van de sleutel, zodat
+    sessies op verschillende versies elkaars resultaten laten staan; resultaten van oude versies
+    worden niet meer opgevraagd en vallen vanzelf uit de LRU.
+    """
+
+    def __init__(self, max_items=MAX_ZOEKRESULTATEN):
+        self.max_items = max_items
+        self.treffers = 0
+        self.missers = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._items)
+
+    def haal_op(self, sleutel, versie):
+        """Het bewaarde resultaat, of None als de zoekopdracht (voor deze versie) nieuw is"""
+        sleutel = (versie, sleutel)
+        with self._lock:
+            waarde = self._items.get(sleutel)
+            if waarde is None:
+                self.missers += 1
+                return None
+            self._items.move_to_end(sleutel)
+            self.treffers += 1
+            return waarde
+
+    def bewaar(self, sleutel, versie, waarde):
+        sleutel = (versie, sleutel)
+        with self._lock:
+            self._items[sleutel] = waarde
+            self._items.move_to_end(sleutel)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+
+    def leeg(self):
+        with self._lock:
+            self._items.clear()